@@ -0,0 +1,538 @@
+import secrets
+import struct
+import numpy as np
+
+from MinesweeperEnv import GAME_NOT_INITIALIZED, GAME_IN_PROGRESS, GAME_WON
+
+
+# Compact game state format written by `ChunkedMinesweeper.to_bytes`: a header holding the format version, the game
+# status, the dimensions, the number of mines, the chunk size, the seed, the first action, the number of revealed
+# tiles and the number of chunks with revealed tiles, followed by the index and the bit-packed revealed bitmap of
+# each of these chunks
+STATE_FORMAT_VERSION = 1
+STATE_HEADER = struct.Struct('<BBIIQHQQQI')
+CHUNK_HEADER = struct.Struct('<I')
+
+# Game status stored in the header, in addition to the ones of `MinesweeperEnv`
+GAME_LOST = 4
+
+# The numbers of mines are drawn by numpy's hypergeometric sampler, which takes fewer than 10^9 tiles on each side
+MAX_TILES = 10 ** 9 - 1
+
+
+class ChunkedMinesweeper:
+
+    def __init__(self, rows, cols, m, seed=None, chunk_size=64):
+        """
+        Initialize a Minesweeper game on a rectangular board, of up to a billion tiles, stored in chunks.
+
+        The board is split into square chunks of `chunk_size` x `chunk_size` tiles (smaller along the bottom and
+        right edges), and nothing is stored for a chunk until a step needs it: its mines are drawn the first time its
+        tiles or their neighbors are revealed, and its revealed bitmap is created by the first tile revealed in it.
+        The memory and the time of a step are thus bounded by the tiles it reveals and the chunks around them, not by
+        the size of the board, and the revealed tiles of a view are read from the chunks it overlaps.
+
+        The mines are placed after the first action, outside of the 3x3 grid centered at it, as in `Minesweeper`.
+        They are uniformly distributed among the other tiles, with exactly m mines on the board, without drawing them
+        all: the number of mines of each chunk is drawn by splitting the board in halves recursively, the number of
+        mines of a half following the hypergeometric distribution of the mines falling in it, and the mines of a
+        chunk are then placed at random among its tiles. Every draw uses a generator seeded by the seed of the game
+        and the position of the chunk or of the half, so the board only depends on the seed and the first action,
+        and a chunk can be drawn again identically when the game is loaded with `from_bytes`.
+
+        Parameters:
+        rows (int): The number of rows of the board.
+        cols (int): The number of columns of the board.
+        m (int): The number of mines on the board.
+        seed (int, optional): The seed of the board, a non-negative integer below 2^64. A random seed is drawn if it
+                              is not provided.
+        chunk_size (int): The number of rows and columns of the chunks.
+
+        Raises:
+        ValueError: If the board has more than `MAX_TILES` tiles, or if the mines do not fit outside of the 3x3
+                    grid of the first action.
+
+        The function also initializes the following state variables:
+
+        status (int): GAME_NOT_INITIALIZED before the first action, then GAME_IN_PROGRESS, GAME_WON or GAME_LOST.
+
+        revealed_count (int): The number of tiles revealed so far.
+
+        newly_revealed (array): The linear indices (row * cols + col) of the tiles revealed by the last step, within
+                                its viewport if it was given one, and `newly_values` their numbers.
+
+        newly_count (int): The number of tiles revealed by the last step on the whole board.
+        """
+        if rows * cols > MAX_TILES:
+            raise ValueError("The board can not have more than %d tiles" % MAX_TILES)
+        if not 0 <= m <= rows * cols - 9:
+            raise ValueError("The mines do not fit outside of the 3x3 grid of the first action")
+        self.rows = rows
+        self.cols = cols
+        self.m = m
+        self.chunk_size = chunk_size
+        self.seed = seed if seed is not None else secrets.randbits(63)
+        self.chunk_rows = -(-rows // chunk_size)
+        self.chunk_cols = -(-cols // chunk_size)
+
+        self.status = GAME_NOT_INITIALIZED
+        self.first_action = None
+        self.revealed_count = 0
+        self.newly_revealed = np.empty(0, dtype=np.int64)
+        self.newly_values = np.empty(0, dtype=np.int8)
+        self.newly_count = 0
+
+        self._splits = {} # (row start, row end, col start, col end) in chunks -> number of mines in the first half
+        self._mines = {} # (chunk row, chunk col) -> h x w boolean mine mask
+        self._numbers = {} # (chunk row, chunk col) -> h x w int8 board, -1 for the mines
+        self._revealed = {} # (chunk row, chunk col) -> h x w boolean revealed mask
+        self._packed = {} # (chunk row, chunk col) -> bit-packed revealed mask, not unpacked yet since from_bytes
+
+    def _chunkShape(self, chunk_row, chunk_col):
+        """
+        Get the number of rows and columns of a chunk.
+        """
+        return (min(self.chunk_size, self.rows - chunk_row * self.chunk_size),
+                min(self.chunk_size, self.cols - chunk_col * self.chunk_size))
+
+    def _availableTiles(self, row_start, row_end, col_start, col_end):
+        """
+        Count the tiles of a rectangle of chunks that can hold a mine, the ones outside of the 3x3 grid centered at
+        the first action.
+        """
+        top, bottom = row_start * self.chunk_size, min(row_end * self.chunk_size, self.rows)
+        left, right = col_start * self.chunk_size, min(col_end * self.chunk_size, self.cols)
+        row, col = divmod(self.first_action, self.cols)
+        overlap_rows = max(0, min(bottom, row + 2) - max(top, row - 1))
+        overlap_cols = max(0, min(right, col + 2) - max(left, col - 1))
+        return (bottom - top) * (right - left) - overlap_rows * overlap_cols
+
+    def _chunkMineCount(self, chunk_row, chunk_col):
+        """
+        Get the number of mines of a chunk, by descending the recursive split of the board in halves from the whole
+        board, which holds the m mines, to the chunk. The split of each half is drawn once and memoized.
+
+        Returns:
+        int: The number of mines of the chunk.
+        """
+        row_start, row_end, col_start, col_end = 0, self.chunk_rows, 0, self.chunk_cols
+        count = self.m
+        while row_end - row_start > 1 or col_end - col_start > 1:
+            # Split the longer side of the rectangle, in chunks
+            if row_end - row_start >= col_end - col_start:
+                middle = (row_start + row_end) // 2
+                first, second = (row_start, middle, col_start, col_end), (middle, row_end, col_start, col_end)
+                in_first = chunk_row < middle
+            else:
+                middle = (col_start + col_end) // 2
+                first, second = (row_start, row_end, col_start, middle), (row_start, row_end, middle, col_end)
+                in_first = chunk_col < middle
+
+            node = (row_start, row_end, col_start, col_end)
+            first_count = self._splits.get(node)
+            if first_count is None:
+                rng = np.random.default_rng([self.seed, *node])
+                first_count = self._splits[node] = int(rng.hypergeometric(self._availableTiles(*first),
+                                                                          self._availableTiles(*second), count))
+            if in_first:
+                count = first_count
+                row_start, row_end, col_start, col_end = first
+            else:
+                count -= first_count
+                row_start, row_end, col_start, col_end = second
+        return count
+
+    def _chunkMines(self, chunk_row, chunk_col):
+        """
+        Get the mine mask of a chunk, drawing its mines the first time it is needed. The mines are placed at random
+        among the tiles of the chunk outside of the 3x3 grid of the first action, as in `Minesweeper._setupGameBoard`.
+
+        Returns:
+        numpy.ndarray: The h x w boolean mine mask of the chunk.
+        """
+        mines = self._mines.get((chunk_row, chunk_col))
+        if mines is None:
+            h, w = self._chunkShape(chunk_row, chunk_col)
+            top, left = chunk_row * self.chunk_size, chunk_col * self.chunk_size
+            row, col = divmod(self.first_action, self.cols)
+            invalid_mine_locations = np.array([(row + i - top) * w + (col + j - left)
+                                               for i in [-1, 0, 1]
+                                               for j in [-1, 0, 1]
+                                               if top <= row + i < top + h and left <= col + j < left + w], dtype=int)
+
+            rng = np.random.default_rng([self.seed, chunk_row, chunk_col])
+            ranks = rng.choice(h * w - len(invalid_mine_locations), self._chunkMineCount(chunk_row, chunk_col), replace=False)
+            mines = np.zeros((h, w), dtype=bool)
+            mines.flat[ranks + np.searchsorted(invalid_mine_locations - np.arange(len(invalid_mine_locations)), ranks, side='right')] = True
+            self._mines[(chunk_row, chunk_col)] = mines
+        return mines
+
+    def _neighbors(self, chunk_row, chunk_col):
+        """
+        List the neighbors of a chunk with the slices matching their facing tiles: the border of the chunk padded by
+        one tile on each side, and the edge of the neighbor.
+
+        Returns:
+        list: The (neighbor chunk, slices of the padded chunk, slices of the neighbor) of the existing neighbors.
+        """
+        h, w = self._chunkShape(chunk_row, chunk_col)
+        c = self.chunk_size
+        # For each offset, the slice of the padded chunk and the slice of the neighbor facing it
+        row_slices = {-1: (slice(0, 1), slice(c - 1, c)), 0: (slice(1, h + 1), slice(0, h)), 1: (slice(h + 1, h + 2), slice(0, 1))}
+        col_slices = {-1: (slice(0, 1), slice(c - 1, c)), 0: (slice(1, w + 1), slice(0, w)), 1: (slice(w + 1, w + 2), slice(0, 1))}
+        neighbors = []
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                if (i or j) and 0 <= chunk_row + i < self.chunk_rows and 0 <= chunk_col + j < self.chunk_cols:
+                    neighbors.append(((chunk_row + i, chunk_col + j), (row_slices[i][0], col_slices[j][0]),
+                                      (row_slices[i][1], col_slices[j][1])))
+        return neighbors
+
+    def _chunkNumbers(self, chunk_row, chunk_col):
+        """
+        Get the board of a chunk, computed the first time it is needed from the mines of the chunk and of the edges
+        of its neighbors.
+
+        Returns:
+        numpy.ndarray: The h x w int8 board of the chunk, with -1 for the mines and the number of neighboring mines
+                       elsewhere.
+        """
+        numbers = self._numbers.get((chunk_row, chunk_col))
+        if numbers is None:
+            mines = self._chunkMines(chunk_row, chunk_col)
+            h, w = mines.shape
+            padded = np.zeros((h + 2, w + 2), dtype=np.int8)
+            padded[1:-1, 1:-1] = mines
+            for neighbor, own_slices, neighbor_slices in self._neighbors(chunk_row, chunk_col):
+                padded[own_slices] = self._chunkMines(*neighbor)[neighbor_slices]
+            numbers = sum(padded[i:i + h, j:j + w] for i in range(3) for j in range(3))
+            numbers[mines] = -1
+            self._numbers[(chunk_row, chunk_col)] = numbers
+        return numbers
+
+    def _chunkRevealed(self, chunk_row, chunk_col, create=False):
+        """
+        Get the revealed mask of a chunk, unpacking it if the game was loaded with `from_bytes`.
+
+        Parameters:
+        create (bool): Whether to create an empty mask for a chunk without revealed tiles, instead of returning None.
+        """
+        revealed = self._revealed.get((chunk_row, chunk_col))
+        if revealed is None:
+            h, w = self._chunkShape(chunk_row, chunk_col)
+            packed = self._packed.pop((chunk_row, chunk_col), None)
+            if packed is not None:
+                revealed = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=h * w).astype(bool).reshape(h, w)
+            elif create:
+                revealed = np.zeros((h, w), dtype=bool)
+            else:
+                return None
+            self._revealed[(chunk_row, chunk_col)] = revealed
+        return revealed
+
+    def step(self, action, viewport=None):
+        """
+        Reveal a tile, and if it is a zero, the zero region connected to it along with its numbered border.
+
+        The cascade is revealed chunk by chunk: in each chunk, the zero tiles reached are grown to their connected
+        region within the chunk by repeated 3x3 dilations, their neighbors are revealed, and the neighbors falling in
+        the adjacent chunks are queued as the starting tiles of these chunks. The cost of a step is thus bounded by
+        the chunks the cascade goes through.
+
+        Parameters:
+        action (int): The tile to reveal, as a linear index row * cols + col.
+        viewport (tuple, optional): The (row, col, rows, cols) of the viewport of the client. Only the tiles revealed
+                                    inside it are listed in `newly_revealed`, rather than the whole cascade.
+
+        Returns:
+        dict: The result of the step, in a "result" string with "invalid action", "lose", "win" or "continue"
+              options, as returned by `Minesweeper.step`. Revealing a tile after the end of the game is an invalid
+              action.
+
+        Note:
+        This method modifies the object's state in-place. The tiles revealed are stored in `newly_revealed`, with
+        their numbers in `newly_values`, and counted in `newly_count`.
+        """
+        self.newly_revealed = np.empty(0, dtype=np.int64)
+        self.newly_values = np.empty(0, dtype=np.int8)
+        self.newly_count = 0
+        if self.status in (GAME_WON, GAME_LOST):
+            return {"result": "invalid action"}
+        if self.status == GAME_NOT_INITIALIZED:
+            self.first_action = action
+            self.status = GAME_IN_PROGRESS
+
+        row, col = divmod(action, self.cols)
+        chunk = (row // self.chunk_size, col // self.chunk_size)
+        local_row, local_col = row % self.chunk_size, col % self.chunk_size
+        revealed = self._chunkRevealed(*chunk)
+        if revealed is not None and revealed[local_row, local_col]:
+            return {"result": "invalid action"}
+        if self._chunkMines(*chunk)[local_row, local_col]:
+            self.status = GAME_LOST
+            return {"result": "lose"}
+
+        starts = np.zeros(self._chunkShape(*chunk), dtype=bool)
+        starts[local_row, local_col] = True
+        self._revealFrom({chunk: starts}, viewport)
+
+        if self.revealed_count == self.rows * self.cols - self.m:
+            self.status = GAME_WON
+            return {"result": "win"}
+        return {"result": "continue"}
+
+    def _revealFrom(self, pending, viewport=None):
+        """
+        Reveal the safe tiles queued in each chunk, and the cascades of the zero tiles among them.
+
+        Parameters:
+        pending (dict): The h x w boolean masks of the tiles to reveal, by chunk. It is consumed by this method.
+        viewport (tuple, optional): The (row, col, rows, cols) of the only tiles to list in `newly_revealed`.
+        """
+        tiles, values = [], []
+        while pending:
+            chunk = next(iter(pending))
+            starts = pending.pop(chunk)
+            revealed = self._chunkRevealed(*chunk, create=True)
+            new = starts & ~revealed
+            if not new.any():
+                continue
+
+            numbers = self._chunkNumbers(*chunk)
+            zeros = numbers == 0
+            reached = new & zeros
+            if reached.any():
+                # Grow the zero tiles reached to their region within the chunk, and reveal its neighbors
+                count = np.count_nonzero(reached)
+                while True:
+                    reached = _dilate(reached)[1:-1, 1:-1] & zeros
+                    new_count = np.count_nonzero(reached)
+                    if new_count == count:
+                        break
+                    count = new_count
+                around = _dilate(reached)
+                new |= around[1:-1, 1:-1] & ~revealed
+
+                # Queue the neighbors of the region in the adjacent chunks
+                for neighbor, own_slices, neighbor_slices in self._neighbors(*chunk):
+                    border = around[own_slices]
+                    if border.any():
+                        if neighbor not in pending:
+                            pending[neighbor] = np.zeros(self._chunkShape(*neighbor), dtype=bool)
+                        pending[neighbor][neighbor_slices] |= border
+
+            revealed |= new
+            count = int(np.count_nonzero(new))
+            self.revealed_count += count
+            self.newly_count += count
+            top, left = chunk[0] * self.chunk_size, chunk[1] * self.chunk_size
+            if viewport is not None:
+                # Only list the tiles of the chunk inside the viewport
+                row, col, rows, cols = viewport
+                new = new[max(row - top, 0):max(row + rows - top, 0), max(col - left, 0):max(col + cols - left, 0)]
+                top, left = max(top, row), max(left, col)
+                numbers = numbers[top - chunk[0] * self.chunk_size:, left - chunk[1] * self.chunk_size:]
+            local_rows, local_cols = np.nonzero(new)
+            if len(local_rows):
+                tiles.append((top + local_rows) * self.cols + left + local_cols)
+                values.append(numbers[local_rows, local_cols])
+
+        if tiles:
+            self.newly_revealed = np.concatenate(tiles)
+            self.newly_values = np.concatenate(values)
+
+    def _chunksOverlapping(self, row, col, rows, cols):
+        """
+        List the chunks overlapping a rectangle of tiles, cut to the board, with the offsets of the rectangle in them.
+
+        Returns:
+        list: The (chunk row, chunk col, slice of rows, slice of cols) of each chunk, the slices being local to it.
+        """
+        c = self.chunk_size
+        rows, cols = min(rows, self.rows - row), min(cols, self.cols - col)
+        chunks = []
+        for chunk_row in range(row // c, (row + rows - 1) // c + 1):
+            for chunk_col in range(col // c, (col + cols - 1) // c + 1):
+                top, left = chunk_row * c, chunk_col * c
+                chunks.append((chunk_row, chunk_col, slice(max(row - top, 0), min(row + rows - top, c)),
+                               slice(max(col - left, 0), min(col + cols - left, c))))
+        return chunks
+
+    def view(self, row, col, rows, cols, mines=False):
+        """
+        Get the revealed tiles of a rectangle of the board, its viewport.
+
+        Parameters:
+        row (int): The first row of the viewport.
+        col (int): The first column of the viewport.
+        rows (int): The number of rows of the viewport.
+        cols (int): The number of columns of the viewport.
+        mines (bool): Whether to get the mines of the viewport as well, to show them at the end of the game.
+
+        Returns:
+        tuple: A 2-element tuple, or 3-element with `mines`, containing:
+            - tiles (numpy.ndarray): The linear indices of the revealed tiles of the viewport.
+            - values (numpy.ndarray): Their numbers.
+            - mines (numpy.ndarray): The linear indices of the mines of the viewport, empty before the first action.
+        """
+        tiles, values, mine_tiles = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int8)], [np.empty(0, dtype=np.int64)]
+        for chunk_row, chunk_col, row_slice, col_slice in self._chunksOverlapping(row, col, rows, cols):
+            top, left = chunk_row * self.chunk_size + row_slice.start, chunk_col * self.chunk_size + col_slice.start
+            revealed = self._chunkRevealed(chunk_row, chunk_col)
+            if revealed is not None:
+                local_rows, local_cols = np.nonzero(revealed[row_slice, col_slice])
+                if len(local_rows):
+                    tiles.append((top + local_rows) * self.cols + left + local_cols)
+                    values.append(self._chunkNumbers(chunk_row, chunk_col)[row_slice, col_slice][local_rows, local_cols])
+            if mines and self.status != GAME_NOT_INITIALIZED:
+                local_rows, local_cols = np.nonzero(self._chunkMines(chunk_row, chunk_col)[row_slice, col_slice])
+                mine_tiles.append((top + local_rows) * self.cols + left + local_cols)
+
+        if mines:
+            return np.concatenate(tiles), np.concatenate(values), np.concatenate(mine_tiles)
+        return np.concatenate(tiles), np.concatenate(values)
+
+    def newly_revealed_in(self, row, col, rows, cols):
+        """
+        Get the tiles revealed by the last step that fall in a viewport.
+
+        Returns:
+        tuple: A 2-element tuple containing the linear indices of the tiles and their numbers.
+        """
+        tile_rows, tile_cols = np.divmod(self.newly_revealed, self.cols)
+        inside = (tile_rows >= row) & (tile_rows < row + rows) & (tile_cols >= col) & (tile_cols < col + cols)
+        return self.newly_revealed[inside], self.newly_values[inside]
+
+    def clip_viewport(self, viewport, action=None, max_size=100):
+        """
+        Fit a viewport requested by a client to the board and to a maximum size.
+
+        Parameters:
+        viewport (dict or None): The viewport, as {'row': ..., 'col': ..., 'rows': ..., 'cols': ...}. Without it, the
+                                 viewport is the largest one centered at the action, or at the top left corner of
+                                 the board.
+        action (int, optional): The tile the default viewport is centered at.
+        max_size (int): The maximum number of rows and of columns of the viewport.
+
+        Returns:
+        tuple: The (row, col, rows, cols) of the viewport, within the board.
+
+        Raises:
+        KeyError, TypeError or ValueError: If the viewport is not given as integers.
+        """
+        if viewport is None:
+            rows, cols = min(self.rows, max_size), min(self.cols, max_size)
+            center_row, center_col = divmod(action, self.cols) if action is not None else (0, 0)
+            row, col = center_row - rows // 2, center_col - cols // 2
+        else:
+            row, col = int(viewport['row']), int(viewport['col'])
+            rows, cols = min(int(viewport['rows']), max_size), min(int(viewport['cols']), max_size)
+        row = min(max(row, 0), max(self.rows - rows, 0))
+        col = min(max(col, 0), max(self.cols - cols, 0))
+        return row, col, max(min(rows, self.rows - row), 1), max(min(cols, self.cols - col), 1)
+
+    def to_bytes(self):
+        """
+        Serialize the game into a compact binary blob.
+
+        The blob holds the header, then the bit-packed revealed mask of each chunk with revealed tiles, after its
+        index. The mines are not saved: they are drawn again from the seed and the first action. The chunks that
+        were not unpacked since the game was loaded are copied back as they are, so only the chunks revealed by the
+        last steps are packed again.
+
+        Returns:
+        bytes: The serialized game.
+        """
+        parts = []
+        for (chunk_row, chunk_col), revealed in self._revealed.items():
+            if revealed.any():
+                parts.append(CHUNK_HEADER.pack(chunk_row * self.chunk_cols + chunk_col))
+                parts.append(np.packbits(revealed).tobytes())
+        for (chunk_row, chunk_col), packed in self._packed.items():
+            parts.append(CHUNK_HEADER.pack(chunk_row * self.chunk_cols + chunk_col))
+            parts.append(packed)
+        header = STATE_HEADER.pack(STATE_FORMAT_VERSION, self.status, self.rows, self.cols, self.m, self.chunk_size, self.seed,
+                                   self.first_action if self.first_action is not None else 0, self.revealed_count, len(parts) // 2)
+        return header + b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuild a game serialized with `to_bytes`. The revealed masks of the chunks are only unpacked when a step or
+        a view reaches them.
+
+        Parameters:
+        data (bytes): The serialized game.
+
+        Returns:
+        ChunkedMinesweeper: A new game in the same state as the serialized one.
+
+        Raises:
+        ValueError: If the data is not a game serialized with a supported version of the format.
+        """
+        if len(data) < STATE_HEADER.size or data[0] != STATE_FORMAT_VERSION:
+            raise ValueError("Unsupported game state format")
+        _, status, rows, cols, m, chunk_size, seed, first_action, revealed_count, chunk_count = STATE_HEADER.unpack_from(data)
+        env = cls(rows, cols, m, seed=seed, chunk_size=chunk_size)
+        env.status = status
+        env.first_action = first_action if status != GAME_NOT_INITIALIZED else None
+        env.revealed_count = revealed_count
+
+        data = memoryview(data)
+        offset = STATE_HEADER.size
+        for _ in range(chunk_count):
+            index, = CHUNK_HEADER.unpack_from(data, offset)
+            chunk = divmod(index, env.chunk_cols)
+            h, w = env._chunkShape(*chunk)
+            offset += CHUNK_HEADER.size
+            env._packed[chunk] = data[offset:offset + (h * w + 7) // 8]
+            offset += (h * w + 7) // 8
+        if offset != len(data):
+            raise ValueError("Unsupported game state format")
+        return env
+
+
+def viewport_response(env, viewport, info=None, resync=False):
+    """
+    Build the response of the web applications to a move or a view of a chunked game, scoped to a viewport.
+
+    Parameters:
+    env (ChunkedMinesweeper): The game.
+    viewport (tuple): The (row, col, rows, cols) of the viewport, as returned by `clip_viewport`.
+    info (dict, optional): The result of the move, None for a view.
+    resync (bool): Whether to send all the revealed tiles of the viewport, instead of the ones revealed by the move.
+
+    Returns:
+    dict: The response, with the linear indices of the tiles in 'revealed' and their numbers in 'values', the
+          viewport, the result of the move along with the number of tiles it revealed on the whole board in 'info',
+          and the mines of the viewport in 'mines' once the game has ended.
+    """
+    if info is None or resync:
+        tiles, values = env.view(*viewport)
+    else:
+        tiles, values = env.newly_revealed_in(*viewport)
+    response_data = {
+        'revealed': tiles.tolist(),
+        'values': values.tolist(),
+        'viewport': dict(zip(('row', 'col', 'rows', 'cols'), viewport))
+    }
+    if info is not None:
+        response_data['info'] = dict(info, tiles_revealed=env.newly_count)
+    if env.status in (GAME_WON, GAME_LOST):
+        response_data['mines'] = env.view(*viewport, mines=True)[2].tolist()
+    return response_data
+
+
+def _dilate(mask):
+    """
+    Dilate a boolean mask by a 3x3 square, onto the mask padded by one tile on each side.
+
+    Returns:
+    numpy.ndarray: The (h + 2) x (w + 2) dilated mask, whose border holds the tiles next to the mask outside of it.
+    """
+    h, w = mask.shape
+    padded = np.zeros((h + 4, w + 4), dtype=bool)
+    padded[2:-2, 2:-2] = mask
+    # 3x3 maximum, taken along the rows then along the columns
+    rows = padded[:, :-2] | padded[:, 1:-1] | padded[:, 2:]
+    return rows[:-2] | rows[1:-1] | rows[2:]
@@ -1,11 +1,40 @@
+import struct
 import numpy as np
 import gymnasium as gym
 
 
+# Compact game state format written by `Minesweeper.to_bytes`: a header holding the format version, the game status,
+# n and m, followed (once the mines are placed) by the bit-packed mine bitmap and the bit-packed revealed bitmap
+STATE_FORMAT_VERSION = 1
+STATE_HEADER = struct.Struct('<BBHI')
+
+# Game status stored in the header
+GAME_NOT_INITIALIZED = 0
+GAME_IN_PROGRESS = 1
+GAME_WON = 2
+GAME_NOT_INITIALIZED_NO_GUESS = 3 # not initialized, to be set up with a board solvable without guessing
+
+# Observation modes of the environment, see `Minesweeper.__init__`
+OBSERVATION_MODES = ('onehot', 'int8', 'packed')
+
+# Tiles revealed by a step that did not reveal anything
+_NO_TILES = np.empty(0, dtype=int)
+_NO_TILES.flags.writeable = False
+
+
 
 class Minesweeper(gym.Env):
 
-    def __init__(self, n, m, seed=None):
+    # Pool of pregenerated boards used by the no-guess games of the process, see `board_pool.NoGuessBoardPool`
+    board_pool = None
+
+    # Number of random boards drawn by a no-guess game to find its board when the pool does not hold one
+    no_guess_max_attempts = 1000
+
+    # Cache of precomputed boards used by the games of the process, see `board_cache.BoardCache`
+    board_cache = None
+
+    def __init__(self, n, m, seed=None, no_guess=False, board_cache=None, observation_mode='onehot'):
         """
         Initialize the Minesweeper environment.
         
@@ -18,6 +47,20 @@ class Minesweeper(gym.Env):
         m (int): The number of mines on the board.
         seed (int, optional): An optional seed for the random number generator used to place the mines. If provided,
                               this seed allows for the reproduction of specific game conditions.
+        no_guess (bool, optional): Whether the board must be solvable from the first action without guessing, that
+                                   is by the deterministic solver of `MinesweeperSolver`. Such boards are taken from
+                                   `Minesweeper.board_pool` if it holds one, and generated with the seeded random
+                                   number generator otherwise, within `Minesweeper.no_guess_max_attempts` draws.
+        board_cache (BoardCache, optional): A cache of precomputed boards to set up the board from, instead of
+                                            `Minesweeper.board_cache`. The board is chosen with the seeded random
+                                            number generator, so a seed still reproduces the game.
+        observation_mode (str, optional): The form of the observations returned by `step` and `reset`:
+                                          - 'onehot': the 10-channel binary image described below, 10 bytes per tile.
+                                          - 'int8': the game state as a single n x n int8 channel, 1 byte per tile.
+                                          - 'packed': the 10-channel binary image, flattened and packed 8 bits per
+                                            byte, 1.25 bytes per tile.
+                                          The compact modes are turned back into the 10-channel image by `to_onehot`,
+                                          on the side of the consumer of the observations.
         
         The function also initializes two internal state variables:
         
@@ -30,21 +73,84 @@ class Minesweeper(gym.Env):
                                 one of the following:
                                 - 0 to 8: The number of mines in the surrounding cells (only for revealed cells)
                                 - 9: Indicates a covered cell
+
+        revealed_mask (n x n array): A boolean mask of the tiles revealed so far. Together with the `safe_remaining`
+                                     counter of covered safe tiles, it tracks the progress of the game without
+                                     comparing sets of tiles.
+
+        newly_revealed (array): The linear indices of the tiles revealed by the last step, so that callers can
+                                forward the changes of the game state instead of the whole board.
+
+        The valid actions, the covered tiles, are tracked in a flat boolean mask that is only updated at the tiles
+        revealed by each step, see `action_masks`.
                                 
         The function also initializes the action and observation spaces. The action space is a discrete space with n * n 
         possible actions, corresponding to the n * n cells on the board. The observation space is a 10-channel binary image 
-        of shape 10 x n x n, where each channel corresponds to one of the 10 possible states for each cell.
+        of shape 10 x n x n, where each channel corresponds to one of the 10 possible states for each cell. This image,
+        or the int8 game state in the 'int8' mode, is kept in a persistent buffer that is only updated at the cells
+        revealed by each step.
+
+        Raises:
+        ValueError: If the observation mode is not one of `OBSERVATION_MODES`.
         """
+        if observation_mode not in OBSERVATION_MODES:
+            raise ValueError("Unknown observation mode %r, expected one of %s" % (observation_mode, ', '.join(OBSERVATION_MODES)))
         self.n = n
         self.m = m
+        self.no_guess = no_guess
+        self.observation_mode = observation_mode
+        if board_cache is not None:
+            self.board_cache = board_cache
         self.board = np.zeros((self.n, self.n), dtype=int) # internal state - unknown to agent
         self.game_state = np.ones((self.n, self.n), dtype=int) * 9
         self.game_not_initialized = True
-        self.np_random = np.random.default_rng(seed)
+        self.revealed_mask = np.zeros((self.n, self.n), dtype=bool)
+        self.safe_remaining = 0
+        self.newly_revealed = _NO_TILES
+        if seed is not None: # without a seed, gym.Env creates the generator the first time it is used
+            self.np_random = np.random.default_rng(seed)
+        if observation_mode == 'int8':
+            self._observation = np.full((self.n, self.n), 9, dtype=np.int8) # int8 copy of game_state - covered everywhere
+        else:
+            self._observation = np.zeros((10, self.n, self.n), dtype=np.uint8) # one-hot view of game_state - covered everywhere
+            self._observation[9] = 1
+        self._observation_view = self._observation.view() # read-only view returned by _convert_state
+        self._observation_view.flags.writeable = False
+        self._packed_observation = None # packed observation, until more tiles are revealed
+        self._action_mask = np.ones(self.n * self.n, dtype=bool) # valid actions - every tile is covered
+        self._action_mask_view = self._action_mask.view()
+        self._action_mask_view.flags.writeable = False
+
+        # the spaces are created the first time they are used, as games loaded with from_bytes rarely need them
+        self._action_space = None
+        self._observation_space = None
+
+    @property
+    def action_space(self):
+        """
+        The action space, a discrete space with n * n possible actions.
+        """
+        if self._action_space is None:
+            self._action_space = gym.spaces.Discrete(self.n * self.n)
+        return self._action_space
 
-        self.action_space = gym.spaces.Discrete(self.n * self.n)
-        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(10, self.n, self.n), dtype=np.uint8)
+    @action_space.setter
+    def action_space(self, space):
+        self._action_space = space
 
+    @property
+    def observation_space(self):
+        """
+        The observation space of the observation mode: a 10-channel binary image of shape 10 x n x n, an n x n int8
+        image of the game state, or the bytes of the packed 10-channel image.
+        """
+        if self._observation_space is None:
+            self._observation_space = observation_space(self.n, self.observation_mode)
+        return self._observation_space
+
+    @observation_space.setter
+    def observation_space(self, space):
+        self._observation_space = space
 
     def _convertActionToCoordinates(self, action):
         """
@@ -81,95 +187,234 @@ class Minesweeper(gym.Env):
         """
         return row * self.n + col           
 
+    @property
+    def revealed_tiles(self):
+        """
+        The set of the actions corresponding to the tiles revealed so far.
+
+        This set is built on demand from `revealed_mask` and is kept for compatibility with callers that used the
+        former set-based bookkeeping. Modifying it has no effect on the game.
+        """
+        return set(np.flatnonzero(self.revealed_mask).tolist())
+
+    @property
+    def safe_tiles(self):
+        """
+        The set of the actions corresponding to the tiles that do not contain a mine.
+
+        This set is built on demand from the board and is kept for compatibility with callers that used the former
+        set-based bookkeeping. It is empty until the board is set up by the first action.
+        """
+        if self.game_not_initialized:
+            return set()
+        return set(np.flatnonzero(self.board != -1).tolist())
+
     def _setupGameBoard(self, action):
         """
         Initializes the Minesweeper game board with the appropriate configuration of mines and safe tiles.
 
-        This method first calculates potential mine locations excluding a 3x3 grid centered at the initial
-        action's coordinates, as this area cannot contain mines. Mines are then randomly placed in these potential
-        locations using a seeded random number generator (if a seed was provided when creating the environment).
-        The numbers on the board are updated based on the number of adjacent mines for each cell.
+        This method first calculates the invalid mine locations, a 3x3 grid centered at the initial action's 
+        coordinates, as this area cannot contain mines. Mines are then randomly placed in the remaining potential
+        locations using a seeded random number generator (if a seed was provided when creating the environment):
+        ranks are drawn among the potential locations and mapped back to board positions, so the full list of
+        potential locations is never built. The numbers on the board are computed in one pass, by summing the 3x3
+        neighborhood of every cell over the padded mine mask.
+
+        In a no-guess game, the mines are those of a board solvable from the initial action without guessing, taken
+        from the board pool or generated by drawing random boards until the solver wins one. If there is no such
+        board, as can happen with a very high density of mines, the random board is kept.
+
+        With a board cache holding the configuration, the board is instead one of the cache, chosen with the seeded
+        random number generator and set up for the initial action by `BoardCache.take_one`.
 
         Parameters:
         action (int): The initial action to be taken on the game board.
 
         Note: 
         This method modifies the object's state in-place. The Minesweeper game board (`self.board`), the 
-        set of mine locations (`self.mines`), the set of safe tiles (`self.safe_tiles`), and the set of 
-        revealed tiles (`self.revealed_tiles`) are updated.
+        array of mine locations (`self.mines`) and the number of covered safe tiles (`self.safe_remaining`) 
+        are updated.
         """
+        if self.no_guess:
+            from board_pool import generate_no_guess # imported here, as board_pool builds its boards with this class
+            mines = self.board_pool.take(self.n, self.m, action) if self.board_pool is not None else None
+            if mines is None: # not pregenerated - generate it here, falling back to a random board after a bounded number of draws
+                mines, _ = generate_no_guess(self.n, self.m, action, self.np_random, self.no_guess_max_attempts)
+            if mines is not None:
+                self._placeMines(mines)
+                return
+
+        boards = self.board_cache.boards(self.n, self.m) if self.board_cache is not None else None
+        if boards is not None:
+            self._placeMines(*self.board_cache.take_one(self.n, self.m, self.np_random.integers(len(boards)), action))
+            return
+
         row, col = self._convertActionToCoordinates(action)
-        invalid_mine_locations = [self._convertCoordinatesToAction(row + i, col + j) # 3x3 grid surrounding the initial action can not contain mines
+        invalid_mine_locations = np.array([self._convertCoordinatesToAction(row + i, col + j) # 3x3 grid surrounding the initial action can not contain mines
                     for i in [-1, 0, 1] 
                     for j in [-1, 0, 1] 
-                    if (0 <= row + i < self.n) and (0 <= col + j < self.n)]
-        potential_mine_locations = np.delete(np.array(range(self.n ** 2)), invalid_mine_locations)
-        self.mines = self.np_random.choice(potential_mine_locations, self.m, replace=False)
-
-        #Create board            
-        for mine in self.mines:
-            row, col = self._convertActionToCoordinates(mine)
-            self.board[row, col] = -1
-            
-            # Determine coordinates of 8 neighboring cells
-            neighbors = [(i, j) 
-                        for i in [row - 1, row, row + 1] 
-                        for j in [col - 1, col, col + 1] 
-                        if (0 <= i < self.n) and (0 <= j < self.n) and not (i == row and j == col)]
-            
-            # Add 1 to all valid neighbors
-            for i, j in neighbors:
-                if (self.board[i, j] != -1):
-                    self.board[i, j] += 1
-        
-        # create master list of all safe tiles and create a set that will be updated with the agent's revealed tiles as the game progresses
-        self.safe_tiles = set(np.delete(np.array(range(self.n ** 2)), self.mines))
-        self.revealed_tiles = set()
+                    if (0 <= row + i < self.n) and (0 <= col + j < self.n)])
+
+        # Sample ranks among the potential mine locations, then shift each rank past the invalid locations before it
+        ranks = self.np_random.choice(self.n ** 2 - len(invalid_mine_locations), self.m, replace=False)
+        self._placeMines(ranks + np.searchsorted(invalid_mine_locations - np.arange(len(invalid_mine_locations)), ranks, side='right'))
+
+    def _placeMines(self, mines, board=None):
+        """
+        Build the game board from the given mine locations.
+
+        The numbers on the board are computed from the mine locations, the counter of covered safe tiles is reset
+        and the previous zero regions are discarded. This is the deterministic part of `_setupGameBoard`, also used to rebuild
+        a board from its mines when a game is loaded with `from_bytes`.
+
+        Parameters:
+        mines (numpy.ndarray): The linear indices of the tiles containing a mine.
+        board (numpy.ndarray, optional): The board, when its numbers are already known, as for a board taken from
+                                         a board cache.
+
+        Note:
+        This method modifies the object's state in-place. The Minesweeper game board (`self.board`), the array of
+        mine locations (`self.mines`), the number of covered safe tiles (`self.safe_remaining`) and the zero
+        regions (`self.zero_regions`) are updated.
+        """
+        self.mines = mines
+
+        if board is not None:
+            self.board = board
+        else:
+            #Create board
+            mine_mask = np.zeros((self.n, self.n), dtype=bool)
+            mine_mask.flat[self.mines] = True
+
+            # Count the mines in the 3x3 neighborhood of every cell in one pass over the padded mine mask
+            padded = np.zeros((self.n + 2, self.n + 2), dtype=int)
+            padded[1:-1, 1:-1] = mine_mask
+            self.board = sum(padded[i:i + self.n, j:j + self.n] for i in range(3) for j in range(3))
+            self.board[mine_mask] = -1
+
+        # all safe tiles are covered - this counter will be decreased as the agent reveals them
+        self.safe_remaining = self.n ** 2 - self.m
+
+        # the zero regions are labeled by _revealSafeTiles the first time a zero tile is clicked
+        self.zero_regions = None
+
+    def _labelZeroRegions(self):
+        """
+        Label the connected regions of zero tiles on the board and precompute the tiles revealed by clicking them.
+
+        Clicking a zero tile reveals every zero tile connected to it (in the 8 directions) along with the numbered
+        tiles bordering them. Since the board does not change during a game, these regions are labeled once, the
+        first time a zero tile is clicked (which is the first action of a game, as it has no neighboring mine).
+        Each zero tile starts with its own linear index as label, then every label is
+        replaced by the smallest label of its 3x3 neighborhood and shortened by looking up the label of its label,
+        until no label changes. All the tiles of a region then share the same label.
+
+        Note:
+        This method modifies the object's state in-place. The following attributes are created:
+        - `self.zero_regions` (n x n array): The region index of each zero tile, -1 for the other tiles.
+        - `self.region_cells` (array): The linear indices of the tiles revealed by each region (its zero tiles and
+          its numbered border), stored one region after the other.
+        - `self.region_offsets` (array): The start of each region in `self.region_cells`, followed by its total
+          length, so that the tiles of region k are `self.region_cells[self.region_offsets[k]:self.region_offsets[k + 1]]`.
+        """
+        size = self.n * self.n
+        zeros = self.board == 0
+        zero_tiles = np.flatnonzero(zeros)
+        labels = np.where(zeros, np.arange(size).reshape(self.n, self.n), size)
+
+        padded = np.full((self.n + 2, self.n + 2), size)
+        while True:
+            # 3x3 minimum, taken along the rows then along the columns
+            padded[1:-1, 1:-1] = labels
+            row_min = np.minimum(np.minimum(padded[:, :-2], padded[:, 1:-1]), padded[:, 2:])
+            neighborhood_min = np.minimum(np.minimum(row_min[:-2], row_min[1:-1]), row_min[2:])
+            new_labels = np.where(zeros, neighborhood_min, size)
+            flat = new_labels.reshape(-1)
+            flat[zero_tiles] = flat[flat[zero_tiles]] # jump to the label of the label
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+        # Number the regions in the order of their smallest tile, which is the label they share
+        roots = labels.reshape(-1) == np.arange(size)
+        region_ids = (np.cumsum(roots) - 1)[labels.reshape(-1)[zero_tiles]]
+        self.zero_regions = np.full((self.n, self.n), -1, dtype=int)
+        self.zero_regions.flat[zero_tiles] = region_ids
+
+        # Pair every tile with the region of each zero tile in its 3x3 neighborhood (the tile itself included)
+        padded = np.full((self.n + 2, self.n + 2), -1)
+        padded[1:-1, 1:-1] = self.zero_regions
+        tiles = np.arange(size).reshape(self.n, self.n)
+        keys = np.stack([padded[i:i + self.n, j:j + self.n] * size + tiles for i in range(3) for j in range(3)])
+        keys = np.sort(keys[keys >= 0])
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] # sorted by region, then by tile, without duplicates
+
+        self.region_cells = keys % size
+        self.region_offsets = np.concatenate(([0], np.cumsum(np.bincount(keys // size, minlength=np.count_nonzero(roots)))))
 
     def _revealSafeTiles(self, row, col):
         """
-        Perform a recursive search to reveal all adjacent safe tiles on the Minesweeper board.
+        Reveal the selected tile and, if it is a zero, all the safe tiles connected to it on the Minesweeper board.
 
-        This method starts from the specified tile (defined by row and col), and recursively reveals all 
-        connected tiles that contain a zero, effectively uncovering an entire safe zone on the board. The 
-        search stops when it hits a numbered tile or a boundary of the board. Numbered tiles are also revealed, 
-        but the function does not search beyond them. 
+        A numbered tile is revealed on its own. A zero tile reveals its whole zero region along with the numbered
+        tiles bordering it, effectively uncovering an entire safe zone on the board. The regions are precomputed by
+        `_labelZeroRegions` for the whole board, so the whole cascade is applied with a single array assignment.
 
-        The method modifies the game state in place, updating the 'game_state' to reflect the revealed tiles 
-        and adding the safe tiles to the 'revealed_tiles' set.
+        The method modifies the game state in place, updating the 'game_state' to reflect the revealed tiles, 
+        marking them in the 'revealed_mask' and counting them off 'safe_remaining'.
 
         Parameters:
         row (int): The row index of the starting tile.
         col (int): The column index of the starting tile.
 
         Note: 
-        This method modifies the object's state in-place. The Minesweeper game state (`self.game_state`) and 
-        the set of revealed tiles (`self.revealed_tiles`) are updated.
+        This method modifies the object's state in-place. The Minesweeper game state (`self.game_state`), its 
+        one-hot representation (`self._observation`), the mask of revealed tiles (`self.revealed_mask`) and 
+        the number of covered safe tiles (`self.safe_remaining`) are updated, and the tiles revealed by this call
+        are stored in `self.newly_revealed`.
         """
-        visited = set()
-        safespots = set()
+        if self.board[row, col] != 0:
+            safespots = np.array([self._convertCoordinatesToAction(row, col)])
+        else:
+            if self.zero_regions is None:
+                self._labelZeroRegions()
+            region = self.zero_regions[row, col]
+            safespots = self.region_cells[self.region_offsets[region]:self.region_offsets[region + 1]]
 
-        def search(r, c):
-            if not (0 <= r < self.n and 0 <= c < self.n) or (r, c) in visited or self.board[r][c] == -1:
-                return
+        self.newly_revealed = self._uncoverTiles(safespots)
 
-            visited.add((r, c))
-            safespots.add(self._convertCoordinatesToAction(r, c))
+    def _uncoverTiles(self, safespots):
+        """
+        Uncover the given safe tiles, skipping the ones that are already revealed.
 
-            if self.board[r][c] == 0:
-                self.game_state[r][c] = 0
-                for i in [-1, 0, 1]:
-                    for j in [-1, 0, 1]:
-                        if not (j == 0 and i == 0):
-                            search(r + i, c + j)
-            else:
-                self.game_state[r][c] = self.board[r][c]
+        Parameters:
+        safespots (numpy.ndarray): The linear indices of the safe tiles to uncover.
 
-        search(row, col)
+        Returns:
+        numpy.ndarray: The linear indices of the tiles that were actually uncovered.
 
-        self.revealed_tiles = self.revealed_tiles | safespots
+        Note:
+        This method modifies the object's state in-place. The Minesweeper game state (`self.game_state`), its 
+        one-hot representation (`self._observation`), the masks of revealed tiles (`self.revealed_mask`) and of
+        valid actions, and the number of covered safe tiles (`self.safe_remaining`) are updated.
+        """
+        newspots = safespots[~self.revealed_mask.flat[safespots]]
+        self.game_state.flat[newspots] = self.board.flat[newspots]
+        self.revealed_mask.flat[newspots] = True
+        self._action_mask[newspots] = False
+        self._packed_observation = None
+        self.safe_remaining -= len(newspots)
+
+        if self.observation_mode == 'int8':
+            self._observation.flat[newspots] = self.board.flat[newspots]
+        else:
+            # Move the newly revealed tiles from the "covered" channel to the channel of their number
+            observation = self._observation.reshape(10, -1)
+            observation[9, newspots] = 0
+            observation[self.board.flat[newspots], newspots] = 1
+        return newspots
 
-    def _convert_state(self):
+    def _convert_state(self, out=None):
         """
         Convert the game state into a more detailed representation for agent.
 
@@ -177,7 +422,7 @@ class Minesweeper(gym.Env):
         holds a value representing the number of adjacent mines (0-8) or 
         a special value (9) if the cell is uncovered. 
 
-        This function converts the game state into 10 separate (n x n) 
+        This function returns the game state as 10 separate (n x n) 
         binary mask arrays where each array represents one possible cell 
         state: having 0-8 adjacent mines or being uncovered. 
         
@@ -185,31 +430,75 @@ class Minesweeper(gym.Env):
         agent to interpret the game state without needing to extract 
         individual bits of information from cell values.
 
+        The masks are not rebuilt on each call: they are kept in a persistent
+        uint8 buffer that `_revealSafeTiles` updates at the newly revealed
+        cells only. Without `out`, a read-only view of this buffer is returned,
+        so it reflects the later steps of the game; callers that need to keep
+        an observation should copy it or pass their own array as `out`.
+
+        In the compact observation modes, the representation is the int8 game
+        state, also kept in a persistent buffer, or the bit-packed masks,
+        packed into a new read-only array the first time they are needed
+        after tiles were revealed.
+
+        Parameters:
+        out (numpy.ndarray, optional): An array of the shape of the observation 
+                    space to copy the representation into, instead of returning a view.
+
         Returns:
         numpy.ndarray: A 3D numpy array of shape (10, n, n) containing the 
-                    binary mask arrays for the different cell states.
+                    binary mask arrays for the different cell states, or the
+                    compact observation of the observation mode.
+        """
+        if self.observation_mode == 'packed':
+            if self._packed_observation is None:
+                self._packed_observation = np.packbits(self._observation.reshape(-1))
+                self._packed_observation.flags.writeable = False
+            if out is not None:
+                np.copyto(out, self._packed_observation)
+                return out
+            return self._packed_observation
+        if out is not None:
+            np.copyto(out, self._observation)
+            return out
+        return self._observation_view
+
+    def action_masks(self):
         """
-        state_representation = np.zeros((10, self.n, self.n))
-        for i in range(10):
-            state_representation[i] = np.where(self.game_state == i, 1, 0)
-        return state_representation
+        Get the mask of the valid actions, for agents that mask their policy.
 
+        The mask is not rebuilt on each call: `_uncoverTiles` clears it at the
+        newly revealed tiles only, and `reset` fills it again. A read-only view
+        is returned, so it reflects the later steps of the game; callers that
+        need to keep a mask should copy it.
 
-    def step(self, action):
+        Returns:
+        numpy.ndarray: A boolean array of shape (n * n,), True for the covered
+                    tiles, the actions that change the game state.
+        """
+        return self._action_mask_view
+
+
+    def step(self, action, out=None):
         """
         Executes a step in the Minesweeper game by taking the given action.
 
         The action corresponds to the selection of a tile on the Minesweeper board. If the game is not 
         yet initialized, this method will set up the game board before processing the action. Invalid actions 
-        (like choosing an already revealed tile) are handled and do not result in a change in the game state. 
+        (like choosing an already revealed tile) are handled and do not result in a change in the game state: they
+        are told apart by the action mask (see `action_masks`) before anything else, and return the unchanged observation. 
         If a mine is hit, the game ends. If a safe tile is uncovered, the game continues and the agent is rewarded.
+        The tiles uncovered by the action are listed in `newly_revealed` afterwards.
 
         Parameters:
         action (int): The action to be taken, represented as a linear index of a tile on the board.
+        out (numpy.ndarray, optional): An array of the shape of the observation space to copy the observation into.
+                                       By default, a read-only view of the environment's observation buffer is
+                                       returned instead.
 
         Returns:
         tuple: A 5-element tuple containing:
-            - game_state (numpy.ndarray): The current game state after taking the action.
+            - game_state (numpy.ndarray): The current game state after taking the action, in the form of the observation mode returned by `_convert_state`.
             - reward (int): The reward received for taking the action. Rewards are:
                 - -100 for hitting a mine,
                 - 100 for uncovering all safe tiles,
@@ -219,17 +508,15 @@ class Minesweeper(gym.Env):
             - False (bool): A placeholder value for truncation. Always False in the implementation.
             - {}: A placeholder for extra information. Contains a "result" string with "invalid action", "lose", "win", "continue" options.
         """
-        
+        self.newly_revealed = _NO_TILES
+
+        if not self._action_mask[action]: # do nothing as this is an invalid action - this tile has already been revealed
+            return self._convert_state(out), 0, False, False, {"result": "invalid action"}
+
         if self.game_not_initialized:
             self._setupGameBoard(action)
             self.game_not_initialized = False
         
-        if action in self.revealed_tiles: # do nothing as this is an invalid action - this tile has already been revealed
-            reward = 0
-            terminated = False
-            result = "invalid action"
-            return self._convert_state(), reward, terminated, False, {"result": result}
-        
         row, col = self._convertActionToCoordinates(action)
 
         if (self.board[row][col] == -1): # hit a mine and lose
@@ -240,7 +527,7 @@ class Minesweeper(gym.Env):
         else: # not hit a mine
             self._revealSafeTiles(row, col)
 
-            if(self.revealed_tiles == self.safe_tiles): # all safe tiles has been uncovered - victory!
+            if(self.safe_remaining == 0): # all safe tiles has been uncovered - victory!
                 reward = 100
                 terminated = True
                 result = "win"
@@ -249,7 +536,7 @@ class Minesweeper(gym.Env):
                 terminated = False
                 result = "continue"
         
-        return self._convert_state(), reward, terminated, False, {"result": result}
+        return self._convert_state(out), reward, terminated, False, {"result": result}
     
     def reset(self, seed = None):
         """
@@ -268,21 +555,30 @@ class Minesweeper(gym.Env):
         
         Returns:
         numpy.ndarray: The initial observation after resetting the game. The initial observation is a 3D numpy array 
-        of shape (10, n, n) representing the game state. All cells are covered at the start, so the last 
-        channel is filled with ones and the other channels are filled with zeros.
+        of shape (10, n, n) representing the game state, as a read-only view (see `_convert_state`). All cells are 
+        covered at the start, so the last channel is filled with ones and the other channels are filled with zeros.
+        In the compact observation modes, it is the observation of the mode instead.
         """
         # Reset the board
         self.board = np.zeros((self.n, self.n), dtype=int)
         
-        # Reset the game state
+        # Reset the game state and its one-hot representation
         self.game_state = np.ones((self.n, self.n), dtype=int) * 9
+        if self.observation_mode == 'int8':
+            self._observation[:] = 9
+        else:
+            self._observation[:] = 0
+            self._observation[9] = 1
+        self._packed_observation = None
+        self._action_mask[:] = True
 
         # Reset the state indicating that the game is not initialized
         self.game_not_initialized = True
 
-        # Reset the safe and revealed tiles
-        self.safe_tiles = set()
-        self.revealed_tiles = set()
+        # Reset the revealed tiles
+        self.revealed_mask = np.zeros((self.n, self.n), dtype=bool)
+        self.safe_remaining = 0
+        self.newly_revealed = _NO_TILES
 
         # Set new seed
         self.np_random = np.random.default_rng(seed)
@@ -312,13 +608,102 @@ class Minesweeper(gym.Env):
         else:
             raise NotImplementedError
 
+    def to_bytes(self):
+        """
+        Serialize the game into a compact binary blob.
+
+        The blob starts with a header holding the format version, the game status, n and m. Once the mines are
+        placed, it is followed by the mine bitmap and the revealed bitmap, each packed 8 tiles per byte in row-major
+        order. Everything else (the numbers on the board, the game state, the observation, the counters) is derived
+        from these and recomputed by `from_bytes`, so a 25 x 25 game fits in 166 bytes.
 
-        
+        The random number generator is not saved: a game loaded before its first action places its mines with a new,
+        unseeded generator. Whether such a game is a no-guess game is kept in its status.
 
+        Returns:
+        bytes: The serialized game.
+        """
+        if self.game_not_initialized:
+            status = GAME_NOT_INITIALIZED_NO_GUESS if self.no_guess else GAME_NOT_INITIALIZED
+            return STATE_HEADER.pack(STATE_FORMAT_VERSION, status, self.n, self.m)
 
-        
+        status = GAME_WON if self.safe_remaining == 0 else GAME_IN_PROGRESS
+        return (STATE_HEADER.pack(STATE_FORMAT_VERSION, status, self.n, self.m)
+                + np.packbits(self.board == -1).tobytes()
+                + np.packbits(self.revealed_mask).tobytes())
 
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuild a game serialized with `to_bytes`.
 
+        Parameters:
+        data (bytes): The serialized game.
 
-                
+        Returns:
+        Minesweeper: A new environment in the same state as the serialized one.
 
+        Raises:
+        ValueError: If the data is not a game serialized with a supported version of the format.
+        """
+        if len(data) < STATE_HEADER.size or data[0] != STATE_FORMAT_VERSION:
+            raise ValueError("Unsupported game state format")
+        _, status, n, m = STATE_HEADER.unpack_from(data)
+
+        if status in (GAME_NOT_INITIALIZED, GAME_NOT_INITIALIZED_NO_GUESS):
+            return cls(n, m, no_guess=status == GAME_NOT_INITIALIZED_NO_GUESS)
+
+        env = cls(n, m)
+
+        bitmap_size = (n * n + 7) // 8
+        if len(data) != STATE_HEADER.size + 2 * bitmap_size:
+            raise ValueError("Unsupported game state format")
+        bitmaps = np.unpackbits(np.frombuffer(data, dtype=np.uint8, offset=STATE_HEADER.size).reshape(2, bitmap_size), axis=1, count=n * n)
+
+        env._placeMines(np.flatnonzero(bitmaps[0]))
+        env._uncoverTiles(np.flatnonzero(bitmaps[1]))
+        env.game_not_initialized = False
+        return env
+
+
+def observation_space(n, observation_mode='onehot', num_envs=None):
+    """
+    Build the observation space of an observation mode.
+
+    Parameters:
+    n (int): The dimensions of the board.
+    observation_mode (str): One of `OBSERVATION_MODES`.
+    num_envs (int, optional): The number of boards of a batch, added as the first dimension.
+
+    Returns:
+    gymnasium.spaces.Box: A (10, n, n) uint8 space of 0 and 1 for 'onehot', a (n, n) int8 space of 0 to 9 for 'int8',
+                          and a (ceil(10 * n * n / 8),) uint8 space of bytes for 'packed'.
+    """
+    batch = (num_envs,) if num_envs is not None else ()
+    if observation_mode == 'int8':
+        return gym.spaces.Box(low=0, high=9, shape=batch + (n, n), dtype=np.int8)
+    if observation_mode == 'packed':
+        return gym.spaces.Box(low=0, high=255, shape=batch + ((10 * n * n + 7) // 8,), dtype=np.uint8)
+    return gym.spaces.Box(low=0, high=1, shape=batch + (10, n, n), dtype=np.uint8)
+
+
+def to_onehot(observations, observation_mode, n):
+    """
+    Expand compact observations to the 10-channel binary images of the 'onehot' mode, for a single observation or
+    for a batch of them (such as a minibatch from a replay buffer) in one vectorized operation.
+
+    Parameters:
+    observations (numpy.ndarray): Observations of the given mode, with any number of leading batch dimensions. The
+                                  game states of `trajectories`, n x n uint8, are expanded as 'int8' observations.
+    observation_mode (str): The mode of the observations, one of `OBSERVATION_MODES`.
+    n (int): The dimensions of the board.
+
+    Returns:
+    numpy.ndarray: The uint8 one-hot observations, of shape (..., 10, n, n).
+    """
+    observations = np.asarray(observations)
+    if observation_mode == 'int8':
+        return (observations[..., None, :, :] == np.arange(10, dtype=observations.dtype)[:, None, None]).view(np.uint8)
+    if observation_mode == 'packed':
+        return np.unpackbits(observations, axis=-1, count=10 * n * n).reshape(observations.shape[:-1] + (10, n, n))
+    return observations
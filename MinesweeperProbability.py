@@ -0,0 +1,309 @@
+import threading
+import time
+from collections import OrderedDict
+from math import comb, inf
+
+import numpy as np
+
+from MinesweeperSolver import MinesweeperSolver, _bits
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class MineProbabilityEngine:
+
+    def __init__(self, time_budget=1.0, cache_size=4096):
+        """
+        Initialize an engine computing the probability that each covered tile of a game holds a mine.
+
+        The probabilities are exact: every placement of the remaining mines that agrees with the revealed numbers is
+        equally likely. The engine first removes the tiles the deterministic solver can decide, then splits the
+        remaining frontier (the undetermined tiles next to a revealed number) into independent components, groups
+        of tiles linked by shared constraints.
+
+        Each component is counted on its own, by number of mines: the tiles are ordered so that each constraint
+        spans a short range of them, and the placements are counted from one tile to the next, merging the partial
+        placements that leave the same numbers of mines to place in the open constraints. A backward pass gives the
+        number of placements with each tile holding a mine. Component counts are memoized, so the components that
+        did not change since a previous call are not counted again.
+
+        The components are then combined, each placement of F mines on the frontier being weighted by the
+        comb(U, M - F) ways to place the M - F other remaining mines among the U covered tiles off the frontier.
+
+        If counting takes longer than the time budget, the probabilities are estimated instead: each frontier tile
+        gets the average density of the constraints it is part of, and the tiles off the frontier share the mines
+        left. `exact` tells which of the two was returned by the last call of the calling thread.
+
+        An engine can be shared by threads: each call gets its own deadline, and the memoized counts are guarded by
+        a lock.
+
+        Parameters:
+        time_budget (float, optional): The time, in seconds, after which the probabilities are estimated rather
+                                       than counted, for the calls not given a deadline. None for no limit.
+        cache_size (int): The number of component counts memoized.
+        """
+        self.time_budget = time_budget
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local() # whether the last call of each thread was exact
+
+    @property
+    def exact(self):
+        """
+        Whether the last call of the calling thread counted the probabilities, rather than estimating them.
+        """
+        return getattr(self._local, 'exact', True)
+
+    def probabilities(self, game_state, m, deadline=None):
+        """
+        Compute the mine probability of every tile of a game.
+
+        Parameters:
+        game_state (numpy.ndarray): The n x n game state, with 9 for covered tiles.
+        m (int): The number of mines on the board.
+        deadline (float, optional): The `time.monotonic()` time after which the probabilities are estimated rather
+                                    than counted, math.inf for no limit. By default, `time_budget` seconds from now.
+
+        Returns:
+        numpy.ndarray: An n x n float array with the probability that each tile holds a mine: 0 for revealed tiles
+                       and tiles known to be safe, 1 for tiles known to be mines.
+        """
+        n = game_state.shape[0]
+        if deadline is None and self.time_budget is not None:
+            deadline = time.monotonic() + self.time_budget
+
+        # Settle the tiles the deterministic rules can decide
+        solver = MinesweeperSolver(n, m)
+        solver.update(game_state)
+        probabilities = np.zeros(n * n)
+        probabilities[solver.mine_tiles()] = 1
+        mines_left = m - solver.mines.bit_count()
+
+        # Constraints of the frontier: undetermined tiles around each revealed number, and the mines left among them
+        constraints = []
+        frontier = 0
+        for tile in _bits(solver.frontier):
+            mask = solver._neighbor_masks[tile] & solver.unknown
+            if mask:
+                constraints.append((mask, solver.values[tile] - (solver._neighbor_masks[tile] & solver.mines).bit_count()))
+                frontier |= mask
+        outside = _bits(solver.unknown & ~frontier)
+
+        components = self._components(constraints)
+        try:
+            counts = [self._count(tiles, component_constraints, deadline) for tiles, component_constraints in components]
+        except _OutOfTime:
+            self._local.exact = False
+            return self._estimate(constraints, frontier, outside, mines_left, probabilities).reshape(n, n)
+        self._local.exact = True
+
+        # Distribution of the number of frontier mines of all the components but one, with prefix and suffix products
+        totals = [total for total, _ in counts]
+        prefix = [[1]]
+        for total in totals:
+            prefix.append(_convolve(prefix[-1], total))
+        suffix = [[1]]
+        for total in reversed(totals):
+            suffix.append(_convolve(suffix[-1], total))
+        suffix.reverse()
+
+        # Number of ways to place the mines left among the tiles off the frontier, for each number of frontier mines
+        outside_ways = [comb(len(outside), mines_left - frontier_mines) if 0 <= mines_left - frontier_mines <= len(outside) else 0
+                        for frontier_mines in range(len(prefix[-1]))]
+
+        weight = sum(ways * outside_ways[frontier_mines] for frontier_mines, ways in enumerate(prefix[-1]))
+        if weight == 0:
+            raise ValueError("The game state is not consistent with the number of mines.")
+
+        for index, ((tiles, _), (total, mine_counts)) in enumerate(zip(components, counts)):
+            others = _convolve(prefix[index], suffix[index + 1])
+            # Weight of each number of mines in this component, over the placements of the other mines
+            component_weights = [sum(ways * outside_ways[k + other_mines] for other_mines, ways in enumerate(others))
+                                 for k in range(len(total))]
+            for tile, mine_count in zip(tiles, mine_counts):
+                probabilities[tile] = sum(ways * component_weights[k] for k, ways in enumerate(mine_count)) / weight
+
+        if outside:
+            probabilities[outside] = sum(ways * (outside_ways[frontier_mines] * (mines_left - frontier_mines))
+                                         for frontier_mines, ways in enumerate(prefix[-1])) / (len(outside) * weight)
+        return probabilities.reshape(n, n)
+
+    def _components(self, constraints):
+        """
+        Split the frontier into components of tiles linked by shared constraints.
+
+        Returns:
+        list: For each component, its tiles in counting order and its constraints, as (positions of their tiles in
+              this order, mines left).
+        """
+        components = []
+        remaining = list(constraints)
+        while remaining:
+            # Grow a component from a constraint, in breadth-first order, so that each constraint spans few tiles
+            mask, left = remaining.pop()
+            component = [(mask, left)]
+            order = _bits(mask)
+            tiles = mask
+            grown = True
+            while grown:
+                grown = False
+                for index in range(len(remaining) - 1, -1, -1):
+                    other_mask, other_left = remaining[index]
+                    if other_mask & tiles:
+                        component.append(remaining.pop(index))
+                        order += _bits(other_mask & ~tiles)
+                        tiles |= other_mask
+                        grown = True
+            position = {tile: index for index, tile in enumerate(order)}
+            components.append((order, [(sorted(position[tile] for tile in _bits(mask)), left) for mask, left in component]))
+        return components
+
+    def _count(self, tiles, constraints, deadline):
+        """
+        Count the placements of mines on the tiles of a component that agree with its constraints.
+
+        Returns:
+        tuple: A 2-element tuple containing:
+            - total (list): The number of placements with k mines, for each k.
+            - mine_counts (list): For each tile, the number of placements with k mines in which it holds a mine.
+        """
+        key = tuple(sorted((tuple(positions), left) for positions, left in constraints)) + (len(tiles),)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        size = len(tiles)
+        first = [min(positions) for positions, _ in constraints]
+        last = [max(positions) for positions, _ in constraints]
+        of_tile = [[] for _ in range(size)]
+        for index, (positions, _) in enumerate(constraints):
+            for position in positions:
+                of_tile[position].append(index)
+        remaining_after = [[sum(1 for position in positions if position > i) for positions, _ in constraints] for i in range(size)]
+
+        # Constraints open at each boundary: started before it and not finished. A state is the tuple of their needs.
+        open_at = [[c for c in range(len(constraints)) if first[c] < i <= last[c]] for i in range(size + 1)]
+
+        # Forward pass, keeping the transitions between the states of consecutive boundaries
+        forward = [{(): [1]}]
+        transitions = []
+        for i in range(size):
+            if deadline is not None and time.monotonic() > deadline:
+                raise _OutOfTime()
+            slot = {c: index for index, c in enumerate(open_at[i])}
+            layer = {}
+            edges = []
+            for state, ways in forward[i].items():
+                for mine in (0, 1):
+                    needs = {c: state[slot[c]] for c in open_at[i]}
+                    feasible = True
+                    for c in of_tile[i]:
+                        need = (needs[c] if c in needs else constraints[c][1]) - mine
+                        if need < 0 or need > remaining_after[i][c]:
+                            feasible = False
+                            break
+                        needs[c] = need
+                    if not feasible:
+                        continue
+                    next_state = tuple(needs[c] for c in open_at[i + 1])
+                    edges.append((state, mine, next_state))
+                    shifted = [0] * mine + ways
+                    current = layer.get(next_state)
+                    layer[next_state] = shifted if current is None else _add(current, shifted)
+            forward.append(layer)
+            transitions.append(edges)
+
+        total = forward[size].get((), [0])
+
+        # Backward pass: the number of completions of each state, then the placements with each tile holding a mine
+        backward = {(): [1]}
+        mine_counts = [None] * size
+        for i in range(size - 1, -1, -1):
+            if deadline is not None and time.monotonic() > deadline:
+                raise _OutOfTime()
+            layer = {}
+            with_mine = [0]
+            for state, mine, next_state in transitions[i]:
+                completions = backward.get(next_state)
+                if completions is None:
+                    continue
+                shifted = [0] * mine + completions
+                current = layer.get(state)
+                layer[state] = shifted if current is None else _add(current, shifted)
+                if mine:
+                    with_mine = _add(with_mine, _convolve(forward[i][state], shifted))
+            backward = layer
+            mine_counts[i] = with_mine
+
+        result = (total, mine_counts)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _estimate(self, constraints, frontier, outside, mines_left, probabilities):
+        """
+        Estimate the probabilities when counting them would take too long: each frontier tile gets the average
+        density of mines in its constraints, and the tiles off the frontier share the mines expected to be left.
+        """
+        density_sum = {}
+        for mask, left in constraints:
+            density = left / mask.bit_count()
+            for tile in _bits(mask):
+                total, count = density_sum.get(tile, (0.0, 0))
+                density_sum[tile] = (total + density, count + 1)
+        for tile, (total, count) in density_sum.items():
+            probabilities[tile] = total / count
+        if outside:
+            expected_left = mines_left - sum(probabilities[tile] for tile in density_sum)
+            probabilities[outside] = min(max(expected_left / len(outside), 0.0), 1.0)
+        return probabilities
+
+
+def _add(a, b):
+    """
+    Add two polynomials given by their lists of coefficients.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    result = list(a)
+    for k, value in enumerate(b):
+        result[k] += value
+    return result
+
+
+def _convolve(a, b):
+    """
+    Multiply two polynomials given by their lists of coefficients.
+    """
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
+
+
+_default_engine = MineProbabilityEngine()
+
+def mine_probabilities(game_state, m, time_budget=1.0):
+    """
+    Compute the mine probability of every tile of a game, with a shared engine memoizing the component counts. The
+    time budget applies to this call only, so threads may call it with different budgets.
+
+    Parameters:
+    game_state (numpy.ndarray): The n x n game state, with 9 for covered tiles.
+    m (int): The number of mines on the board.
+    time_budget (float, optional): The time, in seconds, after which the probabilities are estimated rather than
+                                   counted. None for no limit.
+
+    Returns:
+    numpy.ndarray: An n x n float array with the probability that each tile holds a mine.
+    """
+    deadline = time.monotonic() + time_budget if time_budget is not None else inf
+    return _default_engine.probabilities(game_state, m, deadline)
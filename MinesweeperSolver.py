@@ -0,0 +1,301 @@
+import numpy as np
+
+
+# Neighborhood tables of the tiles, built once per board size
+_NEIGHBORHOODS = {}
+
+def _neighborhoods(n):
+    """
+    Get the neighborhoods of the tiles of an n x n board as bitsets: the 3x3 neighbors of each tile, and the tiles of
+    its 5x5 window, the only ones whose constraints can overlap with the constraint of the tile.
+    """
+    if n not in _NEIGHBORHOODS:
+        neighbor_masks = []
+        near_masks = []
+        for row in range(n):
+            for col in range(n):
+                neighbor_masks.append(sum(1 << (i * n + j) for i in range(max(row - 1, 0), min(row + 2, n))
+                                          for j in range(max(col - 1, 0), min(col + 2, n)) if (i, j) != (row, col)))
+                near_masks.append(sum(1 << (i * n + j) for i in range(max(row - 2, 0), min(row + 3, n))
+                                      for j in range(max(col - 2, 0), min(col + 3, n)) if (i, j) != (row, col)))
+        _NEIGHBORHOODS[n] = (neighbor_masks, near_masks)
+    return _NEIGHBORHOODS[n]
+
+
+class MinesweeperSolver:
+
+    def __init__(self, n, m):
+        """
+        Initialize a deterministic solver for a Minesweeper game of size n x n with m mines.
+
+        The solver finds the covered tiles that are guaranteed to be safe and the ones guaranteed to contain a mine,
+        from the numbers revealed so far. It only looks at the frontier: every revealed number with covered neighbors
+        that are not determined yet is a constraint, the number of mines left among these neighbors. Constraints are
+        deduced from with two rules:
+        - single-cell rules: if no mine is left, all the neighbors are safe, and if as many mines as neighbors are
+          left, all of them are mines.
+        - pairwise reduction: for two overlapping constraints, the number of mines in their intersection is bounded
+          by both of them, which may force the tiles outside of the intersection (this covers the subset rule).
+
+        The solver is updated incrementally with the tiles revealed by each step: only the constraints around these
+        tiles, or around the tiles deduced from them, are examined again. The pairwise reduction is postponed while
+        the single-cell rules find safe tiles, and completed when the deductions are read with `safe_tiles` or
+        `mine_tiles`, or when `next_safe` runs out of safe tiles.
+
+        Sets of tiles are held as Python integers used as bitsets, bit k standing for the tile of linear index k, so
+        the tiles around a set of tiles are found with a few shifts rather than tile by tile.
+
+        Parameters:
+        n (int): The dimensions of the board.
+        m (int): The number of mines on the board.
+        """
+        self.n = n
+        self.m = m
+        self.unknown = (1 << (n * n)) - 1 # covered tiles that are not determined yet
+        self.safe = 0 # covered tiles deduced to be safe
+        self.mines = 0 # tiles deduced to contain a mine
+        self.revealed = 0 # revealed tiles
+        self.frontier = 0 # revealed tiles that may still have undetermined neighbors, the constraints
+        self.values = [0] * (n * n) # numbers of the revealed tiles
+        self._dirty = 0 # tiles whose constraints are to be examined with the single-cell rules
+        self._pair_dirty = 0 # tiles whose constraints are to be examined with the pairwise reduction
+
+        self._neighbor_masks, self._near_masks = _neighborhoods(n)
+        self._all = (1 << (n * n)) - 1
+        self._not_first_column = sum(((1 << n) - 2) << (row * n) for row in range(n))
+        self._not_last_column = sum(((1 << (n - 1)) - 1) << (row * n) for row in range(n))
+
+    def _around(self, mask):
+        """
+        Get the tiles of a bitset along with all their neighbors.
+        """
+        row = mask | ((mask << 1) & self._not_first_column) | ((mask >> 1) & self._not_last_column)
+        return (row | (row << self.n) | (row >> self.n)) & self._all
+
+    def observe(self, env):
+        """
+        Update the solver with the tiles revealed by the last step of a game.
+
+        Parameters:
+        env (Minesweeper): The game, right after a step. Its `newly_revealed` tiles are read from `game_state`.
+        """
+        self.update(env.game_state, env.newly_revealed)
+
+    def update(self, game_state, newly_revealed=None):
+        """
+        Update the solver with newly revealed tiles and deduce what can be.
+
+        Parameters:
+        game_state (numpy.ndarray): The n x n game state, with 9 for covered tiles.
+        newly_revealed (array-like, optional): The linear indices of the tiles revealed since the last update. By
+                                               default, they are found by comparing `game_state` with the tiles
+                                               revealed so far, which works for a raw game state.
+        """
+        flat_state = game_state.reshape(-1)
+        if newly_revealed is None:
+            newly_revealed = np.flatnonzero(flat_state != 9)
+        tiles = newly_revealed.tolist() if isinstance(newly_revealed, np.ndarray) else list(newly_revealed)
+
+        revealed = 0
+        values = self.values
+        for tile, value in zip(tiles, flat_state[tiles].tolist()):
+            revealed |= 1 << tile
+            values[tile] = value
+        revealed &= ~self.revealed
+        if not revealed:
+            return
+
+        # The revealed tiles held no mine, and their numbers are new constraints
+        self.revealed |= revealed
+        self.unknown &= ~revealed
+        self.safe &= ~revealed
+        self.frontier |= revealed
+        self._dirty |= self._around(revealed)
+        self._propagate(pairs=False)
+
+    def _markSafe(self, mask):
+        """
+        Mark the tiles of a bitset as safe, and queue the constraints around them.
+        """
+        self.safe |= mask
+        self.unknown &= ~mask
+        self._dirty |= self._around(mask)
+
+    def _markMines(self, mask):
+        """
+        Mark the tiles of a bitset as mines, and queue the constraints around them.
+        """
+        self.mines |= mask
+        self.unknown &= ~mask
+        self._dirty |= self._around(mask)
+
+    def _propagate(self, pairs=True):
+        """
+        Examine the queued constraints until no more tiles can be deduced.
+
+        The single-cell rules are applied first, as they are cheap and settle most of the constraints. The pairwise
+        reduction only runs on the constraints they left, one at a time, going back to the single-cell rules as soon
+        as it deduces a tile. Without `pairs`, the constraints left are kept queued for a later pairwise reduction.
+        """
+        neighbor_masks = self._neighbor_masks
+        values = self.values
+        while True:
+            # Single-cell rules
+            while self._dirty & self.frontier:
+                queued = self._dirty & self.frontier
+                self._dirty = 0
+                while queued:
+                    bit = queued & -queued
+                    queued ^= bit
+                    tile = bit.bit_length() - 1
+                    mask = neighbor_masks[tile] & self.unknown
+                    if not mask:
+                        self.frontier ^= bit
+                        continue
+                    left = values[tile] - (neighbor_masks[tile] & self.mines).bit_count()
+                    if left == 0:
+                        self._markSafe(mask)
+                    elif left == mask.bit_count():
+                        self._markMines(mask)
+                    else:
+                        self._pair_dirty |= bit
+
+            self._pair_dirty &= self.frontier
+            if not pairs or not self._pair_dirty:
+                break
+
+            # Pairwise reduction with the overlapping constraints
+            bit = self._pair_dirty & -self._pair_dirty
+            self._pair_dirty ^= bit
+            tile = bit.bit_length() - 1
+            mask = neighbor_masks[tile] & self.unknown
+            left = values[tile] - (neighbor_masks[tile] & self.mines).bit_count()
+            size = mask.bit_count()
+            others = self._near_masks[tile] & self.frontier
+            while others:
+                other_bit = others & -others
+                others ^= other_bit
+                other = other_bit.bit_length() - 1
+                other_mask = neighbor_masks[other] & self.unknown
+                overlap = mask & other_mask
+                if not overlap:
+                    continue
+                other_left = values[other] - (neighbor_masks[other] & self.mines).bit_count()
+                only = mask & ~overlap
+                other_only = other_mask & ~overlap
+                overlap_size = overlap.bit_count()
+                only_size = size - overlap_size
+                other_only_size = other_mask.bit_count() - overlap_size
+
+                # Bounds on the number of mines in the intersection, from both constraints
+                low = max(0, left - only_size, other_left - other_only_size)
+                high = min(overlap_size, left, other_left)
+
+                # The tiles outside of the intersection hold between left - high and left - low mines
+                if only and left - low == 0:
+                    self._markSafe(only)
+                elif only and left - high == only_size:
+                    self._markMines(only)
+                elif other_only and other_left - low == 0:
+                    self._markSafe(other_only)
+                elif other_only and other_left - high == other_only_size:
+                    self._markMines(other_only)
+                else:
+                    continue
+                break
+
+        # Global rule: once all the mines are found, or all the undetermined tiles are mines
+        left = self.m - self.mines.bit_count()
+        if self.unknown and (left == 0 or left == self.unknown.bit_count()):
+            if left == 0:
+                self._markSafe(self.unknown)
+            else:
+                self._markMines(self.unknown)
+            self._propagate(pairs)
+
+    def safe_tiles(self):
+        """
+        The covered tiles guaranteed to be safe, as a sorted list of linear indices.
+        """
+        self._propagate()
+        return _bits(self.safe)
+
+    def mine_tiles(self):
+        """
+        The tiles guaranteed to contain a mine, as a sorted list of linear indices.
+        """
+        self._propagate()
+        return _bits(self.mines)
+
+    def next_safe(self):
+        """
+        Get a covered tile guaranteed to be safe, or None if there is none.
+        """
+        if not self.safe:
+            self._propagate()
+        if not self.safe:
+            return None
+        return (self.safe & -self.safe).bit_length() - 1
+
+
+def _bits(mask):
+    """
+    List the indices of the bits set in a bitset, in increasing order.
+    """
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+def solve(game_state, m):
+    """
+    Find the covered tiles guaranteed to be safe and the ones guaranteed to contain a mine in a game state.
+
+    Parameters:
+    game_state (numpy.ndarray): The n x n game state, with 9 for covered tiles.
+    m (int): The number of mines on the board.
+
+    Returns:
+    tuple: A 2-element tuple containing:
+        - safe (list): The linear indices of the covered tiles guaranteed to be safe.
+        - mines (list): The linear indices of the tiles guaranteed to contain a mine.
+    """
+    solver = MinesweeperSolver(game_state.shape[0], m)
+    solver.update(game_state)
+    return solver.safe_tiles(), solver.mine_tiles()
+
+
+def play(env, action, solver=None):
+    """
+    Play a game from a first action, revealing only tiles guaranteed to be safe, until the game is won or a guess
+    would be needed. All the tiles known to be safe are revealed before the solver is updated with their numbers.
+
+    Parameters:
+    env (Minesweeper): The game, reset and not started.
+    action (int): The first action.
+    solver (MinesweeperSolver, optional): The solver to use, by default a new one for the game.
+
+    Returns:
+    tuple: A 2-element tuple containing:
+        - won (bool): Whether the game was won without guessing.
+        - steps (int): The number of steps taken, including the first action.
+    """
+    if solver is None:
+        solver = MinesweeperSolver(env.n, env.m)
+    obs, reward, terminated, truncated, info = env.step(action)
+    solver.observe(env)
+    steps = 1
+    while not terminated:
+        if solver.next_safe() is None:
+            return False, steps
+        revealed = []
+        for tile in _bits(solver.safe):
+            if not env.revealed_mask.flat[tile]: # not revealed by an earlier tile of the batch
+                obs, reward, terminated, truncated, info = env.step(tile)
+                revealed.append(env.newly_revealed)
+                steps += 1
+        solver.update(env.game_state, np.concatenate(revealed))
+    return info['result'] == 'win', steps
@@ -0,0 +1,266 @@
+import multiprocessing
+
+import numpy as np
+import gymnasium as gym
+
+from MinesweeperEnv import OBSERVATION_MODES, Minesweeper, observation_space
+
+
+# Results of a step, stored by the workers as their index in this tuple
+RESULTS = ("continue", "invalid action", "lose", "win")
+_RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+_RESULT_NAMES = np.array(RESULTS, dtype=object)
+
+
+def _buffers(shared, num_envs, n, observation_mode):
+    """
+    Lay out the buffers of a batch of environments over one block of shared memory.
+
+    Parameters:
+    shared (multiprocessing.RawArray or None): The shared block, or None to get its size.
+    num_envs (int): The number of environments.
+    n (int): The dimensions of the boards.
+    observation_mode (str): The observation mode of the environments, which sets the shape of the observations.
+
+    Returns:
+    dict or int: The numpy arrays viewing the block, by name, or the size of the block in bytes.
+    """
+    space = observation_space(n, observation_mode, num_envs)
+    layout = [('actions', np.int64, (num_envs,)),
+              ('rewards', np.int64, (num_envs,)),
+              ('observations', space.dtype, space.shape),
+              ('final_observations', space.dtype, space.shape),
+              ('terminations', np.bool_, (num_envs,)),
+              ('results', np.int8, (num_envs,)),
+              ('action_masks', np.bool_, (num_envs, n * n))]
+    buffers = {}
+    offset = 0
+    for name, dtype, shape in layout:
+        offset = -(-offset // 8) * 8 # align every array on 8 bytes
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if shared is not None:
+            buffers[name] = np.frombuffer(shared, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=offset).reshape(shape)
+        offset += size
+    return buffers if shared is not None else offset
+
+
+def _worker(connection, shared, num_envs, n, m, observation_mode, start, stop, seeds):
+    """
+    Step the environments [start, stop) of a batch, reading their actions from the shared buffers and writing the
+    observations, rewards, flags, results and masks of the valid actions back into them. Each command of the parent is answered once the
+    buffers are written.
+
+    Commands:
+    ('step',): Step every environment with its action, resetting the ones whose game ended.
+    ('reset', seeds): Reset every environment, with new seed sequences if given.
+    ('close',): Stop the worker.
+    """
+    buffers = _buffers(shared, num_envs, n, observation_mode)
+    envs = [Minesweeper(n, m, observation_mode=observation_mode) for _ in range(start, stop)]
+    generators = [np.random.default_rng(seed) for seed in seeds]
+
+    def reset(index):
+        # A new game with the next boards of the generator of the environment, written into the shared observation
+        env = envs[index - start]
+        env.reset()
+        env.np_random = generators[index - start]
+        np.copyto(buffers['observations'][index], env._convert_state())
+        buffers['action_masks'][index] = True
+
+    try:
+        while True:
+            command = connection.recv()
+            if command[0] == 'step':
+                observations, rewards, terminations, results = buffers['observations'], buffers['rewards'], buffers['terminations'], buffers['results']
+                for index, action in zip(range(start, stop), buffers['actions'][start:stop].tolist()):
+                    env = envs[index - start]
+                    _, reward, terminated, _, info = env.step(action, out=observations[index])
+                    buffers['action_masks'][index, env.newly_revealed] = False # only the tiles revealed by the step
+                    rewards[index] = reward
+                    terminations[index] = terminated
+                    results[index] = _RESULT_CODES[info["result"]]
+                    if terminated:
+                        buffers['final_observations'][index] = observations[index]
+                        reset(index)
+            elif command[0] == 'reset':
+                if command[1] is not None:
+                    generators = [np.random.default_rng(seed) for seed in command[1][start:stop]]
+                for index in range(start, stop):
+                    reset(index)
+            elif command[0] == 'close':
+                break
+            connection.send(None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connection.close()
+
+
+class ParallelMinesweeper:
+
+    def __init__(self, num_envs, n, m, num_workers=None, seed=None, context=None, observation_mode='onehot'):
+        """
+        Initialize a batch of Minesweeper environments stepped by a pool of worker processes.
+
+        Each worker process runs `Minesweeper.step` for a contiguous share of the environments, so the batch is
+        stepped on every core. The workers and the parent share one block of memory holding the actions, the
+        observations, the rewards, the termination flags and the results of the whole batch, as numpy arrays: the
+        parent writes the actions there and sends a short command to each worker, which steps its environments with
+        their observations written in place by `Minesweeper.step` (see its `out` parameter). Nothing but the command
+        and its acknowledgment goes through the pipes, whatever the size of the boards.
+
+        The interface is the one of `VectorMinesweeper`: boards whose game ended in a step are reset automatically,
+        with their final observation in the infos.
+
+        Each environment draws its boards from its own generator, seeded by a child of the seed sequence of `seed`,
+        so the games only depend on the seed and on the actions, whatever the number of workers.
+
+        Parameters:
+        num_envs (int): The number of boards in the batch.
+        n (int): The dimensions of each board. Every board will be a square of size n x n.
+        m (int): The number of mines on each board.
+        num_workers (int, optional): The number of worker processes, at most one per environment. By default, one
+                                     per core.
+        seed (int, optional): An optional seed for the random number generators of the boards. If provided, this
+                              seed allows for the reproduction of specific game conditions.
+        context (str, optional): The multiprocessing start method of the workers ('fork', 'spawn' or
+                                 'forkserver'). By default, the one of the platform.
+        observation_mode (str, optional): The form of the observations of each board, 'onehot', 'int8' or 'packed',
+                                          as in `Minesweeper`. The compact modes also shrink the shared buffers.
+        """
+        if observation_mode not in OBSERVATION_MODES:
+            raise ValueError("Unknown observation mode %r, expected one of %s" % (observation_mode, ', '.join(OBSERVATION_MODES)))
+        self.num_envs = num_envs
+        self.n = n
+        self.m = m
+        self.observation_mode = observation_mode
+        self.num_workers = min(num_workers or multiprocessing.cpu_count(), num_envs)
+
+        self.single_action_space = gym.spaces.Discrete(self.n * self.n)
+        self.action_space = gym.spaces.MultiDiscrete([self.n * self.n] * self.num_envs)
+        self.single_observation_space = observation_space(self.n, observation_mode)
+        self.observation_space = observation_space(self.n, observation_mode, self.num_envs)
+
+        ctx = multiprocessing.get_context(context)
+        self._shared = ctx.RawArray('b', _buffers(None, num_envs, n, observation_mode))
+        self._buffers = _buffers(self._shared, num_envs, n, observation_mode)
+
+        # Split the environments into contiguous shares, the first workers taking one more if needed
+        bounds = np.linspace(0, num_envs, self.num_workers + 1).astype(int)
+        seeds = np.random.SeedSequence(seed).spawn(num_envs)
+        self._connections = []
+        self._workers = []
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            parent_connection, child_connection = ctx.Pipe()
+            worker = ctx.Process(target=_worker, args=(child_connection, self._shared, num_envs, n, m, observation_mode, start, stop, seeds[start:stop]),
+                                 daemon=True)
+            worker.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._workers.append(worker)
+        self.closed = False
+        self._command(('reset', None))
+
+    def _command(self, command):
+        """
+        Send a command to every worker, and wait until all of them have carried it out.
+        """
+        for connection in self._connections:
+            connection.send(command)
+        for connection in self._connections:
+            connection.recv()
+
+    def _observations(self):
+        """
+        A read-only view of the shared observations.
+        """
+        observations = self._buffers['observations'].view()
+        observations.flags.writeable = False
+        return observations
+
+    def action_masks(self):
+        """
+        Get the masks of the valid actions of the batch, as `VectorMinesweeper.action_masks`.
+
+        The workers keep the masks in the shared memory, clearing the tiles revealed by each step and filling the
+        masks of the boards they reset, so they are not rebuilt on each call.
+
+        Returns:
+        numpy.ndarray: A boolean array of shape (num_envs, n * n), True for the covered tiles of each board, as a
+                       read-only view of the shared buffer, which the next step overwrites.
+        """
+        action_masks = self._buffers['action_masks'].view()
+        action_masks.flags.writeable = False
+        return action_masks
+
+    def step(self, actions):
+        """
+        Executes a step on every board of the batch by taking the given actions, in the worker processes.
+
+        Parameters:
+        actions (array-like): One action per board, each represented as a linear index of a tile on the board.
+
+        Returns:
+        tuple: A 5-element tuple, as returned by `VectorMinesweeper.step`:
+            - observations (numpy.ndarray): The (num_envs, 10, n, n) observations after taking the actions, or the
+              compact observations of the observation mode, as a read-only view of the shared buffer, which the next step overwrites. Callers that need to keep an
+              observation should copy it.
+            - rewards (numpy.ndarray): The reward of each board.
+            - terminations (numpy.ndarray): A boolean flag per board indicating if its game has ended.
+            - truncations (numpy.ndarray): A placeholder boolean flag per board. Always False in the implementation.
+            - infos (dict): Extra information, with the "result" string of each board, and where boards terminated,
+              their observation just before they were reset in "final_obs" along with their mask in "_final_obs".
+        """
+        self._buffers['actions'][:] = actions
+        self._command(('step',))
+
+        terminations = self._buffers['terminations'].copy()
+        infos = {"result": _RESULT_NAMES[self._buffers['results']]}
+        if terminations.any():
+            infos["final_obs"] = self._buffers['final_observations'].copy()
+            infos["_final_obs"] = terminations.copy()
+        return self._observations(), self._buffers['rewards'].copy(), terminations, np.zeros(self.num_envs, dtype=bool), infos
+
+    def reset(self, seed=None):
+        """
+        Reset every board of the batch to its initial state.
+
+        Parameters:
+        seed (int, optional): A new seed for the random number generators of the boards. By default, the boards
+                              keep drawing from their current generators.
+
+        Returns:
+        numpy.ndarray: The initial observations, a read-only view of the shared buffer.
+        """
+        self._command(('reset', np.random.SeedSequence(seed).spawn(self.num_envs) if seed is not None else None))
+        return self._observations()
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for connection in self._connections:
+            try:
+                connection.send(('close',))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for connection in self._connections:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
@@ -0,0 +1,304 @@
+import numpy as np
+import gymnasium as gym
+
+from MinesweeperEnv import OBSERVATION_MODES, observation_space
+
+
+
+class VectorMinesweeper:
+
+    def __init__(self, num_envs, n, m, seed=None, board_cache=None, observation_mode='onehot'):
+        """
+        Initialize a batch of Minesweeper environments that are stepped together.
+
+        This class holds `num_envs` independent Minesweeper boards as stacked (num_envs x n x n) arrays and advances
+        all of them with a single call to `step`. Mine placement, flood fill and win/lose detection are computed with
+        array operations over the whole batch, so the cost of a step is dominated by NumPy rather than by the Python
+        interpreter. The rules, rewards and "result" strings are the same as the ones of `MinesweeperEnv.Minesweeper`.
+
+        Parameters:
+        num_envs (int): The number of boards in the batch.
+        n (int): The dimensions of each board. Every board will be a square of size n x n.
+        m (int): The number of mines on each board.
+        seed (int, optional): An optional seed for the random number generator shared by all the boards. If provided,
+                              this seed allows for the reproduction of specific game conditions.
+        board_cache (BoardCache, optional): A cache of precomputed boards to set up the boards from, see
+                                            `board_cache.BoardCache`. The boards are chosen with the seeded random
+                                            number generator, so a seed still reproduces the games.
+        observation_mode (str, optional): The form of the observations of each board, 'onehot', 'int8' or 'packed',
+                                          as in `Minesweeper`.
+
+        The function initializes the following batched state variables:
+
+        board (num_envs x n x n array): The actual board states, unknown to the agent. Each cell can be one of the
+                                        following:
+                                        - 0 to 8: The number of mines in the surrounding cells
+                                        - -1: Indicates a mine
+
+        game_state (num_envs x n x n array): The game states as seen by the player. Each cell can be one of the
+                                             following:
+                                             - 0 to 8: The number of mines in the surrounding cells (only for revealed cells)
+                                             - 9: Indicates a covered cell
+
+        game_not_initialized (num_envs array): A flag per board telling if its mines still have to be placed.
+
+        safe_remaining (num_envs array): The number of safe tiles that are still covered on each board.
+        """
+        if observation_mode not in OBSERVATION_MODES:
+            raise ValueError("Unknown observation mode %r, expected one of %s" % (observation_mode, ', '.join(OBSERVATION_MODES)))
+        self.num_envs = num_envs
+        self.n = n
+        self.m = m
+        self.np_random = np.random.default_rng(seed)
+        self.board_cache = board_cache
+        self.observation_mode = observation_mode
+
+        self.single_action_space = gym.spaces.Discrete(self.n * self.n)
+        self.action_space = gym.spaces.MultiDiscrete([self.n * self.n] * self.num_envs)
+        self.single_observation_space = observation_space(self.n, observation_mode)
+        self.observation_space = observation_space(self.n, observation_mode, self.num_envs)
+
+        self._resetBoards(np.arange(self.num_envs))
+
+    def _resetBoards(self, envs):
+        """
+        Reset the selected boards of the batch to the state of a game that has not started yet.
+
+        Parameters:
+        envs (numpy.ndarray): The indices of the boards to reset. Passing every index resets the whole batch.
+
+        Note:
+        This method modifies the object's state in-place. On first use it allocates the batched arrays.
+        """
+        if not hasattr(self, 'board'):
+            self.board = np.zeros((self.num_envs, self.n, self.n), dtype=np.int8)
+            self.game_state = np.full((self.num_envs, self.n, self.n), 9, dtype=np.int8)
+            self.game_not_initialized = np.ones(self.num_envs, dtype=bool)
+            self.safe_remaining = np.zeros(self.num_envs, dtype=int)
+            self._action_masks = np.ones((self.num_envs, self.n * self.n), dtype=bool) # valid actions - the covered tiles
+            self._action_masks_view = self._action_masks.view()
+            self._action_masks_view.flags.writeable = False
+
+        self.board[envs] = 0
+        self.game_state[envs] = 9
+        self._action_masks[envs] = True
+        self.game_not_initialized[envs] = True
+        self.safe_remaining[envs] = self.n * self.n - self.m
+
+    def _dilate(self, mask):
+        """
+        Grow a batch of boolean masks by one cell in each of the 8 directions.
+
+        Parameters:
+        mask (numpy.ndarray): A boolean array of shape (k, n, n).
+
+        Returns:
+        numpy.ndarray: A boolean array of shape (k, n, n) where a cell is True if it or any of its neighbors is True
+                       in `mask`.
+        """
+        padded = np.pad(mask, ((0, 0), (1, 1), (1, 1)))
+        grown = np.zeros_like(mask)
+        for i in range(3):
+            for j in range(3):
+                grown |= padded[:, i:i + self.n, j:j + self.n]
+        return grown
+
+    def _setupGameBoards(self, envs, actions):
+        """
+        Place the mines and compute the numbers for the selected boards, given the first action taken on each of them.
+
+        For every board, a 3x3 grid centered at the first action can not contain mines, in the same way as in
+        `Minesweeper._setupGameBoard`. Mines are drawn uniformly among the remaining cells of each board by giving
+        every cell a random key and keeping the m smallest ones, with the keys of the safe zone set to infinity. The
+        numbers of all the boards are then obtained at once by summing the 3x3 neighborhood of the mine masks.
+
+        With a board cache holding the configuration, the boards are instead taken from the cache, at indices drawn
+        with the random number generator, and set up for their first action by `BoardCache.take`.
+
+        Parameters:
+        envs (numpy.ndarray): The indices of the boards to set up.
+        actions (numpy.ndarray): The first action taken on each of these boards.
+
+        Note:
+        This method modifies the object's state in-place. The boards (`self.board`) of the selected environments
+        are updated.
+        """
+        boards = self.board_cache.boards(self.n, self.m) if self.board_cache is not None else None
+        if boards is not None:
+            _, self.board[envs] = self.board_cache.take(self.n, self.m, self.np_random.integers(len(boards), size=len(envs)), actions)
+            return
+
+        rows, cols = actions // self.n, actions % self.n
+        cells = np.arange(self.n * self.n)
+        safe_zone = ((np.abs(cells // self.n - rows[:, None]) <= 1) & # 3x3 grid surrounding the initial action can not contain mines
+                     (np.abs(cells % self.n - cols[:, None]) <= 1))
+
+        keys = self.np_random.random((len(envs), self.n * self.n))
+        keys[safe_zone] = np.inf
+        chosen = np.argpartition(keys, self.m - 1, axis=1)[:, :self.m]
+        mines = np.zeros((len(envs), self.n * self.n), dtype=bool)
+        np.put_along_axis(mines, chosen, True, axis=1)
+        mines = mines.reshape(len(envs), self.n, self.n)
+
+        # Count the mines in the 3x3 neighborhood of every cell, then mark the mines themselves
+        padded = np.pad(mines, ((0, 0), (1, 1), (1, 1))).astype(np.int8)
+        board = np.zeros((len(envs), self.n, self.n), dtype=np.int8)
+        for i in range(3):
+            for j in range(3):
+                board += padded[:, i:i + self.n, j:j + self.n]
+        board[mines] = -1
+        self.board[envs] = board
+
+    def _revealSafeTiles(self, envs, rows, cols):
+        """
+        Reveal the clicked tile of the selected boards, along with the whole safe zone around it.
+
+        This is the batched counterpart of `Minesweeper._revealSafeTiles`. Instead of a recursive search, the zero
+        region containing each clicked tile is grown one ring at a time with a 3x3 dilation restricted to the zero
+        tiles of its board, until no board changes anymore. The numbered tiles bordering the region are then revealed
+        with one last dilation. A click on a numbered tile only reveals that tile.
+
+        Parameters:
+        envs (numpy.ndarray): The indices of the boards that were clicked on a safe tile.
+        rows (numpy.ndarray): The row index of the clicked tile of each of these boards.
+        cols (numpy.ndarray): The column index of the clicked tile of each of these boards.
+
+        Note:
+        This method modifies the object's state in-place. The game states (`self.game_state`), the masks of valid
+        actions and the counts of covered safe tiles (`self.safe_remaining`) of the selected environments are
+        updated.
+        """
+        board = self.board[envs]
+        zeros = board == 0
+        region = np.zeros(board.shape, dtype=bool)
+        region[np.arange(len(envs)), rows, cols] = True
+        reveal = region.copy()
+
+        growing = zeros[np.arange(len(envs)), rows, cols]
+        while growing.any():
+            grown = self._dilate(region[growing]) & zeros[growing]
+            changed = (grown != region[growing]).any(axis=(1, 2))
+            region[growing] = grown
+            growing[np.flatnonzero(growing)[~changed]] = False
+        reveal |= self._dilate(region & zeros)
+
+        game_state = self.game_state[envs]
+        newly_revealed = reveal & (game_state == 9)
+        game_state[newly_revealed] = board[newly_revealed]
+        self.game_state[envs] = game_state
+        revealed_envs, revealed_rows, revealed_cols = np.nonzero(newly_revealed)
+        self._action_masks[envs[revealed_envs], revealed_rows * self.n + revealed_cols] = False
+        self.safe_remaining[envs] -= newly_revealed.sum(axis=(1, 2))
+
+    def _convert_state(self):
+        """
+        Convert the game states of the batch into the 10-channel representation used by `Minesweeper`, or into the
+        compact representation of the observation mode.
+
+        Returns:
+        numpy.ndarray: A 4D numpy array of shape (num_envs, 10, n, n) containing, for every board, the binary mask
+                       arrays of the 10 possible cell states (0-8 adjacent mines or covered). In the 'int8' mode, a
+                       copy of the (num_envs, n, n) game states, and in the 'packed' mode, the masks of each board
+                       packed 8 bits per byte.
+        """
+        if self.observation_mode == 'int8':
+            return self.game_state.copy()
+        onehot = (self.game_state[:, None] == np.arange(10, dtype=np.int8)[None, :, None, None]).view(np.uint8)
+        if self.observation_mode == 'packed':
+            return np.packbits(onehot.reshape(self.num_envs, -1), axis=1)
+        return onehot
+
+    def action_masks(self):
+        """
+        Get the masks of the valid actions of the batch, as `Minesweeper.action_masks`.
+
+        The masks are not rebuilt on each call: `_revealSafeTiles` clears them at the tiles revealed by each step,
+        and `_resetBoards` fills the masks of the boards it resets. A read-only view is returned, so it reflects the
+        later steps; callers that need to keep the masks should copy them.
+
+        Returns:
+        numpy.ndarray: A boolean array of shape (num_envs, n * n), True for the covered tiles of each board.
+        """
+        return self._action_masks_view
+
+    def step(self, actions):
+        """
+        Executes a step on every board of the batch by taking the given actions.
+
+        Each action is handled with the same rules as `Minesweeper.step`: the first action on a board sets up its
+        mines, choosing an already revealed tile is an invalid action, hitting a mine loses the game and uncovering
+        the last safe tile wins it. Boards whose game ended in this step are automatically reset, so the returned
+        observation of such a board is the one of a new game, and its final observation is kept in the infos.
+
+        Parameters:
+        actions (array-like): One action per board, each represented as a linear index of a tile on the board.
+
+        Returns:
+        tuple: A 5-element tuple containing:
+            - observations (numpy.ndarray): The (num_envs, 10, n, n) observations after taking the actions, or the
+              compact observations of the observation mode.
+            - rewards (numpy.ndarray): The reward of each board, with the same values as `Minesweeper.step`:
+                - -100 for hitting a mine,
+                - 100 for uncovering all safe tiles,
+                - 1 for uncovering a safe tile,
+                - 0 for taking an invalid action.
+            - terminations (numpy.ndarray): A boolean flag per board indicating if its game has ended.
+            - truncations (numpy.ndarray): A placeholder boolean flag per board. Always False in the implementation.
+            - infos (dict): Extra information, with the following entries:
+                - "result": The result string of each board ("invalid action", "lose", "win" or "continue").
+                - "final_obs": The observation of each board just before it was reset (only meaningful where
+                  the board terminated).
+                - "_final_obs": A boolean mask of the boards that terminated and were reset.
+        """
+        actions = np.asarray(actions, dtype=int)
+        envs = np.arange(self.num_envs)
+
+        new_games = np.flatnonzero(self.game_not_initialized)
+        if len(new_games) > 0:
+            self._setupGameBoards(new_games, actions[new_games])
+            self.game_not_initialized[new_games] = False
+
+        rows, cols = actions // self.n, actions % self.n
+        invalid = ~self._action_masks[envs, actions] # this tile has already been revealed
+        hit_mine = ~invalid & (self.board[envs, rows, cols] == -1)
+        safe = ~invalid & ~hit_mine
+
+        safe_envs = np.flatnonzero(safe)
+        if len(safe_envs) > 0:
+            self._revealSafeTiles(safe_envs, rows[safe_envs], cols[safe_envs])
+        win = safe & (self.safe_remaining == 0)
+
+        rewards = np.select([hit_mine, win, safe], [-100, 100, 1], default=0)
+        terminations = hit_mine | win
+        result = np.select([invalid, hit_mine, win], ["invalid action", "lose", "win"], default="continue").astype(object)
+
+        observations = self._convert_state()
+        infos = {"result": result}
+
+        finished = np.flatnonzero(terminations)
+        if len(finished) > 0:
+            infos["final_obs"] = observations.copy()
+            infos["_final_obs"] = terminations.copy()
+            self._resetBoards(finished)
+            observations[finished] = self._convert_state()[finished]
+
+        return observations, rewards, terminations, np.zeros(self.num_envs, dtype=bool), infos
+
+    def reset(self, seed=None):
+        """
+        Reset every board of the batch to its initial state.
+
+        It also creates a new random number generator with an optional seed. If a seed is provided, the batch will be
+        deterministic, meaning it will generate the same sequences given the same seed and the same actions.
+
+        Parameters:
+        seed (int, optional): The seed for the random number generator. Default is None, which results in a
+        non-deterministic environment.
+
+        Returns:
+        numpy.ndarray: The initial observations, a 4D numpy array of shape (num_envs, 10, n, n). All cells are
+        covered at the start, so the last channel is filled with ones and the other channels are filled with zeros.
+        """
+        self._resetBoards(np.arange(self.num_envs))
+        self.np_random = np.random.default_rng(seed)
+        return self._convert_state()
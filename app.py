@@ -1,9 +1,16 @@
-from flask import Flask, jsonify, render_template, request, session
+from flask import Flask, Response, g, jsonify, render_template, request, session
 from MinesweeperEnv import Minesweeper
+from ChunkedMinesweeper import ChunkedMinesweeper, viewport_response
+from board_pool import NoGuessBoardPool
+from board_cache import BoardCache
+from atomic_moves import MoveScript
+from session_cache import SessionCache
+from game_persistence import GamePersistence
+from metrics import Metrics, SIZE_BUCKETS
 import redis 
-import pickle 
 import uuid
 import os
+import time
 
 # Create the Flask application
 app = Flask(__name__)
@@ -11,10 +18,127 @@ app = Flask(__name__)
 # Setup configurations for the Flask application
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')  # Set the secret key for the session
 app.config['DEBUG'] = os.getenv('FLASK_DEBUG') == 'True'  # Set debug mode based on environment variable
+app.config['ATOMIC_MOVES'] = os.getenv('ATOMIC_MOVES') == 'True'  # Apply moves inside Redis with a Lua script
+app.config['SESSION_CACHE_SIZE'] = int(os.getenv('SESSION_CACHE_SIZE', '0'))  # Games cached per worker, 0 to disable the cache
+app.config['DATABASE_URL'] = os.getenv('DATABASE_URL')  # Database receiving the finished games, unset to not record them
+app.config['METRICS'] = os.getenv('METRICS', 'True') == 'True'  # Record latencies and counters, served on /metrics
+app.config['NO_GUESS_POOL_SIZE'] = int(os.getenv('NO_GUESS_POOL_SIZE', '0'))  # No-guess boards pregenerated per first click of the warmed configurations, 0 to generate them on demand
+app.config['NO_GUESS_WARM'] = os.getenv('NO_GUESS_WARM', '16:40')  # Comma-separated size:mines configurations pregenerated in the background, the only ones served from the pool
+app.config['NO_GUESS_MAX_ATTEMPTS'] = int(os.getenv('NO_GUESS_MAX_ATTEMPTS', '25'))  # Random boards drawn for a no-guess game not served from the pool, before falling back to a random board
+app.config['BOARD_CACHE_DIR'] = os.getenv('BOARD_CACHE_DIR')  # Directory of the memory-mapped board cache, unset to draw every board
+app.config['BOARD_CACHE_CONFIGS'] = os.getenv('BOARD_CACHE_CONFIGS', '16:40')  # Comma-separated size:mines configurations served from the board cache
+app.config['BOARD_CACHE_SIZE'] = int(os.getenv('BOARD_CACHE_SIZE', '65536'))  # Boards per configuration of the board cache, the distinct layouts the players get
+app.config['CHUNKED_BOARD_MAX'] = int(os.getenv('CHUNKED_BOARD_MAX', '1000'))  # Maximum number of rows and of columns of a rectangular board
+app.config['CHUNKED_MIN_DENSITY'] = float(os.getenv('CHUNKED_MIN_DENSITY', '0.12'))  # Minimum share of mines on a rectangular board, keeping the cascade of a click small
+app.config['VIEWPORT_MAX'] = int(os.getenv('VIEWPORT_MAX', '100'))  # Maximum number of rows and of columns of the viewport of a rectangular board
+
+# Pregenerate the boards of the no-guess games of the warmed configurations in the background, the other ones being
+# generated on demand within a bounded number of draws
+Minesweeper.no_guess_max_attempts = app.config['NO_GUESS_MAX_ATTEMPTS']
+if app.config['NO_GUESS_POOL_SIZE'] > 0:
+    Minesweeper.board_pool = NoGuessBoardPool(size=app.config['NO_GUESS_POOL_SIZE'])
+    for configuration in filter(None, app.config['NO_GUESS_WARM'].split(',')):
+        size, mines = configuration.split(':')
+        Minesweeper.board_pool.warm(int(size), int(mines))
+
+# Serve the boards of the popular configurations from precomputed boards shared by the workers
+if app.config['BOARD_CACHE_DIR']:
+    Minesweeper.board_cache = BoardCache(app.config['BOARD_CACHE_DIR'], app.config['BOARD_CACHE_SIZE'], configurations=[
+        tuple(int(value) for value in configuration.split(':')) for configuration in filter(None, app.config['BOARD_CACHE_CONFIGS'].split(','))])
 
 # Establish connection to Redis
 r = redis.from_url(os.getenv("REDIS_URL"))
 
+# Register the script applying moves atomically inside Redis
+move_script = MoveScript(r) if app.config['ATOMIC_MOVES'] else None
+
+# Keep the live games of this worker in memory, written behind to Redis
+session_cache = SessionCache(r, max_size=app.config['SESSION_CACHE_SIZE']) if app.config['SESSION_CACHE_SIZE'] > 0 else None
+
+# Record the moves of the games, and write the finished games to the database in the background
+game_records = GamePersistence(r, app.config['DATABASE_URL']) if app.config['DATABASE_URL'] else None
+
+# Declare the metrics of the application, with the counters of its caches read when the metrics are served
+metrics = Metrics(enabled=app.config['METRICS'])
+metrics.histogram('minesweeper_request_seconds', "Time to serve a request, by route, method and status.")
+metrics.histogram('minesweeper_stage_seconds', "Time spent in each stage of a request, by route and stage.")
+metrics.histogram('minesweeper_request_redis_round_trips', "Redis round trips made by a request, by route.", SIZE_BUCKETS)
+metrics.histogram('minesweeper_session_bytes', "Size of a game serialized for Redis.", (16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+metrics.histogram('minesweeper_revealed_tiles', "Tiles revealed by a move.", SIZE_BUCKETS)
+metrics.instrument_redis(r, 'minesweeper_redis_round_trips_total')
+if session_cache is not None:
+    metrics.add_collector('minesweeper_session_cache', "Counters of the cache of live games of this worker.", session_cache.stats)
+if game_records is not None:
+    metrics.add_collector('minesweeper_game_records', "Counters of the pipeline writing the finished games to the database.", game_records.stats)
+if Minesweeper.board_pool is not None:
+    metrics.add_collector('minesweeper_board_pool', "Counters of the pool of no-guess boards.", Minesweeper.board_pool.stats)
+if Minesweeper.board_cache is not None:
+    metrics.add_collector('minesweeper_board_cache', "Counters of the cache of precomputed boards.", Minesweeper.board_cache.stats)
+
+def timed(stage):
+    # Time a stage of the current request
+    return metrics.stage('minesweeper_stage_seconds', route=request.url_rule.rule, stage=stage)
+
+if metrics.enabled:
+    @app.before_request
+    def start_timer():
+        # Start timing the request and counting its Redis round trips
+        g.request_start = time.perf_counter()
+        metrics.round_trips(reset=True)
+
+    @app.after_request
+    def record_request(response):
+        # Record the time and the Redis round trips of the request
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('minesweeper_request_seconds', time.perf_counter() - g.request_start, route=route,
+                        method=request.method, status=response.status_code)
+        metrics.observe('minesweeper_request_redis_round_trips', metrics.round_trips(), route=route)
+        return response
+
+def load_game(key):
+    # Get the game from the worker's cache, or retrieve the serialized game instance from Redis
+    if session_cache is not None:
+        with timed('cache_get'):
+            return session_cache.get(key)
+    with timed('redis_get'):
+        serialized_env = r.get('env_' + key)
+    try:
+        # Deserialize the game instance
+        with timed('decode'):
+            return Minesweeper.from_bytes(serialized_env) if serialized_env is not None else None
+    except ValueError:  # stored with an older format
+        return None
+
+def store_game(key, env, flush=True):
+    # Serialize the game instance and store it in Redis with a 2 hour expiration time, right away unless it is cached
+    if session_cache is not None:
+        with timed('cache_put'):
+            session_cache.put(key, env, flush=flush)
+    else:
+        with timed('encode'):
+            serialized_env = env.to_bytes()
+        metrics.observe('minesweeper_session_bytes', len(serialized_env))
+        with timed('redis_set'):
+            r.set('env_' + key, serialized_env, 60 * 60 * 2)
+
+def load_chunked_game(key):
+    # Retrieve the serialized chunked game from Redis, stored apart from the square games
+    with timed('redis_get'):
+        serialized_env = r.get('chunked_' + key)
+    try:
+        with timed('decode'):
+            return ChunkedMinesweeper.from_bytes(serialized_env) if serialized_env is not None else None
+    except ValueError:  # stored with an older format
+        return None
+
+def store_chunked_game(key, env):
+    # Serialize the chunked game and store it in Redis with a 2 hour expiration time
+    with timed('encode'):
+        serialized_env = env.to_bytes()
+    metrics.observe('minesweeper_session_bytes', len(serialized_env))
+    with timed('redis_set'):
+        r.set('chunked_' + key, serialized_env, 60 * 60 * 2)
+
 @app.route('/')
 def home():
     # Check if a UUID exists for the current session, if not generate one
@@ -27,6 +151,18 @@ def home():
 def start():
     # Get the data from the incoming request
     data = request.get_json()
+
+    # A board given by its rows and columns is played on a chunked board, whose moves are answered within a viewport
+    if 'rows' in data:
+        rows, cols, m = int(data['rows']), int(data['cols']), int(data['numMines'])
+        if not (4 <= rows <= app.config['CHUNKED_BOARD_MAX']) or not (4 <= cols <= app.config['CHUNKED_BOARD_MAX']) or not (max(1, rows*cols*app.config['CHUNKED_MIN_DENSITY']) <= m <= rows*cols - 10):
+            return "Invalid input. Please ensure the numbers of rows and columns are integers between 4 and %d, and the number of mines is an integer between (rows * columns * %g) and (rows * columns - 10)." % (app.config['CHUNKED_BOARD_MAX'], app.config['CHUNKED_MIN_DENSITY']), 400
+        store_chunked_game(session['uuid'], ChunkedMinesweeper(rows, cols, m))
+        session['chunked'] = True
+        session.pop('board_size', None)
+        return jsonify({})
+    session.pop('chunked', None)
+
     n = int(data['boardSize'])
     m = int(data['numMines'])
 
@@ -35,12 +171,15 @@ def start():
         return "Invalid input. Please ensure the board size is an integer between 4 and 25, and the number of mines is an integer between 1 and (board size ^ 2 - 10).", 400
 
     # Create an instance of the Minesweeper game with the received board size and number of mines
-    env = Minesweeper(n, m)
+    env = Minesweeper(n, m, no_guess=bool(data.get('noGuess', False)))
     _ = env.reset()
 
-    # Serialize the game instance using pickle and store it in Redis with a 2 hour expiration time
-    pickled_env = pickle.dumps(env)
-    r.set('env_' + session['uuid'], pickled_env, 60 * 60 * 2)
+    # Serialize the game instance into its compact binary form and store it in Redis with a 2 hour expiration time
+    store_game(session['uuid'], env)
+    session['board_size'] = n  # lets /move check the actions before loading the game
+    if game_records is not None:
+        with timed('record'):
+            game_records.start_game(session['uuid'])
 
     # Return an empty JSON as response
     return jsonify({})
@@ -49,33 +188,155 @@ def start():
 def move():
     # Get the action from the incoming request
     data = request.get_json()
-    action = int(data['action'])
+    action = data.get('action') if isinstance(data, dict) else None
+    if not isinstance(action, int) or isinstance(action, bool):  # missing or not an integer, rejected below
+        action = -1
+
+    if session.get('chunked'):
+        return move_chunked(data, action)
 
-    # Retrieve the serialized game instance from Redis using the session's UUID
-    pickled_env = r.get('env_' + session['uuid'])
-    if pickled_env is None:
+    # Reject the actions off the board before any of the paths below applies them, from the board size kept by /start
+    if 'board_size' not in session:
         return "Game not started or game was deleted 2 hours after last move. Please start the game first", 400
-    # Deserialize the game instance
-    env = pickle.loads(pickled_env)
+    if not 0 <= action < session['board_size'] ** 2:
+        return "Invalid input. The action should be an integer between 0 and (board size ^ 2 - 1).", 400
+
+    if app.config['ATOMIC_MOVES']:
+        # Apply the move inside Redis, in a single round trip that can not race with another click
+        with timed('script'):
+            outcome = move_script.move('env_' + session['uuid'], action, 60 * 60 * 2, return_state=bool(data.get('resync')))
+        if outcome is None:
+            return "Game not started or game was deleted 2 hours after last move. Please start the game first", 400
+        result, revealed, values, serialized_env = outcome
+        info = {'result': result}
+
+        # The updated game is only sent back when the response needs more than the revealed tiles
+        env = None
+        if serialized_env is not None:
+            with timed('decode'):
+                env = Minesweeper.from_bytes(serialized_env)
+    else:
+        # Retrieve the game instance using the session's UUID
+        env = load_game(session['uuid'])
+        if env is None:
+            return "Game not started or game was deleted 2 hours after last move. Please start the game first", 400
 
-    # Make a move in the game
-    obs, reward, terminated, truncated, info = env.step(action)
+        # Make a move in the game
+        with timed('step'):
+            obs, reward, terminated, truncated, info = env.step(action)
 
-    # Serialize the updated game instance and store it back in Redis with a 2 hour expiration time
-    pickled_env = pickle.dumps(env)
-    r.set('env_' + session['uuid'], pickled_env, 60 * 60 * 2)
+        # Store the updated game instance back, writing it to Redis right away if the game has ended
+        store_game(session['uuid'], env, flush=terminated)
 
-    # Get the current state of the game board and convert it into a list
-    obs_list = env.game_state.tolist()
+        revealed = env.newly_revealed.tolist()
+        values = env.game_state.flat[env.newly_revealed].tolist()
 
-    response_data = {'board': obs_list, 'info': info}
+    metrics.observe('minesweeper_revealed_tiles', len(revealed))
+
+    # Record the move, the game being queued for the database if it has ended
+    if game_records is not None:
+        with timed('record'):
+            game_records.record_move(session['uuid'], action, env, info['result'], user_id=session.get('user_id'))
+
+    # Send only the tiles revealed by this move, as linear indices with their values
+    response_data = {
+        'revealed': revealed,
+        'values': values,
+        'info': info
+    }
+
+    # If the client asked to resync, include the whole game board as a list
+    if data.get('resync'):
+        response_data['board'] = env.game_state.tolist()
 
     # If the game has ended, include the actual board in the response.
     if info['result'] in ['win', 'lose']:
         response_data['actual_board'] = env.board.tolist()
 
-    # Return the current game board and game info as response
-    return jsonify(response_data)
+    # Return the changes of the game board and game info as response
+    with timed('json'):
+        return jsonify(response_data)
+
+def move_chunked(data, action):
+    # Retrieve the chunked game, and fit the viewport of the client to its board
+    env = load_chunked_game(session['uuid'])
+    if env is None:
+        return "Game not started or game was deleted 2 hours after last move. Please start the game first", 400
+    if not 0 <= action < env.rows * env.cols:
+        return "Invalid input. The action is out of the board.", 400
+    try:
+        viewport = env.clip_viewport(data.get('viewport'), action, app.config['VIEWPORT_MAX'])
+    except (KeyError, TypeError, ValueError):
+        return "Invalid input. The viewport should be given as {row, col, rows, cols}.", 400
+
+    # Make a move in the game, and store it back
+    with timed('step'):
+        info = env.step(action, viewport)
+    store_chunked_game(session['uuid'], env)
+    metrics.observe('minesweeper_revealed_tiles', env.newly_count)
+
+    # Send only the tiles revealed by this move inside the viewport, and its mines once the game has ended
+    with timed('json'):
+        return jsonify(viewport_response(env, viewport, info, resync=bool(data.get('resync'))))
+
+@app.route('/view', methods=['POST'])
+def view():
+    # Views are served for the chunked boards, which are not sent whole
+    if not session.get('chunked'):
+        return "Views are only served for the boards started with rows and columns.", 400
+    env = load_chunked_game(session['uuid'])
+    if env is None:
+        return "Game not started or game was deleted 2 hours after last move. Please start the game first", 400
+    try:
+        viewport = env.clip_viewport((request.get_json() or {}).get('viewport'), max_size=app.config['VIEWPORT_MAX'])
+    except (KeyError, TypeError, ValueError):
+        return "Invalid input. The viewport should be given as {row, col, rows, cols}.", 400
+
+    # Return the revealed tiles of the viewport, as the client scrolls over the board
+    with timed('json'):
+        return jsonify(viewport_response(env, viewport))
+
+@app.route('/stats')
+def stats():
+    # Statistics are only kept when the finished games are written to a database
+    if game_records is None:
+        return "Statistics are not available.", 404
+
+    # Return the statistics of a player, or of all the games, for each board configuration
+    user_id = request.args.get('user_id', type=int)
+    return jsonify({'stats': game_records.game_stats(user_id)})
+
+@app.route('/leaderboard')
+def leaderboard():
+    # Statistics are only kept when the finished games are written to a database
+    if game_records is None:
+        return "Statistics are not available.", 404
+
+    # Get the board configuration, the page size and the position of the page from the query string
+    board_size = request.args.get('board_size', type=int)
+    mines = request.args.get('mines', type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    after = request.args.get('after')
+    if board_size is None or mines is None:
+        return "Invalid input. Please provide the board size and the number of mines.", 400
+    try:
+        after = tuple(int(value) for value in after.split(',')) if after else None
+    except ValueError:
+        after = ()
+    if after is not None and len(after) != 2:
+        return "Invalid input. The position of the page should be given as 'after=<best_time_ms>,<user_id>'.", 400
+
+    # Return a page of the players ranked by their fastest win, with the position of the next page
+    return jsonify(game_records.leaderboard(board_size, mines, limit, after))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Metrics are only served when they are recorded
+    if not metrics.enabled:
+        return "Metrics are not enabled.", 404
+
+    # Return the metrics of this worker in the Prometheus text format
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # Run the Flask application
 if __name__ == '__main__':
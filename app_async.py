@@ -0,0 +1,320 @@
+from quart import Quart, jsonify, render_template, request, session, websocket
+from concurrent.futures import ThreadPoolExecutor
+from MinesweeperEnv import Minesweeper
+from ChunkedMinesweeper import ChunkedMinesweeper, viewport_response
+from board_pool import NoGuessBoardPool
+from board_cache import BoardCache
+from game_persistence import GamePersistence
+import redis.asyncio as redis
+from redis import Redis
+import asyncio
+import json
+import time
+import uuid
+import os
+
+# Create the Quart application, the asyncio counterpart of the Flask application in app.py. It serves the same
+# routes with the same session cookies and responses, and can be run with an ASGI server: hypercorn app_async:app
+app = Quart(__name__)
+
+# Setup configurations for the Quart application
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')  # Set the secret key for the session
+app.config['DEBUG'] = os.getenv('FLASK_DEBUG') == 'True'  # Set debug mode based on environment variable
+app.config['REDIS_MAX_CONNECTIONS'] = int(os.getenv('REDIS_MAX_CONNECTIONS', '32'))  # Size of the Redis connection pool
+app.config['STEP_WORKERS'] = int(os.getenv('STEP_WORKERS', '2'))  # Threads running the game logic
+app.config['DATABASE_URL'] = os.getenv('DATABASE_URL')  # Database receiving the finished games, unset to not record them
+app.config['WS_PERSIST_MOVES'] = int(os.getenv('WS_PERSIST_MOVES', '20'))  # Moves between two writes of a WebSocket game to Redis
+app.config['WS_PERSIST_INTERVAL'] = float(os.getenv('WS_PERSIST_INTERVAL', '5'))  # Seconds between two writes of a WebSocket game to Redis
+app.config['NO_GUESS_POOL_SIZE'] = int(os.getenv('NO_GUESS_POOL_SIZE', '0'))  # No-guess boards pregenerated per first click of the warmed configurations, 0 to generate them on demand
+app.config['NO_GUESS_WARM'] = os.getenv('NO_GUESS_WARM', '16:40')  # Comma-separated size:mines configurations pregenerated in the background, the only ones served from the pool
+app.config['NO_GUESS_MAX_ATTEMPTS'] = int(os.getenv('NO_GUESS_MAX_ATTEMPTS', '25'))  # Random boards drawn for a no-guess game not served from the pool, before falling back to a random board
+app.config['BOARD_CACHE_DIR'] = os.getenv('BOARD_CACHE_DIR')  # Directory of the memory-mapped board cache, unset to draw every board
+app.config['BOARD_CACHE_CONFIGS'] = os.getenv('BOARD_CACHE_CONFIGS', '16:40')  # Comma-separated size:mines configurations served from the board cache
+app.config['BOARD_CACHE_SIZE'] = int(os.getenv('BOARD_CACHE_SIZE', '65536'))  # Boards per configuration of the board cache, the distinct layouts the players get
+app.config['CHUNKED_BOARD_MAX'] = int(os.getenv('CHUNKED_BOARD_MAX', '1000'))  # Maximum number of rows and of columns of a rectangular board
+app.config['CHUNKED_MIN_DENSITY'] = float(os.getenv('CHUNKED_MIN_DENSITY', '0.12'))  # Minimum share of mines on a rectangular board, keeping the cascade of a click small
+app.config['VIEWPORT_MAX'] = int(os.getenv('VIEWPORT_MAX', '100'))  # Maximum number of rows and of columns of the viewport of a rectangular board
+
+# Pregenerate the boards of the no-guess games of the warmed configurations in the background, the other ones being
+# generated on demand within a bounded number of draws
+Minesweeper.no_guess_max_attempts = app.config['NO_GUESS_MAX_ATTEMPTS']
+if app.config['NO_GUESS_POOL_SIZE'] > 0:
+    Minesweeper.board_pool = NoGuessBoardPool(size=app.config['NO_GUESS_POOL_SIZE'])
+    for configuration in filter(None, app.config['NO_GUESS_WARM'].split(',')):
+        size, mines = configuration.split(':')
+        Minesweeper.board_pool.warm(int(size), int(mines))
+
+# Serve the boards of the popular configurations from precomputed boards shared by the workers
+if app.config['BOARD_CACHE_DIR']:
+    Minesweeper.board_cache = BoardCache(app.config['BOARD_CACHE_DIR'], app.config['BOARD_CACHE_SIZE'], configurations=[
+        tuple(int(value) for value in configuration.split(':')) for configuration in filter(None, app.config['BOARD_CACHE_CONFIGS'].split(','))])
+
+# Establish a pool of connections to Redis. Requests wait for a free connection when all of them are in use.
+r = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(os.getenv("REDIS_URL"), max_connections=app.config['REDIS_MAX_CONNECTIONS']))
+
+# Run the CPU-bound game logic outside of the event loop
+executor = ThreadPoolExecutor(max_workers=app.config['STEP_WORKERS'])
+
+# Record the moves of the games, and write the finished games to the database in the background. The pipeline uses a
+# blocking Redis client, so it is only called on the executor.
+game_records = GamePersistence(Redis.from_url(os.getenv("REDIS_URL")), app.config['DATABASE_URL']) if app.config['DATABASE_URL'] else None
+
+INVALID_INPUT = "Invalid input. Please ensure the board size is an integer between 4 and 25, and the number of mines is an integer between 1 and (board size ^ 2 - 10)."
+GAME_NOT_STARTED = "Game not started or game was deleted 2 hours after last move. Please start the game first"
+INVALID_VIEWPORT = "Invalid input. The viewport should be given as {row, col, rows, cols}."
+INVALID_ACTION = "Invalid input. The action should be an integer between 0 and (board size ^ 2 - 1)."
+INVALID_MESSAGE = "Invalid message. Messages should be JSON objects with a type of 'start' or 'move'."
+INVALID_CHUNKED_INPUT = "Invalid input. Please ensure the numbers of rows and columns are integers between 4 and %d, and the number of mines is an integer between (rows * columns * %g) and (rows * columns - 10)."
+
+def move_response(env, info, resync):
+    # Send only the tiles revealed by this move, as linear indices with their values
+    response_data = {
+        'revealed': env.newly_revealed.tolist(),
+        'values': env.game_state.flat[env.newly_revealed].tolist(),
+        'info': info
+    }
+
+    # If the client asked to resync, include the whole game board as a list
+    if resync:
+        response_data['board'] = env.game_state.tolist()
+
+    # If the game has ended, include the actual board in the response.
+    if info['result'] in ['win', 'lose']:
+        response_data['actual_board'] = env.board.tolist()
+
+    return response_data
+
+def play_move(serialized_env, action, resync, key=None, user_id=None):
+    # Deserialize the game instance, make a move, record it and build the response, as in the /move route of app.py
+    try:
+        env = Minesweeper.from_bytes(serialized_env)
+    except ValueError:  # stored with an older format
+        return None, GAME_NOT_STARTED
+    if not 0 <= action < env.n * env.n:  # a game started over the WebSocket, whose board size the session does not hold
+        return None, INVALID_ACTION
+    obs, reward, terminated, truncated, info = env.step(action)
+    record_move(key, action, env, info, user_id)
+    return env.to_bytes(), move_response(env, info, resync)
+
+def play_socket_move(env, action, resync, key, user_id=None):
+    # Make a move in the game kept by a WebSocket connection, record it and build the response. Called on the
+    # executor, as the first move of a no-guess game may generate its board.
+    obs, reward, terminated, truncated, info = env.step(action)
+    record_move(key, action, env, info, user_id)
+    return terminated, move_response(env, info, resync)
+
+def record_move(key, action, env, info, user_id=None):
+    # Record the move, the game being queued for the database if it has ended. Called on the executor.
+    if game_records is not None:
+        game_records.record_move(key, action, env, info['result'], user_id=user_id)
+
+def start_recording(key):
+    # Start recording the moves of a new game. Called on the executor.
+    if game_records is not None:
+        game_records.start_game(key)
+
+def play_chunked_move(serialized_env, action, data):
+    # Deserialize the chunked game, make a move and build the response within the viewport, as in move_chunked of app.py
+    try:
+        env = ChunkedMinesweeper.from_bytes(serialized_env)
+    except ValueError:  # stored with an older format
+        return None, GAME_NOT_STARTED
+    if not 0 <= action < env.rows * env.cols:
+        return None, "Invalid input. The action is out of the board."
+    try:
+        viewport = env.clip_viewport(data.get('viewport'), action, app.config['VIEWPORT_MAX'])
+    except (KeyError, TypeError, ValueError):
+        return None, INVALID_VIEWPORT
+    info = env.step(action, viewport)
+    return env.to_bytes(), viewport_response(env, viewport, info, resync=bool(data.get('resync')))
+
+def view_chunked_game(serialized_env, viewport):
+    # Deserialize the chunked game and build the response within the viewport, as in the /view route of app.py
+    try:
+        env = ChunkedMinesweeper.from_bytes(serialized_env)
+    except ValueError:  # stored with an older format
+        return GAME_NOT_STARTED
+    try:
+        return viewport_response(env, env.clip_viewport(viewport, max_size=app.config['VIEWPORT_MAX']))
+    except (KeyError, TypeError, ValueError):
+        return INVALID_VIEWPORT
+
+@app.route('/')
+async def home():
+    # Check if a UUID exists for the current session, if not generate one
+    if 'uuid' not in session:
+        session['uuid'] = str(uuid.uuid4())
+    # Render the main page of the application, which plays over the WebSocket channel of this application
+    return await render_template('index.html', websocket=True)
+
+@app.route('/start', methods=['POST'])
+async def start():
+    # Get the data from the incoming request
+    data = await request.get_json()
+
+    # A board given by its rows and columns is played on a chunked board, whose moves are answered within a viewport
+    if 'rows' in data:
+        rows, cols, m = int(data['rows']), int(data['cols']), int(data['numMines'])
+        if not (4 <= rows <= app.config['CHUNKED_BOARD_MAX']) or not (4 <= cols <= app.config['CHUNKED_BOARD_MAX']) or not (max(1, rows*cols*app.config['CHUNKED_MIN_DENSITY']) <= m <= rows*cols - 10):
+            return INVALID_CHUNKED_INPUT % (app.config['CHUNKED_BOARD_MAX'], app.config['CHUNKED_MIN_DENSITY']), 400
+        await r.set('chunked_' + session['uuid'], ChunkedMinesweeper(rows, cols, m).to_bytes(), 60 * 60 * 2)
+        session['chunked'] = True
+        session.pop('board_size', None)
+        return jsonify({})
+    session.pop('chunked', None)
+
+    n = int(data['boardSize'])
+    m = int(data['numMines'])
+
+    # Validate the board size and number of mines received in the request
+    if not (4 <= n <= 25) or not (1 <= m <= n*n - 10):
+        return INVALID_INPUT, 400
+
+    # Create an instance of the Minesweeper game with the received board size and number of mines
+    env = Minesweeper(n, m, no_guess=bool(data.get('noGuess', False)))
+    _ = env.reset()
+
+    # Serialize the game instance into its compact binary form and store it in Redis with a 2 hour expiration time
+    await r.set('env_' + session['uuid'], env.to_bytes(), 60 * 60 * 2)
+    session['board_size'] = n  # lets /move check the actions before loading the game
+    if game_records is not None:
+        await asyncio.get_running_loop().run_in_executor(executor, start_recording, session['uuid'])
+
+    # Return an empty JSON as response
+    return jsonify({})
+
+@app.route('/move', methods=['POST'])
+async def move():
+    # Get the action from the incoming request
+    data = await request.get_json()
+    action = data.get('action') if isinstance(data, dict) else None
+    if not isinstance(action, int) or isinstance(action, bool):  # missing or not an integer, rejected below
+        action = -1
+
+    if session.get('chunked'):
+        # Make a move on the chunked board on the executor, and store it back
+        serialized_env = await r.get('chunked_' + session['uuid'])
+        if serialized_env is None:
+            return GAME_NOT_STARTED, 400
+        serialized_env, response_data = await asyncio.get_running_loop().run_in_executor(executor, play_chunked_move, serialized_env, action, data)
+        if serialized_env is None:
+            return response_data, 400
+        await r.set('chunked_' + session['uuid'], serialized_env, 60 * 60 * 2)
+        return jsonify(response_data)
+
+    # Reject the actions off the board before the game is loaded, from the board size kept by /start, or the largest
+    # one for a game started over the WebSocket, checked against its own size by play_move
+    if not 0 <= action < session.get('board_size', 25) ** 2:
+        return INVALID_ACTION, 400
+
+    # Retrieve the serialized game instance from Redis using the session's UUID
+    serialized_env = await r.get('env_' + session['uuid'])
+    if serialized_env is None:
+        return GAME_NOT_STARTED, 400
+
+    # Make a move in the game on the executor
+    serialized_env, response_data = await asyncio.get_running_loop().run_in_executor(executor, play_move, serialized_env, action, data.get('resync'),
+                                                                                     session['uuid'], session.get('user_id'))
+    if serialized_env is None:
+        return response_data, 400
+
+    # Store the updated game instance back in Redis with a 2 hour expiration time
+    await r.set('env_' + session['uuid'], serialized_env, 60 * 60 * 2)
+
+    # Return the changes of the game board and game info as response
+    return jsonify(response_data)
+
+@app.route('/view', methods=['POST'])
+async def view():
+    # Views are served for the chunked boards, which are not sent whole
+    if not session.get('chunked'):
+        return "Views are only served for the boards started with rows and columns.", 400
+    serialized_env = await r.get('chunked_' + session['uuid'])
+    if serialized_env is None:
+        return GAME_NOT_STARTED, 400
+
+    # Return the revealed tiles of the viewport, as the client scrolls over the board
+    response_data = await asyncio.get_running_loop().run_in_executor(executor, view_chunked_game, serialized_env, ((await request.get_json()) or {}).get('viewport'))
+    if isinstance(response_data, str):
+        return response_data, 400
+    return jsonify(response_data)
+
+@app.websocket('/ws')
+async def game_channel():
+    # Play whole games over one connection: the game instance stays in memory between moves, and is only written to
+    # Redis when a game starts or ends, every few moves or seconds, and when the connection closes.
+    # Messages are JSON objects, {"type": "start", "boardSize": n, "numMines": m} or {"type": "move", "action": k,
+    # "resync": bool}, answered in order with the responses of the /start and /move routes, or {"error": message}.
+    if 'uuid' not in session:
+        return
+    key = 'env_' + session['uuid']
+
+    # Resume the game of the session, if any
+    serialized_env = await r.get(key)
+    try:
+        env = Minesweeper.from_bytes(serialized_env) if serialized_env is not None else None
+    except ValueError:  # stored with an older format
+        env = None
+    unsaved_moves = 0
+    last_save = time.monotonic()
+
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive())
+                message_type = data.get('type')
+            except (ValueError, AttributeError):  # not a JSON object
+                message_type = None
+            if message_type not in ('start', 'move'):
+                await websocket.send(json.dumps({'error': INVALID_MESSAGE}))
+                continue
+
+            if message_type == 'start':
+                try:
+                    n = int(data['boardSize'])
+                    m = int(data['numMines'])
+                except (KeyError, TypeError, ValueError):
+                    n = m = 0
+                if not (4 <= n <= 25) or not (1 <= m <= n*n - 10):
+                    await websocket.send(json.dumps({'error': INVALID_INPUT}))
+                    continue
+                env = Minesweeper(n, m, no_guess=bool(data.get('noGuess', False)))
+                _ = env.reset()
+                await r.set(key, env.to_bytes(), 60 * 60 * 2)
+                if game_records is not None:
+                    await asyncio.get_running_loop().run_in_executor(executor, start_recording, session['uuid'])
+                unsaved_moves = 0
+                last_save = time.monotonic()
+                await websocket.send('{}')
+                continue
+
+            if env is None:
+                await websocket.send(json.dumps({'error': GAME_NOT_STARTED}))
+                continue
+
+            try:
+                action = int(data['action'])
+            except (KeyError, TypeError, ValueError):
+                action = -1
+            if not 0 <= action < env.n * env.n:
+                await websocket.send(json.dumps({'error': INVALID_ACTION}))
+                continue
+
+            # Make a move in the game on the executor, as a no-guess first move may take a while to generate its board
+            terminated, response_data = await asyncio.get_running_loop().run_in_executor(executor, play_socket_move, env, action, data.get('resync'),
+                                                                                         session['uuid'], session.get('user_id'))
+            await websocket.send(json.dumps(response_data))
+
+            unsaved_moves += 1
+            if terminated or unsaved_moves >= app.config['WS_PERSIST_MOVES'] or time.monotonic() - last_save >= app.config['WS_PERSIST_INTERVAL']:
+                await r.set(key, env.to_bytes(), 60 * 60 * 2)
+                unsaved_moves = 0
+                last_save = time.monotonic()
+    finally:
+        # Save the last moves when the connection closes, even if the handler is being cancelled
+        if env is not None and unsaved_moves > 0:
+            await asyncio.shield(r.set(key, env.to_bytes(), 60 * 60 * 2))
+
+# Run the Quart application
+if __name__ == '__main__':
+    app.run()
@@ -0,0 +1,173 @@
+from MinesweeperEnv import Minesweeper, STATE_HEADER, STATE_FORMAT_VERSION, GAME_NOT_INITIALIZED, GAME_NOT_INITIALIZED_NO_GUESS, GAME_WON
+
+
+# Lua script applying one click to a game stored in Redis in the format written by `Minesweeper.to_bytes`.
+#
+# KEYS[1]: the key of the game.
+# ARGV[1]: the action, a linear index of a tile on the board.
+# ARGV[2]: the expiration time of the game, in seconds, refreshed by every move.
+# ARGV[3]: '1' to always return the updated game state, '0' to only return it when the game ends.
+# ARGV[4]: (optional) the game state with its mines placed for this first action, used if the stored game has no
+#          mines yet. Mines are placed by the web worker, as the script can not draw them.
+#
+# Returns {'missing'} if there is no game (or one in an older format), {'setup', n, m, no_guess} if the mines have to
+# be placed first (no_guess being 1 for a game set up with a board solvable without guessing, 0 otherwise), and otherwise {result, revealed tiles, their values, game state or false}.
+MOVE_SCRIPT = """
+local header = %d
+local state = redis.call('GET', KEYS[1])
+if not state or string.byte(state, 1) ~= %d then
+    return {'missing'}
+end
+
+local n = string.byte(state, 3) + 256 * string.byte(state, 4)
+local m = string.byte(state, 5) + 256 * string.byte(state, 6) + 65536 * string.byte(state, 7) + 16777216 * string.byte(state, 8)
+if string.byte(state, 2) == %d or string.byte(state, 2) == %d then
+    if not ARGV[4] then
+        return {'setup', n, m, string.byte(state, 2) == %d and 1 or 0}
+    end
+    state = ARGV[4]
+end
+
+local action = tonumber(ARGV[1])
+local size = n * n
+local nbytes = math.floor((size + 7) / 8)
+if action < 0 or action >= size then
+    return redis.error_reply('action out of the board')
+end
+
+local function bit_set(byte, k)
+    return math.floor(byte / 2 ^ (7 - k %% 8)) %% 2 == 1
+end
+
+local function is_mine(k)
+    return bit_set(string.byte(state, header + 1 + math.floor(k / 8)), k)
+end
+
+local revealed = {}
+for i = 1, nbytes do
+    revealed[i] = string.byte(state, header + nbytes + i)
+end
+
+local function is_revealed(k)
+    return bit_set(revealed[math.floor(k / 8) + 1], k)
+end
+
+local function set_revealed(k)
+    local i = math.floor(k / 8) + 1
+    revealed[i] = revealed[i] + 2 ^ (7 - k %% 8)
+end
+
+local result
+local status = string.byte(state, 2)
+local tiles = {}
+local values = {}
+if is_revealed(action) then
+    result = 'invalid action'
+elseif is_mine(action) then
+    result = 'lose'
+else
+    -- reveal the clicked tile and, from every zero tile, its covered neighbors
+    local stack = {action}
+    set_revealed(action)
+    while #stack > 0 do
+        local k = table.remove(stack)
+        local row, col = math.floor(k / n), k %% n
+        local count = 0
+        for i = math.max(row - 1, 0), math.min(row + 1, n - 1) do
+            for j = math.max(col - 1, 0), math.min(col + 1, n - 1) do
+                if is_mine(i * n + j) then
+                    count = count + 1
+                end
+            end
+        end
+        tiles[#tiles + 1] = k
+        values[#values + 1] = count
+        if count == 0 then
+            for i = math.max(row - 1, 0), math.min(row + 1, n - 1) do
+                for j = math.max(col - 1, 0), math.min(col + 1, n - 1) do
+                    if not is_revealed(i * n + j) then
+                        set_revealed(i * n + j)
+                        stack[#stack + 1] = i * n + j
+                    end
+                end
+            end
+        end
+    end
+
+    local covered = size
+    for i = 1, nbytes do
+        local byte = revealed[i]
+        while byte > 0 do
+            covered = covered - byte %% 2
+            byte = math.floor(byte / 2)
+        end
+    end
+    if covered == m then
+        result = 'win'
+        status = %d
+    else
+        result = 'continue'
+    end
+end
+
+local chunks = {}
+for i = 1, nbytes, 1024 do
+    chunks[#chunks + 1] = string.char(unpack(revealed, i, math.min(i + 1023, nbytes)))
+end
+state = string.sub(state, 1, 1) .. string.char(status) .. string.sub(state, 3, header + nbytes) .. table.concat(chunks)
+redis.call('SET', KEYS[1], state, 'EX', ARGV[2])
+
+if ARGV[3] == '1' or result == 'win' or result == 'lose' then
+    return {result, tiles, values, state}
+end
+return {result, tiles, values, false}
+""" % (STATE_HEADER.size, STATE_FORMAT_VERSION, GAME_NOT_INITIALIZED, GAME_NOT_INITIALIZED_NO_GUESS,
+   GAME_NOT_INITIALIZED_NO_GUESS, GAME_WON)
+
+
+class MoveScript:
+
+    def __init__(self, client):
+        """
+        Register the move script on a Redis client.
+
+        The script is sent to Redis once and then called by its SHA1 digest with EVALSHA, so a move costs a single
+        round trip and is applied atomically: two clicks on the same game are executed one after the other by Redis,
+        and none of them can overwrite the result of the other.
+
+        Parameters:
+        client (redis.Redis): The Redis client holding the games.
+        """
+        self.script = client.register_script(MOVE_SCRIPT)
+
+    def move(self, key, action, ttl, return_state=False):
+        """
+        Apply an action to the game stored at the given key.
+
+        If the mines of the game are not placed yet, they are placed here for this first action, then sent along
+        with a second call of the script. The script only uses them if the game still has no mines, so the first
+        of two concurrent first clicks wins.
+
+        Parameters:
+        key (str): The Redis key of the game.
+        action (int): The action to be taken, represented as a linear index of a tile on the board.
+        ttl (int): The expiration time of the game, in seconds.
+        return_state (bool): Whether the updated game state should be returned even if the game did not end.
+
+        Returns:
+        tuple or None: None if there is no game at this key, otherwise a 4-element tuple containing:
+            - result (str): "invalid action", "lose", "win" or "continue", as in `Minesweeper.step`.
+            - revealed (list): The linear indices of the tiles revealed by the action.
+            - values (list): The number of neighboring mines of each revealed tile.
+            - state (bytes or None): The updated game state, if the game ended or `return_state` is set.
+        """
+        reply = self.script(keys=[key], args=[action, ttl, int(return_state)])
+        if reply[0] == b'setup':
+            env = Minesweeper(reply[1], reply[2], no_guess=reply[3] == 1)
+            env._setupGameBoard(action)
+            env.game_not_initialized = False
+            reply = self.script(keys=[key], args=[action, ttl, int(return_state), env.to_bytes()])
+
+        if reply[0] == b'missing':
+            return None
+        return reply[0].decode(), reply[1], reply[2], reply[3]
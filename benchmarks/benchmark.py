@@ -0,0 +1,356 @@
+"""
+Benchmarks of the Minesweeper environment and of the web request path.
+
+Run the benchmarks and write the results to a JSON file:
+
+    python benchmarks/benchmark.py run --output results.json
+
+Compare two result files, listing the benchmarks whose median time grew by more than the threshold (10% by default),
+and exit with status 1 if there is any:
+
+    python benchmarks/benchmark.py compare baseline.json results.json --threshold 0.1
+
+`run --baseline baseline.json` does both at once. Each run also times a fixed workload, to tell when the machine was
+busier or slower than for the baseline; `--normalize` scales the times by it. The web benchmarks go through the Flask test client, with the
+application configured by its usual environment variables, against the Redis server at REDIS_URL (by default a local
+server on the default port). They are skipped if this server can not be reached.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MinesweeperEnv import Minesweeper
+
+
+SIZES = [4, 8, 12, 16, 20, 25, 50, 100]
+DENSITIES = [0.1, 0.15, 0.2]
+WEB_CONFIGURATIONS = [(9, 10), (16, 40), (25, 129)]
+
+
+def measure(call, argument=None, min_time=0.2, rounds=5, min_calls=5):
+    """
+    Time a call repeated with the same argument, in rounds of at least `min_time / rounds` seconds.
+
+    Parameters:
+    call (callable): The function to time, called with the argument.
+    argument (optional): The argument of the function, which must not be changed by the call.
+    min_time (float): The minimum total time, in seconds.
+    rounds (int): The number of rounds.
+    min_calls (int): The minimum number of calls per round.
+
+    Returns:
+    dict: The timings, see `_summary`.
+    """
+    timings = []
+    for _ in range(rounds):
+        round_timings = []
+        start = time.perf_counter()
+        while len(round_timings) < min_calls or time.perf_counter() - start < min_time / rounds:
+            call_start = time.perf_counter_ns()
+            call(argument)
+            round_timings.append(time.perf_counter_ns() - call_start)
+        timings.append(round_timings)
+    return _summary(timings)
+
+
+def measure_each(call, items, rounds=5):
+    """
+    Time a call once on each of the prepared items, for calls that change their argument. The items are split
+    into rounds.
+
+    Parameters:
+    call (callable): The function to time, called with one item.
+    items (sequence): The items the function is called with, for instance games prepared in the same state. They
+                      are read one at a time, outside of the timing, so they may be computed on demand.
+    rounds (int): The number of rounds.
+
+    Returns:
+    dict: The timings, see `_summary`.
+    """
+    timings = [[] for _ in range(min(rounds, len(items)))]
+    for index in range(len(items)):
+        item = items[index]
+        call_start = time.perf_counter_ns()
+        call(item)
+        timings[index % len(timings)].append(time.perf_counter_ns() - call_start)
+    return _summary(timings)
+
+
+def _summary(timings):
+    """
+    Summarize timings given in nanoseconds, by round.
+
+    The machine running the benchmarks may be busy with other work for a while, which slows down some of the
+    rounds, so the result is the median time of the fastest round, the one least disturbed. This is the time
+    compared by `compare`.
+
+    Returns:
+    dict: `median_us`, the median time of the fastest round, along with the mean, 90th percentile and minimum
+          times over all the rounds, in microseconds, and the number of calls.
+    """
+    all_timings = np.concatenate([np.array(round_timings) for round_timings in timings]) / 1000
+    return {'median_us': float(min(np.median(round_timings) for round_timings in timings)) / 1000,
+            'mean_us': float(all_timings.mean()), 'p90_us': float(np.percentile(all_timings, 90)),
+            'min_us': float(all_timings.min()), 'iterations': len(all_timings)}
+
+
+def calibration(min_time):
+    """
+    Time a fixed workload, unrelated to the code, telling how fast the machine ran the benchmarks. `compare`
+    warns when two runs differ in this time, and can scale the times of a run by it.
+    """
+    return measure(lambda _: sum(i * i for i in range(2000)), min_time=min_time)
+
+
+def _startedGames(n, m, count, seed):
+    """
+    Create games in the same state: started with a click in the middle of the board.
+
+    Returns:
+    tuple: The started game, and `count` copies of it.
+    """
+    env = Minesweeper(n, m, seed=seed)
+    env.reset(seed=seed)
+    env.step(n // 2 * n + n // 2)
+    state = env.to_bytes()
+    return env, [Minesweeper.from_bytes(state) for _ in range(count)]
+
+
+def engine_benchmarks(sizes, densities, min_time, count):
+    """
+    Time the steps of the environment for each board size and density of mines.
+
+    Returns:
+    dict: The results of each benchmark, by name.
+    """
+    results = {}
+    for n in sizes:
+        for density in densities:
+            m = min(max(1, round(density * n * n)), n * n - 9)
+            name = 'engine/%%s/n=%d/m=%d' % (n, m)
+            env = Minesweeper(n, m, seed=0)
+            results[name % 'reset'] = measure(lambda _: env.reset(), min_time=min_time)
+
+            def setup(game):
+                game.game_not_initialized = True
+                game._setupGameBoard(n // 2 * n + n // 2)
+            results[name % 'setup_board'] = measure(setup, env, min_time)
+
+            def first_step(game):
+                game.reset()
+                game.step(n // 2 * n + n // 2)
+            results[name % 'first_step'] = measure(first_step, env, min_time)
+
+            # Steps on games in the same state, one game per call since a step changes it
+            reference, _ = _startedGames(n, m, 0, seed=0)
+            covered = ~reference.revealed_mask
+            safe = np.flatnonzero(covered & (reference.board > 0))
+            cascade = np.flatnonzero(covered & (reference.board == 0))
+            mine = np.flatnonzero(reference.board == -1)
+            revealed = np.flatnonzero(reference.revealed_mask)
+            for kind, tiles in [('step_safe', safe), ('step_cascade', cascade), ('step_mine', mine)]:
+                if len(tiles) > 0:
+                    action = int(tiles[0])
+                    results[name % kind] = measure_each(lambda game: game.step(action), _startedGames(n, m, count, seed=0)[1])
+            if len(revealed) > 0:
+                results[name % 'step_invalid'] = measure(lambda game: game.step(int(revealed[0])), reference, min_time)
+
+            results[name % 'convert_state'] = measure(lambda game: game._convert_state(), reference, min_time)
+            results[name % 'pickle_dumps'] = measure(lambda game: pickle.dumps(game), reference, min_time)
+            pickled = pickle.dumps(reference)
+            results[name % 'pickle_loads'] = measure(lambda data: pickle.loads(data), pickled, min_time)
+            results[name % 'to_bytes'] = measure(lambda game: game.to_bytes(), reference, min_time)
+            state = reference.to_bytes()
+            results[name % 'from_bytes'] = measure(lambda data: Minesweeper.from_bytes(data), state, min_time)
+    return results
+
+
+def web_benchmarks(configurations, min_time, count):
+    """
+    Time the '/start' and '/move' routes of the Flask application through its test client.
+
+    Returns:
+    dict: The results of each benchmark, by name, or an empty dict if Redis can not be reached.
+    """
+    os.environ.setdefault('REDIS_URL', 'redis://localhost:6379/0')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('NO_GUESS_WARM', '') # no background generation of boards during the timings
+    import redis
+    try:
+        redis.from_url(os.environ['REDIS_URL']).ping()
+    except redis.RedisError as error:
+        print('Skipping the web benchmarks, Redis can not be reached: %s' % error, file=sys.stderr)
+        return {}
+    import app as web_app
+
+    client = web_app.app.test_client()
+    client.get('/')
+    with client.session_transaction() as session:
+        key = 'env_' + session['uuid']
+
+    results = {}
+    for n, m in configurations:
+        name = 'web/%%s/n=%d/m=%d' % (n, m)
+        start = {'boardSize': n, 'numMines': m}
+        results[name % 'start'] = measure(lambda _: client.post('/start', json=start), min_time=min_time)
+
+        def first_move(action):
+            client.post('/move', json={'action': action})
+        results[name % 'first_move'] = measure_each(first_move, _Restarted(client, start, n * n // 2, count))
+
+        # Clicks on a covered safe tile, found from the game stored in Redis before each timed request
+        def next_move(_):
+            env = Minesweeper.from_bytes(web_app.r.get(key))
+            covered = np.flatnonzero(~env.revealed_mask & (env.board != -1))
+            if len(covered) == 0 or env.game_not_initialized:
+                client.post('/start', json=start)
+                client.post('/move', json={'action': n * n // 2})
+                env = Minesweeper.from_bytes(web_app.r.get(key))
+                covered = np.flatnonzero(~env.revealed_mask & (env.board != -1))
+            return int(covered[0])
+        results[name % 'move'] = measure_each(lambda action: client.post('/move', json={'action': action}), _Prepared(next_move, count))
+    return results
+
+
+class _Prepared:
+    """
+    Items computed on demand right before each timed call, outside of the timing.
+    """
+
+    def __init__(self, prepare, count):
+        self.prepare = prepare
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.prepare(index)
+
+
+class _Restarted(_Prepared):
+    """
+    First actions, each on a game started right before the timed call.
+    """
+
+    def __init__(self, client, start, action, count):
+        def restart(_):
+            client.post('/start', json=start)
+            return action
+        super().__init__(restart, count)
+
+
+def metadata():
+    """
+    Describe the machine and the code the benchmarks ran on.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor()}
+
+
+def compare(baseline, current, threshold, normalize=False):
+    """
+    Compare the median times of two sets of results.
+
+    Parameters:
+    baseline (dict): The results of the baseline, as written by `run`.
+    current (dict): The results to compare with the baseline.
+    threshold (float): The relative growth of the median time above which a benchmark is a regression.
+    normalize (bool): Whether to scale the current times by the ratio of the calibration times of the two runs,
+                      to compare runs on machines of different speeds.
+
+    Returns:
+    list: The names of the benchmarks that regressed.
+    """
+    regressions = []
+    speed = current['calibration']['median_us'] / baseline['calibration']['median_us']
+    if abs(speed - 1) > threshold:
+        print('The calibration workload ran %+.0f%% slower in the current run: the machine was %s.' % (
+            100 * (speed - 1), 'normalized for' if normalize else 'busier or slower, the changes may be noise'))
+    scale = 1 / speed if normalize else 1
+    print('%-50s %12s %12s %8s' % ('benchmark', 'baseline us', 'current us', 'change'))
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before = baseline['results'][name]['median_us']
+        after = current['results'][name]['median_us'] * scale
+        change = after / before - 1 if before > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-50s %12.1f %12.1f %+7.1f%%%s' % (name, before, after, 100 * change, flag))
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing:
+        print('Not run: %s' % ', '.join(missing))
+    print('%d regression(s) above %.0f%%' % (len(regressions), 100 * threshold))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--output', default='benchmark_results.json', help='file receiving the results')
+    run_parser.add_argument('--baseline', help='results to compare with once the benchmarks ran')
+    run_parser.add_argument('--threshold', type=float, default=0.1, help='relative growth counted as a regression')
+    run_parser.add_argument('--normalize', action='store_true', help='scale the times by the speed of the machine measured in each run')
+    run_parser.add_argument('--quick', action='store_true', help='run fewer sizes and densities, for a quick check')
+    run_parser.add_argument('--only', choices=['engine', 'web'], help='run only the engine or the web benchmarks')
+    run_parser.add_argument('--min-time', type=float, default=0.2, help='minimum time spent on each benchmark, in seconds')
+    run_parser.add_argument('--count', type=int, default=50, help='calls of the benchmarks that change the game, each on a game prepared in the same state')
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='relative growth counted as a regression')
+    compare_parser.add_argument('--normalize', action='store_true', help='scale the times by the speed of the machine measured in each run')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        with open(args.baseline) as baseline_file, open(args.current) as current_file:
+            regressions = compare(json.load(baseline_file), json.load(current_file), args.threshold, args.normalize)
+        sys.exit(1 if regressions else 0)
+
+    sizes = [4, 16, 25] if args.quick else SIZES
+    densities = [0.15] if args.quick else DENSITIES
+    results = {}
+    gc.disable() # no garbage collection in the middle of the timings
+    calibration_before = calibration(args.min_time)
+    if args.only != 'web':
+        results.update(engine_benchmarks(sizes, densities, args.min_time, args.count))
+    if args.only != 'engine':
+        results.update(web_benchmarks(WEB_CONFIGURATIONS, args.min_time, args.count))
+    calibration_after = calibration(args.min_time)
+    gc.enable()
+
+    report = {'metadata': metadata(), 'results': results,
+              'calibration': min(calibration_before, calibration_after, key=lambda timing: timing['median_us'])}
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2, sort_keys=True)
+    print('Wrote %d results to %s' % (len(results), args.output))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(json.load(baseline_file), report, args.threshold, args.normalize)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Time taken by `Minesweeper._setupGameBoard` to draw the mines of a board and count the mines around every tile,
+against the former implementation kept below as a reference, which drew the mines among the allowed tiles and
+incremented the neighbors of each mine one at a time, for boards from 4 x 4 to 200 x 200 at low and high densities.
+
+    python benchmarks/board_setup.py --min-time 0.2 --output board_setup.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MinesweeperEnv import Minesweeper
+
+SIZES = [4, 8, 12, 16, 20, 25, 50, 100, 200]
+
+
+def reference_setup(env, action):
+    """
+    The former `_setupGameBoard`, building the board with a loop over the mines.
+
+    Returns:
+    tuple: The mines, the board and the set of safe tiles.
+    """
+    n = env.n
+    board = np.zeros((n, n), dtype=int)
+    row, col = env._convertActionToCoordinates(action)
+    invalid_mine_locations = [env._convertCoordinatesToAction(row + i, col + j) # 3x3 grid surrounding the initial action can not contain mines
+                for i in [-1, 0, 1]
+                for j in [-1, 0, 1]
+                if (0 <= row + i < n) and (0 <= col + j < n)]
+    potential_mine_locations = np.delete(np.array(range(n ** 2)), invalid_mine_locations)
+    mines = env.np_random.choice(potential_mine_locations, env.m, replace=False)
+
+    #Create board
+    for mine in mines:
+        row, col = env._convertActionToCoordinates(mine)
+        board[row, col] = -1
+
+        # Determine coordinates of 8 neighboring cells
+        neighbors = [(i, j)
+                    for i in [row - 1, row, row + 1]
+                    for j in [col - 1, col, col + 1]
+                    if (0 <= i < n) and (0 <= j < n) and not (i == row and j == col)]
+
+        # Add 1 to all valid neighbors
+        for i, j in neighbors:
+            if (board[i, j] != -1):
+                board[i, j] += 1
+
+    # create master list of all safe tiles
+    safe_tiles = set(np.delete(np.array(range(n ** 2)), mines))
+    return mines, board, safe_tiles
+
+
+def time_setup(setup, n, m, min_time):
+    """
+    Call a board setup on the center tile repeatedly for at least `min_time` seconds.
+
+    Returns:
+    float: The mean time of a call, in milliseconds.
+    """
+    env = Minesweeper(n, m, seed=0)
+    env.reset(seed=0)
+    action = n * n // 2
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        setup(env, action)
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='dimensions of the boards')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum time spent on each measurement, in seconds')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    results = []
+    print('%5s %6s %10s %10s %8s' % ('n', 'm', 'former ms', 'current ms', 'speedup'))
+    for n in args.sizes:
+        # Mine densities of 15% and of all the tiles but the 3x3 grid of the first action
+        for m in sorted({max(1, round(n * n * 0.15)), n * n - 10}):
+            reference_ms = time_setup(reference_setup, n, m, args.min_time)
+            current_ms = time_setup(Minesweeper._setupGameBoard, n, m, args.min_time)
+            results.append({'n': n, 'm': m, 'reference_ms': reference_ms, 'current_ms': current_ms})
+            print('%5d %6d %10.3f %10.3f %7.1fx' % (n, m, reference_ms, current_ms, reference_ms / current_ms))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
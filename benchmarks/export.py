@@ -0,0 +1,65 @@
+"""
+Throughput of the trajectory export and of its loader: games played by a policy and streamed into memory-mapped
+shards, then read back as shuffled minibatches.
+
+    python benchmarks/export.py --episodes 2000 --size 16 --mines 40 --policy solver
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from trajectories import ShardLoader, export, play_episodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--episodes', type=int, default=2000, help='games to export')
+    parser.add_argument('--size', type=int, default=16, help='dimensions of the boards')
+    parser.add_argument('--mines', type=int, default=40, help='mines on each board')
+    parser.add_argument('--policy', choices=['random', 'solver'], default='solver', help='policy playing the games')
+    parser.add_argument('--shard-size', type=int, default=65536, help='records per shard')
+    parser.add_argument('--batch-size', type=int, default=256, help='records per minibatch when loading')
+    parser.add_argument('--directory', help='directory receiving the shards, a temporary one by default')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = args.directory or temporary_directory
+
+        # Playing the games alone, to tell the cost of the export from the cost of the games
+        start = time.perf_counter()
+        played = sum(1 for _ in play_episodes(args.size, args.mines, args.policy, args.episodes, seed=0))
+        play_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = export(directory, args.size, args.mines, args.episodes, args.policy, seed=0, shard_size=args.shard_size)
+        export_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, shard['file'])) for shard in index['shards'])
+
+        # Reading every minibatch, touching its observations so that its pages are read
+        loader = ShardLoader(directory)
+        start = time.perf_counter()
+        checksum = 0
+        for batch in loader.batches(args.batch_size, seed=0):
+            checksum += int(batch['obs'][:, 0, 0].sum()) + int(batch['action'].sum())
+        load_seconds = time.perf_counter() - start
+
+    results = {'episodes': args.episodes, 'records': index['records'], 'shards': len(index['shards']), 'bytes': size,
+               'play_records_per_second': played / play_seconds, 'export_records_per_second': index['records'] / export_seconds,
+               'export_overhead_us_per_record': (export_seconds - play_seconds) / index['records'] * 1e6,
+               'load_records_per_second': index['records'] / load_seconds}
+    for name, value in results.items():
+        print('%-32s %14.1f' % (name, value))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Cost of the statistics and leaderboard reads of `GamePersistence` on a large history: synthetic games of many
+players are written to a temporary SQLite database with the tables of db_create_sqlite.sql, then the rollup
+tables are read and compared with the same results aggregated from the `games` rows, and keyset pages of the
+leaderboard are compared with OFFSET pages.
+
+    python benchmarks/leaderboard.py --games 1000000 --players 100000 --output leaderboard.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game_persistence import GamePersistence
+
+CONFIGS = [(9, 10), (16, 40), (24, 99)]
+
+# The fastest wins of the players on a configuration, aggregated from the games
+GAMES_LEADERBOARD = """SELECT user_id, MIN(CAST(ROUND((julianday(game_end_time) - julianday(game_start_time)) * 86400000) AS INTEGER)) AS best
+FROM games WHERE game_status = 'W' AND board_size = ? AND LENGTH(mines) - LENGTH(REPLACE(mines, ',', '')) + 1 = ? AND user_id IS NOT NULL
+GROUP BY user_id ORDER BY best, user_id LIMIT ?"""
+
+ROLLUP_OFFSET_PAGE = """SELECT best_time_ms, user_id FROM player_stats
+WHERE board_size = ? AND mine_count = ? AND best_time_ms IS NOT NULL ORDER BY best_time_ms, user_id LIMIT ? OFFSET ?"""
+
+
+def best_time(function, repeat=5):
+    """
+    Call a function a few times.
+
+    Returns:
+    tuple: The fastest time of a call in milliseconds, and the result of the last call.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3, result
+
+
+def write_games(database_url, games, players, seed=0):
+    """
+    Write synthetic games, 30% of them won, through the batches of `GamePersistence`. They last whole
+    milliseconds, so their times read back from the timestamps of the games are exact.
+
+    Returns:
+    tuple: The writer, and the games written per second.
+    """
+    rng = random.Random(seed)
+    records = GamePersistence(None, database_url, max_queue=games + 1, batch_size=2000)
+    start = float(int(time.time()))
+    for index in range(games):
+        n, m = CONFIGS[index % len(CONFIGS)]
+        records._queue.put({'user_id': rng.randint(1, players), 'mines': list(range(m)), 'board_size': n, 'tiles_revealed': 10,
+                            'game_status': 'W' if rng.random() < 0.3 else 'L', 'game_start_time': start,
+                            'game_end_time': start + rng.randint(5000, 500000) / 1000, 'moves': [(1, start), (2, start + 1)]})
+    write_start = time.perf_counter()
+    records.flush()
+    return records, games / (time.perf_counter() - write_start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=1000000, help='games written')
+    parser.add_argument('--players', type=int, default=100000, help='players the games are spread over')
+    parser.add_argument('--page-size', type=int, default=20, help='entries of a leaderboard page')
+    parser.add_argument('--deep-page', type=int, default=20000, help='rank of the first entry of the deep page read')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    n, m = CONFIGS[1]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'leaderboard.db')
+        connection = sqlite3.connect(path)
+        with open(os.path.join(ROOT, 'db_create_sqlite.sql')) as schema:
+            connection.executescript(schema.read())
+        connection.executemany('INSERT INTO user_profiles (id, username) VALUES (?, ?)',
+                               [(user_id, 'player%d' % user_id) for user_id in range(1, args.players + 1)])
+        connection.commit()
+
+        records, games_per_second = write_games('sqlite:///' + path, args.games, args.players)
+        results = {'games': args.games, 'players': args.players, 'write_games_per_second': games_per_second}
+        print('wrote %d games of %d players: %.0f games/s' % (args.games, args.players, games_per_second))
+
+        # First page, from the rollup with its index and aggregated from the games
+        results['games_first_page_ms'], from_games = best_time(lambda: connection.execute(GAMES_LEADERBOARD, (n, m, args.page_size)).fetchall(), 2)
+        results['rollup_first_page_ms'], page = best_time(lambda: records.leaderboard(n, m, args.page_size))
+        results['first_page_matches'] = [(entry['user_id'], entry['best_time_ms']) for entry in page['entries']] == from_games
+        print('first page: %.3f ms from the rollup, %.1f ms from the games (same ranking: %s)'
+              % (results['rollup_first_page_ms'], results['games_first_page_ms'], results['first_page_matches']))
+
+        # Deep page, with keyset pagination and with OFFSET
+        after = connection.execute(ROLLUP_OFFSET_PAGE, (n, m, 1, args.deep_page - 1)).fetchone()
+        if after is not None:
+            results['keyset_deep_page_ms'], page = best_time(lambda: records.leaderboard(n, m, args.page_size, after=after))
+            results['offset_deep_page_ms'], offset_page = best_time(lambda: connection.execute(ROLLUP_OFFSET_PAGE, (n, m, args.page_size, args.deep_page)).fetchall())
+            results['deep_page_matches'] = [(entry['best_time_ms'], entry['user_id']) for entry in page['entries']] == offset_page
+            print('page at rank %d: %.3f ms with a keyset, %.3f ms with OFFSET (same entries: %s)'
+                  % (args.deep_page, results['keyset_deep_page_ms'], results['offset_deep_page_ms'], results['deep_page_matches']))
+
+        # Statistics of a player and of all the games, from the rollups and from the games
+        results['rollup_player_stats_ms'], _ = best_time(lambda: records.game_stats(1))
+        results['games_player_stats_ms'], _ = best_time(lambda: connection.execute(
+            "SELECT board_size, COUNT(*), SUM(game_status = 'W') FROM games WHERE user_id = 1 GROUP BY board_size").fetchall())
+        results['rollup_config_stats_ms'], stats = best_time(lambda: records.game_stats())
+        results['games_config_stats_ms'], from_games = best_time(lambda: connection.execute(
+            "SELECT board_size, COUNT(*), SUM(game_status = 'W') FROM games GROUP BY board_size ORDER BY board_size").fetchall(), 2)
+        results['config_stats_match'] = [(entry['board_size'], entry['games_played'], entry['games_won']) for entry in stats] == from_games
+        print('player statistics: %.3f ms from the rollup, %.3f ms from the games' % (results['rollup_player_stats_ms'], results['games_player_stats_ms']))
+        print('statistics of all the games: %.3f ms from the rollup, %.1f ms from the games (same counts: %s)'
+              % (results['rollup_config_stats_ms'], results['games_config_stats_ms'], results['config_stats_match']))
+        connection.close()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Load test of the web application, with many simulated players going through the '/start' -> '/move' flow.
+
+Each player has its own session cookie. It starts a board drawn from the configuration mix, clicks tiles until the
+game is won or lost, and starts over until the end of the test. Tiles are clicked at random among the covered tiles,
+or with the deterministic solver of `MinesweeperSolver`, which only clicks tiles known to be safe and guesses among
+the undetermined tiles otherwise.
+
+The players are run with aiohttp, which the application does not need: install the requirements of the benchmarks
+with `pip install -r benchmarks/requirements.txt` first.
+
+Run against a local gunicorn and a local redis-server launched for the test:
+
+    python benchmarks/loadtest.py --launch --workers 4 --players 1000 --duration 60 --policy solver
+
+or against an application already running, reading the memory of its Redis server:
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --redis-url redis://localhost:6379/0
+
+The report gives the throughput, the latency percentiles of each route, the error rates, and the growth of the
+memory used by Redis per 1000 sessions. `--output` also writes it to a JSON file. The latencies are measured by the
+players, so they include the wait for one of the `--connections` open connections.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+import numpy as np
+import redis
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MinesweeperSolver import MinesweeperSolver, _bits
+
+
+class LoadStats:
+
+    def __init__(self):
+        """
+        Initialize the measurements of a load test: the latencies of the successful requests of each route, the
+        number of requests and errors of each route, the sessions opened and the games played.
+        """
+        self.latencies = {}
+        self.requests = {}
+        self.errors = {}
+        self.games = {'win': 0, 'lose': 0, 'abandoned': 0, 'unfinished': 0}
+        self.moves = 0
+        self.sessions = 0
+
+    def record(self, route, seconds, error=None):
+        """
+        Record a request, with its error ('status 500', 'timeout', ...) if it failed.
+        """
+        self.requests[route] = self.requests.get(route, 0) + 1
+        if error is None:
+            self.latencies.setdefault(route, []).append(seconds)
+        else:
+            self.errors.setdefault(route, {})
+            self.errors[route][error] = self.errors[route].get(error, 0) + 1
+
+    def report(self, duration):
+        """
+        Summarize the measurements.
+
+        Parameters:
+        duration (float): The duration of the test, in seconds.
+
+        Returns:
+        dict: The throughput, and for each route the number of requests, the error rate with the errors by kind,
+              and the latency percentiles in milliseconds.
+        """
+        total = sum(self.requests.values())
+        routes = {}
+        for route, count in sorted(self.requests.items()):
+            latencies = np.array(self.latencies.get(route, [np.nan])) * 1000
+            errors = self.errors.get(route, {})
+            routes[route] = {'requests': count, 'error_rate': sum(errors.values()) / count, 'errors': errors,
+                             'latency_ms': {'p50': float(np.percentile(latencies, 50)), 'p90': float(np.percentile(latencies, 90)),
+                                            'p99': float(np.percentile(latencies, 99)), 'max': float(np.max(latencies)),
+                                            'mean': float(np.mean(latencies))}}
+        games = self.games['win'] + self.games['lose']
+        return {'duration_s': duration, 'requests': total, 'requests_per_s': total / duration,
+                'sessions': self.sessions, 'games': dict(self.games), 'games_per_s': games / duration, 'moves': self.moves,
+                'error_rate': sum(sum(errors.values()) for errors in self.errors.values()) / total if total else 0.0,
+                'routes': routes}
+
+
+async def request(http, stats, method, url, route, timeout, **kwargs):
+    """
+    Send a request and record its latency or its error.
+
+    Returns:
+    dict, str or None: The JSON body of the response (or its text for a non-JSON response), or None if it failed.
+    """
+    start = time.perf_counter()
+    try:
+        # The timeout applies to the connection and to the response, not to the wait for a free connection
+        async with http.request(method, url, timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout), **kwargs) as response:
+            body = await response.read()
+            if response.status != 200:
+                stats.record(route, time.perf_counter() - start, 'status %d' % response.status)
+                return None
+            stats.record(route, time.perf_counter() - start)
+            if response.content_type == 'application/json':
+                return json.loads(body)
+            return body.decode()
+    except asyncio.TimeoutError:
+        stats.record(route, time.perf_counter() - start, 'timeout')
+    except aiohttp.ClientError as error:
+        stats.record(route, time.perf_counter() - start, type(error).__name__)
+    return None
+
+
+async def play_game(http, stats, url, n, m, policy, rng, deadline, timeout, think_time):
+    """
+    Play one game on the server, from '/start' to a win or a loss.
+
+    Returns:
+    str: 'win', 'lose', 'abandoned' if a request failed, or 'unfinished' if the test ended during the game.
+    """
+    if await request(http, stats, 'POST', url + '/start', '/start', timeout, json={'boardSize': n, 'numMines': m}) is None:
+        return 'abandoned'
+
+    game_state = np.full((n, n), 9, dtype=int)
+    solver = MinesweeperSolver(n, m) if policy == 'solver' else None
+    while time.monotonic() < deadline:
+        if solver is not None:
+            action = solver.next_safe()
+            if action is None:
+                # Guess among the tiles that are not known to be mines
+                action = rng.choice(_bits(solver.unknown))
+        else:
+            action = rng.choice(np.flatnonzero(game_state == 9).tolist())
+
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+        data = await request(http, stats, 'POST', url + '/move', '/move', timeout, json={'action': int(action)})
+        if data is None:
+            return 'abandoned'
+        stats.moves += 1
+        result = data['info']['result']
+        if result in ('win', 'lose'):
+            return result
+        game_state.flat[data['revealed']] = data['values']
+        if solver is not None:
+            solver.update(game_state, data['revealed'])
+    return 'unfinished'
+
+
+async def player(connector, stats, url, mix, policy, delay, deadline, seed, timeout, think_time):
+    """
+    Simulate a player with its own session cookie, joining after a delay and playing games until the deadline.
+    """
+    await asyncio.sleep(delay)
+    rng = random.Random(seed)
+    configurations, weights = zip(*[((n, m), weight) for n, m, weight in mix])
+    async with aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                     cookie_jar=aiohttp.CookieJar(unsafe=True)) as http:
+        if await request(http, stats, 'GET', url + '/', '/', timeout) is None:
+            return
+        stats.sessions += 1
+        while time.monotonic() < deadline:
+            n, m = rng.choices(configurations, weights)[0]
+            stats.games[await play_game(http, stats, url, n, m, policy, rng, deadline, timeout, think_time)] += 1
+
+
+def redis_memory(client):
+    """
+    Read the memory used by a Redis server and its number of keys.
+    """
+    return client.info('memory')['used_memory'], client.dbsize()
+
+
+async def run_load(args, url, redis_client):
+    """
+    Run the players, and report the load test.
+    """
+    stats = LoadStats()
+    memory_before = redis_memory(redis_client) if redis_client is not None else None
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    start = time.monotonic()
+    deadline = start + args.duration
+    try:
+        await asyncio.gather(*[player(connector, stats, url, args.mix, args.policy, args.ramp_up * index / args.players, deadline, args.seed + index,
+                                      args.timeout, args.think_time) for index in range(args.players)])
+    finally:
+        await connector.close()
+    report = stats.report(time.monotonic() - start)
+    report['configuration'] = {'players': args.players, 'policy': args.policy, 'mix': args.mix,
+                               'connections': args.connections, 'workers': args.workers if args.launch else None,
+                               'think_time_s': args.think_time, 'ramp_up_s': args.ramp_up}
+
+    if redis_client is not None:
+        memory_after, keys_after = redis_memory(redis_client)
+        report['redis'] = {'used_memory_before': memory_before[0], 'used_memory_after': memory_after,
+                           'keys_before': memory_before[1], 'keys_after': keys_after,
+                           'bytes_per_1k_sessions': (memory_after - memory_before[0]) / max(stats.sessions, 1) * 1000}
+    return report
+
+
+def free_port():
+    """
+    Find a free TCP port on the local host.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch(args):
+    """
+    Launch a redis-server without persistence and a gunicorn serving app.py, and wait for the application to answer.
+
+    Returns:
+    tuple: The processes, the URL of the application and the URL of the Redis server.
+    """
+    redis_port, app_port = free_port(), free_port()
+    redis_url = 'redis://127.0.0.1:%d/0' % redis_port
+    redis_process = subprocess.Popen(['redis-server', '--port', str(redis_port), '--save', '', '--appendonly', 'no'],
+                                     stdout=subprocess.DEVNULL)
+    environment = dict(os.environ, REDIS_URL=redis_url, SECRET_KEY=os.environ.get('SECRET_KEY', 'loadtest'))
+    app_process = subprocess.Popen(['gunicorn', '--workers', str(args.workers), '--bind', '127.0.0.1:%d' % app_port,
+                                    '--log-level', 'warning'] + args.gunicorn_args + ['app:app'],
+                                   cwd=ROOT, env=environment)
+    url = 'http://127.0.0.1:%d' % app_port
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', app_port), timeout=1):
+                break
+        except OSError:
+            if time.monotonic() > deadline or app_process.poll() is not None:
+                stop([app_process, redis_process])
+                raise RuntimeError('The application did not start')
+            time.sleep(0.2)
+    return [app_process, redis_process], url, redis_url
+
+
+def stop(processes):
+    """
+    Stop the launched processes.
+    """
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def parse_mix(value):
+    """
+    Parse a configuration mix given as 'size:mines[:weight],...'.
+    """
+    mix = []
+    for configuration in value.split(','):
+        parts = [int(part) for part in configuration.split(':')]
+        if len(parts) not in (2, 3):
+            raise argparse.ArgumentTypeError("configurations are given as 'size:mines' or 'size:mines:weight'")
+        mix.append((parts[0], parts[1], parts[2] if len(parts) == 3 else 1))
+    return mix
+
+
+def print_report(report):
+    """
+    Print the main figures of a report.
+    """
+    print('%d requests in %.1fs: %.0f requests/s, %.1f games/s, error rate %.2f%%' % (
+        report['requests'], report['duration_s'], report['requests_per_s'], report['games_per_s'], 100 * report['error_rate']))
+    print('games: %(win)d won, %(lose)d lost, %(abandoned)d abandoned, %(unfinished)d unfinished' % report['games'])
+    for route, route_report in report['routes'].items():
+        latency = route_report['latency_ms']
+        print('%-8s %8d requests  p50 %7.1fms  p90 %7.1fms  p99 %7.1fms  max %7.1fms  errors %.2f%% %s' % (
+            route, route_report['requests'], latency['p50'], latency['p90'], latency['p99'], latency['max'],
+            100 * route_report['error_rate'], route_report['errors'] or ''))
+    if 'redis' in report:
+        print('redis: %+.0f bytes per 1000 sessions, %d -> %d keys' % (
+            report['redis']['bytes_per_1k_sessions'], report['redis']['keys_before'], report['redis']['keys_after']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='URL of a running application')
+    parser.add_argument('--redis-url', help='Redis server of the running application, to measure its memory')
+    parser.add_argument('--launch', action='store_true', help='launch a local gunicorn and redis-server for the test')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers, with --launch')
+    parser.add_argument('--gunicorn-args', nargs=argparse.REMAINDER, default=[], help='other gunicorn arguments, with --launch')
+    parser.add_argument('--players', type=int, default=1000, help='concurrent players, each with its own session')
+    parser.add_argument('--connections', type=int, default=200, help='maximum number of open connections')
+    parser.add_argument('--duration', type=float, default=30, help='duration of the test, in seconds')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('9:10,16:40,25:129'),
+                        help="board configurations, as 'size:mines[:weight],...'")
+    parser.add_argument('--policy', choices=['random', 'solver'], default='random', help='how the players click')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause of a player between two clicks, in seconds')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='time over which the players join, in seconds')
+    parser.add_argument('--timeout', type=float, default=10.0, help='timeout of a request, in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the players')
+    parser.add_argument('--output', help='JSON file receiving the report')
+    args = parser.parse_args()
+    if not args.launch and not args.url:
+        parser.error('either --url or --launch is required')
+
+    processes = []
+    url, redis_url = args.url, args.redis_url
+    if args.launch:
+        processes, url, redis_url = launch(args)
+    try:
+        redis_client = redis.from_url(redis_url) if redis_url else None
+        report = asyncio.run(run_load(args, url.rstrip('/'), redis_client))
+    finally:
+        stop(processes)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Throughput of the writer of `GamePersistence`: finished games and inserted rows (games and moves) per second when the
+queued games are written in batches, and when each game is committed on its own (a batch size of 1).
+
+By default the games are written to a temporary SQLite database with the tables of db_create_sqlite.sql; with
+--database-url they are written to an existing database with the tables of db_create.sql instead.
+
+    python benchmarks/persistence.py --games 20000 --batch-size 500 --output persistence.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game_persistence import GamePersistence
+
+
+def synthetic_games(count, n, m, seed=0):
+    """
+    Draw finished games of 5 to 40 moves one second apart, as queued by `record_move`.
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        start = time.time()
+        moves = [(rng.randrange(n * n), start + move) for move in range(rng.randint(5, 40))]
+        games.append({'user_id': None, 'mines': rng.sample(range(n * n), m), 'board_size': n, 'tiles_revealed': n * n - m,
+                      'game_status': rng.choice('WL'), 'game_start_time': start, 'game_end_time': moves[-1][1], 'moves': moves})
+    return games
+
+
+def sqlite_database(directory, name):
+    """
+    Create a SQLite database with the tables of db_create_sqlite.sql, returning its URL.
+    """
+    path = os.path.join(directory, name)
+    connection = sqlite3.connect(path)
+    with open(os.path.join(ROOT, 'db_create_sqlite.sql')) as schema:
+        connection.executescript(schema.read())
+    connection.close()
+    return 'sqlite:///' + path
+
+
+def throughput(database_url, games, batch_size):
+    """
+    Queue the games, then time the writer flushing them.
+
+    Returns:
+    dict: Games and inserted rows per second, along with the counters of the writer.
+    """
+    records = GamePersistence(None, database_url, max_queue=len(games) + 1, batch_size=batch_size)
+    for game in games:
+        records._queue.put(game)
+    start = time.perf_counter()
+    records.flush()
+    elapsed = time.perf_counter() - start
+    stats = records.stats()
+    return {'batch_size': batch_size, 'seconds': elapsed, 'games_per_second': stats['games'] / elapsed,
+            'inserts_per_second': (stats['games'] + stats['moves']) / elapsed, 'stats': stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=20000, help='games written in batches')
+    parser.add_argument('--single-games', type=int, default=2000, help='games committed one at a time')
+    parser.add_argument('--batch-size', type=int, default=500, help='games per batch')
+    parser.add_argument('--size', type=int, default=16, help='dimensions of the boards')
+    parser.add_argument('--mines', type=int, default=40, help='mines on each board')
+    parser.add_argument('--database-url', help='existing database receiving the games, a temporary SQLite one by default')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    games = synthetic_games(args.games, args.size, args.mines)
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, count, batch_size in (('batched', args.games, args.batch_size), ('single', args.single_games, 1)):
+            database_url = args.database_url or sqlite_database(directory, name + '.db')
+            results[name] = throughput(database_url, games[:count], batch_size)
+            print('%-8s %8d games in batches of %4d: %9.0f games/s, %10.0f inserts/s'
+                  % (name, results[name]['stats']['games'], batch_size, results[name]['games_per_second'],
+                     results[name]['inserts_per_second']))
+    print('speedup of the batches: %.1fx' % (results['batched']['inserts_per_second'] / results['single']['inserts_per_second']))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Time taken by `MineProbabilityEngine` on large frontiers: games are played with the solver, guessing the tile least
+likely to hold a mine whenever it is stuck, and the stuck positions with the largest frontiers are timed with exact
+counting from an empty memo, with the component counts memoized by a previous call, and under a time budget.
+
+    python benchmarks/probability.py --configs 25:129 40:330 60:740 --games 20 --output probability.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MinesweeperEnv import Minesweeper
+from MinesweeperProbability import MineProbabilityEngine
+from MinesweeperSolver import MinesweeperSolver, _bits
+
+
+def frontier_size(game_state, m):
+    """
+    Count the undetermined covered tiles next to a revealed number.
+    """
+    solver = MinesweeperSolver(game_state.shape[0], m)
+    solver.update(game_state)
+    solver.safe_tiles()
+    frontier = 0
+    for tile in _bits(solver.frontier):
+        frontier |= solver._neighbor_masks[tile] & solver.unknown
+    return frontier.bit_count()
+
+
+def stuck_positions(n, m, seed, engine):
+    """
+    Play a game with the solver, guessing the covered tile least likely to hold a mine when it is stuck, and list
+    the game states in which it was.
+    """
+    env = Minesweeper(n, m, seed=seed)
+    env.reset(seed=seed)
+    _, _, terminated, _, _ = env.step(n * n // 2 + n // 2 * (n % 2 == 0))
+    positions = []
+    while not terminated:
+        solver = MinesweeperSolver(n, m)
+        solver.update(env.game_state)
+        safe = solver.safe_tiles()
+        if not safe:
+            positions.append(env.game_state.copy())
+            probabilities = engine.probabilities(env.game_state, m).reshape(-1)
+            probabilities[env.revealed_mask.reshape(-1)] = 2
+            safe = [int(np.argmin(probabilities))]
+        for tile in safe:
+            _, _, terminated, _, _ = env.step(tile)
+            if terminated:
+                break
+    return positions
+
+
+def time_call(engine, game_state, m, **kwargs):
+    start = time.perf_counter()
+    engine.probabilities(game_state, m, **kwargs)
+    return time.perf_counter() - start
+
+
+def parse_config(value):
+    size, mines = value.split(':')
+    return int(size), int(mines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', type=parse_config, nargs='+', default=[(25, 129), (40, 330), (60, 740)],
+                        help="board configurations, as 'size:mines'")
+    parser.add_argument('--games', type=int, default=20, help='games played for each configuration')
+    parser.add_argument('--positions', type=int, default=3, help='largest frontiers timed for each configuration')
+    parser.add_argument('--time-budget', type=float, default=0.005, help='budget of the timed calls under a budget, in seconds')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    results = []
+    for n, m in args.configs:
+        engine = MineProbabilityEngine(time_budget=None)
+        positions = [position for seed in range(args.games) for position in stuck_positions(n, m, seed, engine)]
+        positions.sort(key=lambda game_state: -frontier_size(game_state, m))
+        for game_state in positions[:args.positions]:
+            engine = MineProbabilityEngine(time_budget=None)
+            result = {'size': n, 'mines': m, 'frontier': frontier_size(game_state, m),
+                      'exact_seconds': time_call(engine, game_state, m),
+                      'memoized_seconds': time_call(engine, game_state, m)}
+            engine = MineProbabilityEngine(time_budget=args.time_budget)
+            result['budget_seconds'] = time_call(engine, game_state, m)
+            result['budget_exact'] = engine.exact
+            results.append(result)
+            print('%d x %d, %d mines, frontier of %3d tiles: exact %8.1f ms, memoized %6.1f ms, '
+                  'with a %.0f ms budget %6.1f ms (%s)'
+                  % (n, n, m, result['frontier'], result['exact_seconds'] * 1e3, result['memoized_seconds'] * 1e3,
+                     args.time_budget * 1e3, result['budget_seconds'] * 1e3, 'exact' if result['budget_exact'] else 'estimated'))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
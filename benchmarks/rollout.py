@@ -0,0 +1,97 @@
+"""
+Throughput of the rollout collectors: environment steps per second of a batch of boards stepped with random covered
+tiles, for a loop over `Minesweeper` environments in this process, `VectorMinesweeper`, and `ParallelMinesweeper` with
+1 to N worker processes.
+
+    python benchmarks/rollout.py --envs 64 --size 16 --mines 40 --max-workers 8 --output rollout.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MinesweeperEnv import Minesweeper
+from ParallelMinesweeperEnv import ParallelMinesweeper
+from VectorMinesweeperEnv import VectorMinesweeper
+
+
+def random_actions(observations, rng):
+    """
+    Draw a random covered tile of each board, from the covered channel of the observations.
+    """
+    covered = observations[:, 9].reshape(len(observations), -1)
+    return np.argmax(rng.random(covered.shape) * covered, axis=1)
+
+
+def throughput(step, observations, num_envs, duration):
+    """
+    Step a batch with random covered tiles for a while.
+
+    Returns:
+    float: The number of environment steps per second.
+    """
+    rng = np.random.default_rng(0)
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        observations = step(random_actions(observations, rng))
+        steps += num_envs
+    return steps / (time.perf_counter() - start)
+
+
+def loop_collector(num_envs, n, m):
+    """
+    Step `Minesweeper` environments one after the other in this process, resetting the finished games.
+    """
+    envs = [Minesweeper(n, m, seed=index) for index in range(num_envs)]
+    observations = np.stack([env.reset() for env in envs])
+
+    def step(actions):
+        for index, (env, action) in enumerate(zip(envs, actions.tolist())):
+            _, _, terminated, _, _ = env.step(action, out=observations[index])
+            if terminated:
+                observations[index] = env.reset()
+        return observations
+    return step, observations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envs', type=int, default=64, help='boards in the batch')
+    parser.add_argument('--size', type=int, default=16, help='dimensions of the boards')
+    parser.add_argument('--mines', type=int, default=40, help='mines on each board')
+    parser.add_argument('--max-workers', type=int, default=multiprocessing.cpu_count(), help='largest number of worker processes')
+    parser.add_argument('--duration', type=float, default=3.0, help='time spent on each collector, in seconds')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    results = {'envs': args.envs, 'size': args.size, 'mines': args.mines, 'cpus': multiprocessing.cpu_count(), 'steps_per_second': {}}
+
+    step, observations = loop_collector(args.envs, args.size, args.mines)
+    results['steps_per_second']['loop'] = throughput(step, observations, args.envs, args.duration)
+
+    vector_env = VectorMinesweeper(args.envs, args.size, args.mines, seed=0)
+    results['steps_per_second']['vector'] = throughput(lambda actions: vector_env.step(actions)[0], vector_env.reset(seed=0),
+                                                       args.envs, args.duration)
+
+    for workers in range(1, args.max_workers + 1):
+        with ParallelMinesweeper(args.envs, args.size, args.mines, num_workers=workers, seed=0) as parallel_env:
+            results['steps_per_second']['parallel_%d' % workers] = throughput(lambda actions: parallel_env.step(actions)[0],
+                                                                              parallel_env.reset(), args.envs, args.duration)
+
+    for name, rate in results['steps_per_second'].items():
+        print('%-12s %10.0f steps/s' % (name, rate))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Throughput of `MinesweeperSolver`: games per second auto-played with `play` from a first click in the centre of the
+board, including the steps of the environment, and games per second of the solver alone, replaying the tiles revealed
+in these games either incrementally, as `play` does, or with a solve of the whole game state after each step.
+
+    python benchmarks/solver.py --size 25 --mines 129 --games 500 --output solver.json
+
+At expert density on 25 x 25 boards (129 mines), this falls short of thousands of games per second on one core: the
+solver alone handles 500 to 1000 games per second when the deductions are read after every update, as `play` does,
+and auto-playing them stays around 200 games per second, most of the time going to the ~200 single-tile steps of
+the environment each game takes. On 16 x 16 boards with 40 mines, the solver alone handles about 2000 games per
+second.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MinesweeperEnv import Minesweeper
+from MinesweeperSolver import MinesweeperSolver, play, solve
+
+
+class RecordingSolver(MinesweeperSolver):
+    """
+    A solver keeping the tiles of each of its updates, to replay the game without the environment.
+    """
+
+    def __init__(self, n, m):
+        super().__init__(n, m)
+        self.updates = []
+
+    def update(self, game_state, newly_revealed=None):
+        self.updates.append(np.asarray(newly_revealed))
+        super().update(game_state, newly_revealed)
+
+
+def autoplay(n, m, games):
+    """
+    Auto-play games from a click in the centre of the board.
+
+    Returns:
+    tuple: The games per second, the win rate, the mean number of steps, and the recorded games as (final game
+           state, updates) pairs.
+    """
+    wins = steps = 0
+    recorded = []
+    start = time.perf_counter()
+    for seed in range(games):
+        env = Minesweeper(n, m, seed=seed)
+        env.reset(seed=seed)
+        solver = RecordingSolver(n, m)
+        won, game_steps = play(env, n * n // 2 + n // 2 * (n % 2 == 0), solver)
+        wins += won
+        steps += game_steps
+        recorded.append((env.game_state.copy(), solver.updates))
+    return games / (time.perf_counter() - start), wins / games, steps / games, recorded
+
+
+def replay_incremental(n, m, recorded):
+    """
+    Replay the updates of recorded games on new solvers, reading the deductions once per game.
+    """
+    start = time.perf_counter()
+    for game_state, updates in recorded:
+        solver = MinesweeperSolver(n, m)
+        for tiles in updates:
+            solver.update(game_state, tiles)
+            solver.next_safe()
+        solver.safe_tiles()
+    return len(recorded) / (time.perf_counter() - start)
+
+
+def replay_recompute(n, m, recorded):
+    """
+    Replay recorded games solving the whole game state after each update.
+    """
+    start = time.perf_counter()
+    for game_state, updates in recorded:
+        revealed = np.zeros(n * n, dtype=bool)
+        for tiles in updates:
+            revealed[tiles] = True
+            solve(np.where(revealed.reshape(n, n), game_state, 9), m)
+    return len(recorded) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=25, help='dimensions of the boards')
+    parser.add_argument('--mines', type=int, default=129, help='mines on each board')
+    parser.add_argument('--games', type=int, default=500, help='games auto-played and replayed incrementally')
+    parser.add_argument('--recompute-games', type=int, default=100, help='games replayed with full solves')
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    n, m = args.size, args.mines
+    games_per_second, win_rate, steps, recorded = autoplay(n, m, args.games)
+    results = {'size': n, 'mines': m, 'win_rate': win_rate, 'steps_per_game': steps,
+               'updates_per_game': sum(len(updates) for _, updates in recorded) / len(recorded),
+               'autoplay_games_per_second': games_per_second,
+               'incremental_games_per_second': replay_incremental(n, m, recorded),
+               'recompute_games_per_second': replay_recompute(n, m, recorded[:args.recompute_games])}
+    print('%d x %d boards, %d mines: win rate %.2f, %.0f steps and %.1f updates per game'
+          % (n, n, m, win_rate, steps, results['updates_per_game']))
+    print('auto-play with the environment  %8.0f games/s' % results['autoplay_games_per_second'])
+    print('solver alone, incremental       %8.0f games/s' % results['incremental_games_per_second'])
+    print('solver alone, recomputed        %8.0f games/s' % results['recompute_games_per_second'])
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+class BoardCache:
+
+    def __init__(self, directory, size, seed=0, configurations=None, chunk_size=4096):
+        """
+        Initialize a cache of precomputed boards, stored in memory-mapped files shared by all the processes using
+        the same directory.
+
+        For each board size and number of mines, the cache holds `size` boards drawn before their first action. A
+        board is stored as the first m + 9 tiles of a random ordering of the tiles, its candidate mines, along with
+        the numbers of the board holding the first m of them. Once the first action is known, the mines are the
+        first m candidates outside of the 3x3 grid centered at the action, which are uniformly distributed among the
+        tiles outside of this grid, as when they are drawn by `Minesweeper._setupGameBoard`. The numbers are then
+        corrected around the few candidates that moved in or out, instead of being computed again.
+
+        The files are named after the configuration, the size and the seed of the cache, and are created the first
+        time a configuration is used, so the boards handed out only depend on the seed of the cache and on the
+        indices drawn by the games, which come from their own seeded generators.
+
+        The games only ever get these `size` boards per configuration: a training run of E episodes plays each of
+        them about E / size times, and an agent can learn the layouts rather than the game. The size has no default
+        for this reason. It should be chosen well above the number of episodes played on the cache, or the seed
+        changed between runs or epochs, which draws a new set of boards into new files.
+
+        Parameters:
+        directory (str): The directory holding the files of the cache.
+        size (int): The number of boards per configuration, the number of distinct layouts the games are played on.
+        seed (int): The seed of the random number generator drawing the boards.
+        configurations (iterable, optional): The (n, m) configurations to cache. By default, any configuration is
+                                             cached the first time it is used.
+        chunk_size (int): The number of boards drawn at once when a file is created.
+        """
+        self.directory = directory
+        self.size = size
+        self.seed = seed
+        self.configurations = None if configurations is None else set(configurations)
+        self.chunk_size = chunk_size
+
+        self._boards = {} # (n, m) -> memory-mapped records
+        self._lock = threading.Lock()
+        self.counters = {'boards': 0, 'remapped': 0, 'files_created': 0}
+
+    def boards(self, n, m):
+        """
+        Get the boards of a configuration, creating its file if needed.
+
+        Parameters:
+        n (int): The dimensions of the board.
+        m (int): The number of mines on the board.
+
+        Returns:
+        numpy.memmap or None: The records of the boards, with their 'candidates' and 'counts' fields, or None if
+                              the configuration is not cached. A configuration with more than n * n - 9 mines is
+                              never cached, as its m + 9 candidates would not fit on the board, and the games draw
+                              their boards instead.
+        """
+        boards = self._boards.get((n, m))
+        if boards is None:
+            if m > n * n - 9 or (self.configurations is not None and (n, m) not in self.configurations):
+                return None
+            with self._lock:
+                if (n, m) not in self._boards:
+                    self._boards[(n, m)] = self._open(n, m)
+                boards = self._boards[(n, m)]
+        return boards
+
+    def _open(self, n, m):
+        """
+        Map the file of a configuration, after drawing its boards if it does not exist. The file is written under a
+        temporary name and then renamed, so that another process never maps a partial file. Called with the lock
+        held.
+        """
+        path = os.path.join(self.directory, 'boards_%dx%d_%d_%d.npy' % (n, m, self.size, self.seed))
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            candidate_count = m + 9
+            dtype = np.dtype([('candidates', np.int16 if n * n <= np.iinfo(np.int16).max else np.int32, (candidate_count,)),
+                              ('counts', np.int8, (n, n))])
+            fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.npy')
+            os.close(fd)
+            try:
+                records = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=dtype, shape=(self.size,))
+                rng = np.random.default_rng([self.seed, n, m])
+                for start in range(0, self.size, self.chunk_size):
+                    count = min(self.chunk_size, self.size - start)
+                    # The smallest keys of random keys give the first tiles of a random ordering of the tiles
+                    keys = rng.random((count, n * n))
+                    candidates = np.argpartition(keys, candidate_count - 1, axis=1)[:, :candidate_count]
+                    candidates = np.take_along_axis(candidates, np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1), axis=1)
+                    mines = np.zeros((count, n * n), dtype=bool)
+                    np.put_along_axis(mines, candidates[:, :m], True, axis=1)
+                    records['candidates'][start:start + count] = candidates
+                    records['counts'][start:start + count] = _count(mines.reshape(count, n, n))
+                records.flush()
+                del records
+                os.replace(temporary_path, path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+            self.counters['files_created'] += 1
+        return np.load(path, mmap_mode='r').view(np.ndarray) # a plain array over the mapping, cheaper to index
+
+    def take(self, n, m, indices, actions):
+        """
+        Set up boards of the cache for their first action.
+
+        Parameters:
+        n (int): The dimensions of the board.
+        m (int): The number of mines on the board.
+        indices (numpy.ndarray): The indices of the boards in the cache.
+        actions (numpy.ndarray): The first action taken on each board.
+
+        Returns:
+        tuple: A 2-element tuple containing:
+            - mines (numpy.ndarray): A (k, m) array of the linear indices of the mines of each board.
+            - board (numpy.ndarray): A (k, n, n) int8 array of the boards, with -1 for the mines and the number of
+                                     neighboring mines elsewhere.
+
+        Raises:
+        KeyError: If the configuration is not cached.
+        """
+        boards = self.boards(n, m)
+        if boards is None:
+            raise KeyError((n, m))
+        records = boards[np.asarray(indices)]
+        candidates = records['candidates'].astype(int)
+        counts = records['counts'].copy()
+        rows, cols = np.asarray(actions)[:, None] // n, np.asarray(actions)[:, None] % n
+
+        # The mines are the first m candidates outside of the 3x3 grid centered at the first action
+        outside = (np.abs(candidates // n - rows) > 1) | (np.abs(candidates % n - cols) > 1)
+        chosen = outside & (np.cumsum(outside, axis=1) <= m)
+        boards_changed, slots = np.nonzero(chosen != (np.arange(candidates.shape[1]) < m))
+        if len(boards_changed) > 0:
+            # Correct the numbers around the candidates that left the grid of the first m or entered it
+            tiles = candidates[boards_changed, slots]
+            deltas = np.where(chosen[boards_changed, slots], 1, -1).astype(np.int8)
+            for i in (-1, 0, 1):
+                for j in (-1, 0, 1):
+                    neighbor_rows, neighbor_cols = tiles // n + i, tiles % n + j
+                    valid = (neighbor_rows >= 0) & (neighbor_rows < n) & (neighbor_cols >= 0) & (neighbor_cols < n)
+                    np.add.at(counts, (boards_changed[valid], neighbor_rows[valid], neighbor_cols[valid]), deltas[valid])
+
+        mines = candidates[chosen].reshape(len(candidates), m)
+        np.put_along_axis(counts.reshape(len(candidates), n * n), mines, -1, axis=1)
+        with self._lock:
+            self.counters['boards'] += len(candidates)
+            self.counters['remapped'] += len(np.unique(boards_changed))
+        return mines, counts
+
+    def take_one(self, n, m, index, action):
+        """
+        Set up one board of the cache for its first action. This is `take` for a single board, with the numbers
+        corrected by slices of the board, which is faster than the batched operations for a few tiles.
+
+        Parameters:
+        n (int): The dimensions of the board.
+        m (int): The number of mines on the board.
+        index (int): The index of the board in the cache.
+        action (int): The first action taken on the board.
+
+        Returns:
+        tuple: A 2-element tuple containing:
+            - mines (numpy.ndarray): The linear indices of the mines.
+            - board (numpy.ndarray): The n x n board, with -1 for the mines and the number of neighboring mines
+                                     elsewhere.
+
+        Raises:
+        KeyError: If the configuration is not cached.
+        """
+        boards = self.boards(n, m)
+        if boards is None:
+            raise KeyError((n, m))
+        record = boards[index]
+        candidates = record['candidates'].astype(int)
+        board = record['counts'].astype(int)
+        row, col = divmod(action, n)
+
+        # The mines are the first m candidates outside of the 3x3 grid centered at the first action
+        outside = (np.abs(candidates // n - row) > 1) | (np.abs(candidates % n - col) > 1)
+        mines = candidates[outside][:m]
+        removed = candidates[:m][~outside[:m]].tolist()
+        if removed:
+            # Correct the numbers around the candidates that left the grid of the first m or entered it
+            for tiles, delta in ((removed, -1), (mines[m - len(removed):].tolist(), 1)):
+                for tile in tiles:
+                    tile_row, tile_col = divmod(tile, n)
+                    board[max(tile_row - 1, 0):tile_row + 2, max(tile_col - 1, 0):tile_col + 2] += delta
+        board.flat[mines] = -1
+
+        with self._lock:
+            self.counters['boards'] += 1
+            self.counters['remapped'] += bool(removed)
+        return mines, board
+
+    def stats(self):
+        """
+        Get the counters of the cache: the boards handed out, the ones whose mines had to be moved out of the 3x3
+        grid of their first action, and the files created by this process.
+        """
+        with self._lock:
+            return dict(self.counters)
+
+
+def _count(mines):
+    """
+    Count the mines in the 3x3 grid centered at every cell of a batch of (k, n, n) mine masks, the cell included.
+    """
+    n = mines.shape[-1]
+    padded = np.pad(mines, ((0, 0), (1, 1), (1, 1))).astype(np.int8)
+    counts = np.zeros(mines.shape, dtype=np.int8)
+    for i in range(3):
+        for j in range(3):
+            counts += padded[:, i:i + n, j:j + n]
+    return counts
@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from MinesweeperEnv import Minesweeper
+from MinesweeperSolver import play
+
+
+# The 8 symmetries of the square (rotations and reflections), mapping the coordinates of a tile of an n x n board,
+# and the index of the inverse of each one
+_SYMMETRIES = [
+    lambda row, col, n: (row, col),
+    lambda row, col, n: (col, n - 1 - row),
+    lambda row, col, n: (n - 1 - row, n - 1 - col),
+    lambda row, col, n: (n - 1 - col, row),
+    lambda row, col, n: (row, n - 1 - col),
+    lambda row, col, n: (n - 1 - row, col),
+    lambda row, col, n: (col, row),
+    lambda row, col, n: (n - 1 - col, n - 1 - row),
+]
+_INVERSES = [0, 3, 2, 1, 4, 5, 6, 7]
+
+
+def canonical_action(n, action):
+    """
+    Map a first action to its canonical form under the symmetries of the board: the smallest tile it is mapped to.
+
+    A board that can be solved without guessing from a first action can be from the mirrored or rotated action once
+    the board is mirrored or rotated the same way, so layouts are only generated for the canonical actions.
+
+    Parameters:
+    n (int): The dimensions of the board.
+    action (int): The first action, a linear index of a tile on the board.
+
+    Returns:
+    tuple: A 2-element tuple containing:
+        - canonical (int): The canonical action.
+        - symmetry (int): The index of the symmetry mapping the action to the canonical action.
+    """
+    row, col = divmod(action, n)
+    images = []
+    for index, symmetry in enumerate(_SYMMETRIES):
+        image_row, image_col = symmetry(row, col, n)
+        images.append((image_row * n + image_col, index))
+    return min(images)
+
+
+def generate_no_guess(n, m, action, rng, max_attempts=1000):
+    """
+    Generate a board that can be solved without guessing from a first action, by rejection sampling: random boards
+    are drawn as by `Minesweeper._setupGameBoard` and played with the deterministic solver until one is won.
+
+    Parameters:
+    n (int): The dimensions of the board.
+    m (int): The number of mines on the board.
+    action (int): The first action.
+    rng (numpy.random.Generator): The random number generator placing the mines.
+    max_attempts (int): The number of boards drawn before giving up.
+
+    Returns:
+    tuple: A 2-element tuple containing:
+        - mines (numpy.ndarray or None): The linear indices of the mines, or None if no board drawn could be
+                                         solved without guessing.
+        - attempts (int): The number of boards drawn.
+    """
+    env = Minesweeper(n, m)
+    env.board_cache = None # draw every board, even if the applications serve this configuration from a board cache
+    for attempt in range(1, max_attempts + 1):
+        env.reset()
+        env.np_random = rng
+        won, _ = play(env, action)
+        if won:
+            return env.mines, attempt
+    return None, max_attempts
+
+
+class NoGuessBoardPool:
+
+    def __init__(self, size=16, max_attempts=1000, seed=None):
+        """
+        Initialize a pool of pregenerated boards that can be solved without guessing from their first action.
+
+        Finding such a board takes from one to a few hundred random draws depending on the density of mines, each
+        played with the deterministic solver, so the boards are generated ahead of the games by a background thread
+        and the first action of a no-guess game only takes one from the pool.
+
+        A board is only guaranteed to be solvable from the first action it was generated for. The pool keeps a queue
+        of boards for each board size, number of mines and canonical first action (see `canonical_action`), which
+        the board is mirrored or rotated back from. The queues are only created for the configurations passed to
+        `warm`, and the background thread keeps them filled: the configurations chosen by the clients never add
+        queues, nor work for the background thread.
+
+        A first action of a configuration that was not warmed, or whose queue is empty (a miss), gets no board from
+        the pool, and the game generates its own board (see `Minesweeper._setupGameBoard`). A first action for which
+        no board is found in `max_attempts` draws is remembered, and its queue is dropped.
+
+        Each board is stored as its bit-packed mine bitmap, 32 bytes for a 16 x 16 board.
+
+        Parameters:
+        size (int): The number of boards kept for each first action.
+        max_attempts (int): The number of random boards drawn to find a board solvable without guessing.
+        seed (int, optional): The seed of the random number generator placing the mines.
+        """
+        self.size = size
+        self.max_attempts = max_attempts
+        self.rng = np.random.default_rng(seed)
+
+        self._boards = {} # (n, m, canonical action) -> deque of bit-packed mine bitmaps
+        self._infeasible = set() # (n, m, canonical action) for which no board was found
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._filler = None
+        self.counters = {'hits': 0, 'misses': 0, 'unwarmed': 0, 'boards': 0, 'attempts': 0, 'failures': 0, 'generation_seconds': 0.0}
+
+    def take(self, n, m, action):
+        """
+        Take a pregenerated board that can be solved without guessing from a first action.
+
+        Parameters:
+        n (int): The dimensions of the board.
+        m (int): The number of mines on the board.
+        action (int): The first action.
+
+        Returns:
+        numpy.ndarray or None: The linear indices of the mines, or None if the pool holds no board for the first
+                               action, as its configuration was not warmed or its queue is empty.
+        """
+        canonical, symmetry = canonical_action(n, action)
+        key = (n, m, canonical)
+
+        with self._lock:
+            boards = self._boards.get(key)
+            if boards is None:
+                self.counters['unwarmed'] += 1
+                return None
+            packed = boards.popleft() if boards else None
+            self.counters['hits' if packed is not None else 'misses'] += 1
+        self._wakeup.set()
+        if packed is None:
+            return None
+
+        mines = np.flatnonzero(np.unpackbits(packed, count=n * n))
+
+        # Map the board from the canonical action back to the action played
+        rows, cols = _SYMMETRIES[_INVERSES[symmetry]](mines // n, mines % n, n)
+        return np.sort(rows * n + cols)
+
+    def warm(self, n, m):
+        """
+        Create the queues of all the first actions of a configuration, so that the background thread fills them
+        before the first games.
+
+        Parameters:
+        n (int): The dimensions of the board.
+        m (int): The number of mines on the board.
+        """
+        with self._lock:
+            for action in range(n * n):
+                canonical, _ = canonical_action(n, action)
+                if (n, m, canonical) not in self._infeasible:
+                    self._boards.setdefault((n, m, canonical), deque())
+        self._startFiller()
+        self._wakeup.set()
+
+    def _generate(self, key):
+        """
+        Generate a board for a queue, and record its cost. A queue for which no board is found is dropped.
+        """
+        n, m, action = key
+        start = time.perf_counter()
+        mines, attempts = generate_no_guess(n, m, action, self.rng, self.max_attempts)
+        with self._lock:
+            self.counters['attempts'] += attempts
+            self.counters['generation_seconds'] += time.perf_counter() - start
+            if mines is None:
+                self.counters['failures'] += 1
+                self._infeasible.add(key)
+                self._boards.pop(key, None)
+            else:
+                self.counters['boards'] += 1
+        return mines
+
+    def _startFiller(self):
+        """
+        Start the background thread filling the queues, if it is not running yet.
+        """
+        with self._lock:
+            if self._filler is None:
+                self._filler = threading.Thread(target=self._run, daemon=True)
+                self._filler.start()
+
+    def _run(self):
+        """
+        Fill the emptiest queue, one board at a time, and wait for a board to be taken once all of them are full.
+        """
+        while True:
+            with self._lock:
+                key, boards = min(self._boards.items(), key=lambda item: len(item[1]), default=(None, None))
+                full = boards is None or len(boards) >= self.size
+                if full:
+                    self._wakeup.clear()
+            if full:
+                self._wakeup.wait()
+                continue
+
+            mines = self._generate(key)
+            if mines is not None:
+                mine_mask = np.zeros(key[0] * key[0], dtype=bool)
+                mine_mask[mines] = True
+                boards.append(np.packbits(mine_mask))
+
+    def stats(self):
+        """
+        Get the counters of the pool, with the hit rate of the first actions and the generation rate.
+
+        Returns:
+        dict: The counters, along with `hit_rate`, the share of the first actions of the warmed configurations
+              served from the pool,
+              `boards_per_second` and `attempts_per_board`, the generation cost, and `pooled`, the number of boards
+              ready in the pool.
+        """
+        with self._lock:
+            stats = dict(self.counters, pooled=sum(len(boards) for boards in self._boards.values()))
+        served = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / served if served else 0.0
+        stats['boards_per_second'] = stats['boards'] / stats['generation_seconds'] if stats['generation_seconds'] else 0.0
+        stats['attempts_per_board'] = stats['attempts'] / stats['boards'] if stats['boards'] else 0.0
+        return stats
@@ -40,3 +40,32 @@ CREATE TABLE game_history (
   move_timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   tile_position INTEGER NOT NULL
 );
+
+CREATE INDEX games_user_id_game_status_idx ON games (user_id, game_status);
+
+CREATE INDEX game_history_game_id_move_number_idx ON game_history (game_id, move_number);
+
+-- Rollups of the finished games, updated with each batch of games written, so statistics never scan the games
+CREATE TABLE player_stats (
+  user_id INTEGER NOT NULL REFERENCES user_profiles(id),
+  board_size INTEGER NOT NULL,
+  mine_count INTEGER NOT NULL,
+  games_played INTEGER NOT NULL,
+  games_won INTEGER NOT NULL,
+  best_time_ms INTEGER, -- fastest win, NULL until the first win
+  total_moves BIGINT NOT NULL,
+  PRIMARY KEY (user_id, board_size, mine_count)
+);
+
+-- Leaderboards are read in order of this index, one page after the other
+CREATE INDEX player_stats_leaderboard_idx ON player_stats (board_size, mine_count, best_time_ms, user_id);
+
+CREATE TABLE config_stats (
+  board_size INTEGER NOT NULL,
+  mine_count INTEGER NOT NULL,
+  games_played INTEGER NOT NULL,
+  games_won INTEGER NOT NULL,
+  best_time_ms INTEGER, -- fastest win, NULL until the first win
+  total_moves BIGINT NOT NULL,
+  PRIMARY KEY (board_size, mine_count)
+);
@@ -0,0 +1,60 @@
+-- SQLite stand-in for the tables of db_create.sql, used by the tests and the benchmarks of game_persistence.py with
+-- a sqlite:/// DATABASE_URL. The types follow SQLite: ids are INTEGER PRIMARY KEY, the mines are stored as the text
+-- of the Postgres array ('{1,2,3}'), and the last login of user_profiles is not maintained by a trigger.
+CREATE TABLE user_profiles (
+  id INTEGER PRIMARY KEY,
+  username VARCHAR(255) UNIQUE NOT NULL,
+  hashed_password CHAR(60) NOT NULL DEFAULT '',
+  created_ip VARCHAR(45) NOT NULL DEFAULT '',
+  last_login_ip VARCHAR(45) DEFAULT NULL,
+  account_created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  last_login TIMESTAMP DEFAULT NULL,
+  email VARCHAR(255) UNIQUE
+);
+
+CREATE TABLE games (
+  id INTEGER PRIMARY KEY,
+  user_id INTEGER REFERENCES user_profiles(id),
+  mines TEXT NOT NULL,
+  board_size INTEGER NOT NULL,
+  number_of_moves INTEGER NOT NULL,
+  tiles_revealed INTEGER NOT NULL,
+  game_status CHAR(1) NOT NULL CHECK (game_status IN ('W', 'L', 'U')),
+  game_start_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  game_end_time TIMESTAMP
+);
+
+CREATE TABLE game_history (
+  id INTEGER PRIMARY KEY,
+  game_id INTEGER REFERENCES games(id),
+  move_number INTEGER NOT NULL,
+  move_timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  tile_position INTEGER NOT NULL
+);
+
+CREATE INDEX games_user_id_game_status_idx ON games (user_id, game_status);
+
+CREATE INDEX game_history_game_id_move_number_idx ON game_history (game_id, move_number);
+
+CREATE TABLE player_stats (
+  user_id INTEGER NOT NULL REFERENCES user_profiles(id),
+  board_size INTEGER NOT NULL,
+  mine_count INTEGER NOT NULL,
+  games_played INTEGER NOT NULL,
+  games_won INTEGER NOT NULL,
+  best_time_ms INTEGER,
+  total_moves BIGINT NOT NULL,
+  PRIMARY KEY (user_id, board_size, mine_count)
+);
+
+CREATE INDEX player_stats_leaderboard_idx ON player_stats (board_size, mine_count, best_time_ms, user_id);
+
+CREATE TABLE config_stats (
+  board_size INTEGER NOT NULL,
+  mine_count INTEGER NOT NULL,
+  games_played INTEGER NOT NULL,
+  games_won INTEGER NOT NULL,
+  best_time_ms INTEGER,
+  total_moves BIGINT NOT NULL,
+  PRIMARY KEY (board_size, mine_count)
+);
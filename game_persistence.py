@@ -0,0 +1,384 @@
+import atexit
+import datetime
+import queue
+import threading
+import time
+
+
+# Suffix of the INSERT statements of the rollup tables, adding the statistics of a batch to the existing ones
+STATS_UPSERT = """ ON CONFLICT ({0}) DO UPDATE SET
+    games_played = {1}.games_played + excluded.games_played,
+    games_won = {1}.games_won + excluded.games_won,
+    best_time_ms = CASE WHEN {1}.best_time_ms IS NULL OR excluded.best_time_ms < {1}.best_time_ms
+                        THEN excluded.best_time_ms ELSE {1}.best_time_ms END,
+    total_moves = {1}.total_moves + excluded.total_moves"""
+
+
+class GamePersistence:
+
+    def __init__(self, client, database_url, max_queue=10000, batch_size=500, flush_interval=1.0, put_timeout=1.0,
+                 ttl=60 * 60 * 2):
+        """
+        Initialize the pipeline writing finished games to the `games` and `game_history` tables.
+
+        The moves of a game are appended to a Redis list next to the game, `moves_<key>`, as they are played. The
+        list is created when the game starts and deleted when it ends, so the game is only recorded once: the moves
+        played after the end of the game, like clicking the same mine again, are not recorded. When the game ends,
+        its moves are taken out of Redis and the game is put on a bounded in-process queue. A
+        background thread writes the queued games in batches, with one multi-row INSERT per table, so a click never
+        waits for the database.
+
+        The same transaction keeps the statistics of the players and of the board configurations up to date in the
+        `player_stats` and `config_stats` rollup tables, so reading them never scans the games.
+
+        When the queue is full, the request finishing a game waits up to `put_timeout` seconds for the writer to
+        catch up, and the game is dropped (and counted) after that. A batch that could not be written is kept and
+        retried, on top of the queue. The queue is written out when the process exits.
+
+        Parameters:
+        client (redis.Redis): The Redis client holding the games.
+        database_url (str): The URL of the database, either postgres://... (written with psycopg2) or
+                            sqlite:///path, with the tables of db_create.sql (db_create_sqlite.sql for SQLite).
+        max_queue (int): The maximum number of finished games waiting to be written.
+        batch_size (int): The maximum number of games written in one transaction.
+        flush_interval (float): The time, in seconds, the writer waits to fill a batch.
+        put_timeout (float): The time, in seconds, a request waits for room in the queue.
+        ttl (int): The expiration time of the move lists in Redis, in seconds, as for the games.
+        """
+        self.client = client
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.ttl = ttl
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() # one writer at a time on the connection
+        self._pending = [] # games taken from the queue and not written yet
+        self._batch_ready = threading.Event()
+        self._writer = None
+        self._connection = None
+        self._readers = threading.local() # connections of the request threads reading the statistics
+        self.counters = {'games': 0, 'moves': 0, 'batches': 0, 'dropped': 0, 'errors': 0}
+
+    def start_game(self, key):
+        """
+        Start recording the moves of a new game, discarding those of the previous game of the session.
+
+        Parameters:
+        key (str): The key of the game, without the 'env_' prefix.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete('moves_' + key)
+        pipe.rpush('moves_' + key, 's:%.3f' % time.time())
+        pipe.expire('moves_' + key, self.ttl)
+        pipe.execute()
+
+    def record_move(self, key, action, env, result, user_id=None):
+        """
+        Record a move, and queue the game to be written to the database if the move ended it. Moves of games that
+        were not started with `start_game`, or that already ended, are not recorded.
+
+        Parameters:
+        key (str): The key of the game, without the 'env_' prefix.
+        action (int): The action taken, as a linear index of a tile on the board.
+        env (Minesweeper or None): The game after the move. It is only used if the game has ended.
+        result (str): The result of the move, as returned by `Minesweeper.step`. Invalid actions are not recorded.
+        user_id (int, optional): The id of the player in `user_profiles`, None for an anonymous game. Anonymous games
+                                 only count in the statistics of their board configuration.
+        """
+        if result == 'invalid action':
+            return
+        finished = result in ['win', 'lose']
+
+        # Append the move to the list of the game in progress, if any, and at the end of the game, take all the moves
+        # out of Redis, in one round trip
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpushx('moves_' + key, '%d:%.3f' % (action, time.time()))
+        if finished:
+            pipe.lrange('moves_' + key, 0, -1)
+            pipe.delete('moves_' + key)
+        else:
+            pipe.expire('moves_' + key, self.ttl)
+        replies = pipe.execute()
+        if not finished or not replies[0]: # the game is still in progress, or was not in progress
+            return
+
+        # Parse the moves, 's:<time>' marking the start of the game and '<tile>:<time>' a move
+        start_time = None
+        moves = []
+        for event in replies[1]:
+            tile, timestamp = event.split(b':')
+            if tile == b's':
+                start_time = float(timestamp)
+            else:
+                moves.append((int(tile), float(timestamp)))
+
+        game = {
+            'user_id': user_id,
+            'mines': env.mines.tolist(),
+            'board_size': env.n,
+            'tiles_revealed': int(env.revealed_mask.sum()),
+            'game_status': 'W' if result == 'win' else 'L',
+            'game_start_time': start_time if start_time is not None else moves[0][1],
+            'game_end_time': moves[-1][1],
+            'moves': moves
+        }
+        self._enqueue(game)
+
+    def _enqueue(self, game):
+        """
+        Put a finished game on the queue of the writer, waiting up to `put_timeout` seconds for room, and wake the
+        writer up once a batch is full.
+
+        Returns:
+        bool: Whether the game was queued, rather than dropped.
+        """
+        self._startWriter()
+        try:
+            self._queue.put(game, timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.counters['dropped'] += 1
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def _startWriter(self):
+        """
+        Start the background writer on first use, and write the queued games when the process exits.
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _connect(self):
+        """
+        Open a connection to the database, returning it along with its placeholder for query parameters.
+        """
+        if self.database_url.startswith('sqlite:///'):
+            import sqlite3
+            connection = sqlite3.connect(self.database_url[len('sqlite:///'):], isolation_level=None,
+                                         check_same_thread=False)
+            return connection, '?'
+        import psycopg2
+        return psycopg2.connect(self.database_url), '%s'
+
+    def _insert(self, cursor, placeholder, table, columns, rows, suffix='', max_parameters=30000):
+        """
+        Insert rows into a table with multi-row INSERT statements, each one with at most `max_parameters`
+        parameters and ending with `suffix`.
+        """
+        row_placeholders = '(' + ', '.join([placeholder] * len(columns)) + ')'
+        rows_per_statement = max(1, max_parameters // len(columns))
+        for start in range(0, len(rows), rows_per_statement):
+            chunk = rows[start:start + rows_per_statement]
+            cursor.execute('INSERT INTO %s (%s) VALUES %s%s' % (table, ', '.join(columns), ', '.join([row_placeholders] * len(chunk)), suffix),
+                           [value for row in chunk for value in row])
+
+    def _write(self, games):
+        """
+        Write a batch of finished games and their moves to the database, in a single transaction.
+        """
+        if not games:
+            return
+        if self._connection is None:
+            self._connection = self._connect()
+        connection, placeholder = self._connection
+        cursor = connection.cursor()
+        try:
+            # Reserve the ids of the games, so their moves can reference them without reading them back
+            if placeholder == '?':
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM games')
+                first_id = cursor.fetchone()[0] + 1
+                ids = range(first_id, first_id + len(games))
+            else:
+                cursor.execute("SELECT nextval(pg_get_serial_sequence('games', 'id')) FROM generate_series(1, %s)", (len(games),))
+                ids = [row[0] for row in cursor.fetchall()]
+
+            game_rows = []
+            move_rows = []
+            player_stats = {}
+            config_stats = {}
+            for game_id, game in zip(ids, games):
+                game_rows.append((game_id, game['user_id'], '{' + ','.join(map(str, game['mines'])) + '}', game['board_size'],
+                                  len(game['moves']), game['tiles_revealed'], game['game_status'],
+                                  _timestamp(game['game_start_time']), _timestamp(game['game_end_time'])))
+                for move_number, (tile, timestamp) in enumerate(game['moves'], 1):
+                    move_rows.append((game_id, move_number, _timestamp(timestamp), tile))
+
+                # Aggregate the statistics of the batch, as a key can only be updated once per statement
+                won = game['game_status'] == 'W'
+                time_ms = int(round((game['game_end_time'] - game['game_start_time']) * 1000)) if won else None
+                config = (game['board_size'], len(game['mines']))
+                keys = [(config_stats, config)]
+                if game['user_id'] is not None:
+                    keys.append((player_stats, (game['user_id'],) + config))
+                for stats, key in keys:
+                    played, wins, best_time_ms, moves = stats.get(key, (0, 0, None, 0))
+                    if time_ms is not None and (best_time_ms is None or time_ms < best_time_ms):
+                        best_time_ms = time_ms
+                    stats[key] = (played + 1, wins + won, best_time_ms, moves + len(game['moves']))
+
+            self._insert(cursor, placeholder, 'games', ['id', 'user_id', 'mines', 'board_size', 'number_of_moves', 'tiles_revealed',
+                                                        'game_status', 'game_start_time', 'game_end_time'], game_rows)
+            self._insert(cursor, placeholder, 'game_history', ['game_id', 'move_number', 'move_timestamp', 'tile_position'], move_rows)
+            for table, key_columns, stats in [('player_stats', ['user_id', 'board_size', 'mine_count'], player_stats),
+                                              ('config_stats', ['board_size', 'mine_count'], config_stats)]:
+                self._insert(cursor, placeholder, table, key_columns + ['games_played', 'games_won', 'best_time_ms', 'total_moves'],
+                             [key + value for key, value in stats.items()], suffix=STATS_UPSERT.format(', '.join(key_columns), table))
+            if placeholder == '?':
+                cursor.execute('COMMIT')
+            else:
+                connection.commit()
+        except Exception:
+            # Drop the connection, it is opened again for the next attempt
+            try:
+                if placeholder == '?':
+                    cursor.execute('ROLLBACK')
+                else:
+                    connection.rollback()
+                connection.close()
+            except Exception:
+                pass
+            self._connection = None
+            raise
+
+        with self._lock:
+            self.counters['games'] += len(games)
+            self.counters['moves'] += len(move_rows)
+            self.counters['batches'] += 1
+
+    def _run(self):
+        """
+        Background thread writing the queued games in batches, as soon as a batch is full or at the latest every
+        `flush_interval` seconds.
+        """
+        while True:
+            self._batch_ready.wait(self.flush_interval)
+            self._batch_ready.clear()
+            try:
+                self.flush()
+            except Exception:  # database unavailable - the games are kept, and the queue fills up meanwhile
+                with self._lock:
+                    self.counters['errors'] += 1
+
+    def flush(self):
+        """
+        Write all the queued games to the database, before returning. Games that could not be written are kept for
+        the next attempt.
+        """
+        with self._write_lock:
+            while True:
+                while len(self._pending) < self.batch_size:
+                    try:
+                        self._pending.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not self._pending:
+                    return
+                self._write(self._pending)
+                self._pending = []
+
+    def _readCursor(self):
+        """
+        Get a cursor on the database for the current thread, along with the placeholder for query parameters.
+        """
+        if getattr(self._readers, 'connection', None) is None:
+            connection, placeholder = self._connect()
+            if placeholder == '%s':
+                connection.autocommit = True
+            self._readers.connection = (connection, placeholder)
+        connection, placeholder = self._readers.connection
+        return connection.cursor(), placeholder
+
+    def game_stats(self, user_id=None):
+        """
+        Get the statistics of a player, or of all the players, for each board configuration.
+
+        Parameters:
+        user_id (int, optional): The id of the player. By default, the statistics of all the games are returned,
+                                 anonymous games included.
+
+        Returns:
+        list: A dictionary per board configuration, with the board size, number of mines, games played and won,
+              win rate, fastest win in milliseconds (None without a win) and average number of moves per game.
+        """
+        cursor, placeholder = self._readCursor()
+        columns = 'board_size, mine_count, games_played, games_won, best_time_ms, total_moves'
+        if user_id is None:
+            cursor.execute('SELECT %s FROM config_stats ORDER BY board_size, mine_count' % columns)
+        else:
+            cursor.execute('SELECT %s FROM player_stats WHERE user_id = %s ORDER BY board_size, mine_count' % (columns, placeholder), (user_id,))
+        return [{
+            'board_size': board_size,
+            'mines': mine_count,
+            'games_played': played,
+            'games_won': won,
+            'win_rate': won / played,
+            'best_time_ms': best_time_ms,
+            'average_moves': total_moves / played
+        } for board_size, mine_count, played, won, best_time_ms, total_moves in cursor.fetchall()]
+
+    def leaderboard(self, board_size, mines, limit=20, after=None):
+        """
+        Get a page of the players ranked by their fastest win on a board configuration.
+
+        Pages are read with keyset pagination on the (board_size, mine_count, best_time_ms, user_id) index of
+        `player_stats`: a page starts right after the last entry of the previous one, so reading any page costs the
+        same whatever the number of players.
+
+        Parameters:
+        board_size (int): The size of the board.
+        mines (int): The number of mines.
+        limit (int): The number of entries of the page.
+        after (tuple, optional): The (best_time_ms, user_id) of the last entry of the previous page, as returned in
+                                 `next`. By default, the first page is returned.
+
+        Returns:
+        dict: The entries of the page under 'entries', each one with the user id, username, fastest win in
+              milliseconds, games played and won, and under 'next' the position to pass as `after` to get the next
+              page, or None if this is the last one.
+        """
+        cursor, placeholder = self._readCursor()
+        query = ('SELECT s.user_id, u.username, s.best_time_ms, s.games_played, s.games_won '
+                 'FROM player_stats s LEFT JOIN user_profiles u ON u.id = s.user_id '
+                 'WHERE s.board_size = {0} AND s.mine_count = {0} AND s.best_time_ms IS NOT NULL ')
+        parameters = [board_size, mines]
+        if after is not None:
+            query += 'AND (s.best_time_ms, s.user_id) > ({0}, {0}) '
+            parameters += list(after)
+        query += 'ORDER BY s.best_time_ms, s.user_id LIMIT {0}'
+        cursor.execute(query.format(placeholder), parameters + [limit])
+        entries = [{
+            'user_id': user_id,
+            'username': username,
+            'best_time_ms': best_time_ms,
+            'games_played': played,
+            'games_won': won
+        } for user_id, username, best_time_ms, played, won in cursor.fetchall()]
+        last = entries[-1] if len(entries) == limit else None
+        return {'entries': entries, 'next': [last['best_time_ms'], last['user_id']] if last else None}
+
+    def stats(self):
+        """
+        Get the counters of the pipeline.
+
+        Returns:
+        dict: The number of games, moves and batches written, games dropped because the queue was full and failed
+              writes, along with the current number of queued games.
+        """
+        with self._lock:
+            return dict(self.counters, queued=self._queue.qsize())
+
+
+def _timestamp(seconds):
+    """
+    Format a Unix time as a timestamp in local time, as CURRENT_TIMESTAMP would.
+    """
+    return datetime.datetime.fromtimestamp(seconds).isoformat(sep=' ')
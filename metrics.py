@@ -0,0 +1,225 @@
+import bisect
+import math
+import threading
+import time
+
+
+# Upper bounds of the buckets of the histograms, in seconds for the latencies
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class _Timer:
+
+    def __init__(self, metrics, family, key):
+        self.metrics = metrics
+        self.family = family
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics._record(self.family, time.perf_counter() - self.start, self.key)
+        return False
+
+
+class _NoTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+
+class Metrics:
+
+    def __init__(self, enabled=True):
+        """
+        Initialize a registry of metrics, exported in the Prometheus text format by `render`.
+
+        Two kinds of metrics are kept: counters, and histograms counting the observed values below each bucket
+        bound along with their sum. Each metric holds one series per set of label values. Values are added under a
+        lock, in a few dictionary and list operations, so the metrics can stay enabled under load. The values of
+        other components, such as the counters of the caches, are read when the metrics are rendered, from the
+        functions registered with `add_collector`.
+
+        A disabled registry records nothing: `stage` returns a timer that does nothing, and the other methods
+        return right away.
+
+        The metrics are kept per process. With several web workers, each one exports its own metrics.
+
+        Parameters:
+        enabled (bool): Whether the metrics are recorded.
+        """
+        self.enabled = enabled
+        self._families = {} # name -> [type, help, buckets, {label values: series}]
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def counter(self, name, help):
+        """
+        Declare a counter.
+
+        Parameters:
+        name (str): The name of the counter, ending with '_total' by convention.
+        help (str): The description of the counter.
+        """
+        self._families[name] = ['counter', help, None, {}]
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        """
+        Declare a histogram.
+
+        Parameters:
+        name (str): The name of the histogram.
+        help (str): The description of the histogram.
+        buckets (tuple): The increasing upper bounds of the buckets, the last bucket, without bound, being added.
+        """
+        self._families[name] = ['histogram', help, tuple(buckets), {}]
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Add to a counter.
+        """
+        if self.enabled:
+            key = tuple(sorted(labels.items())) if labels else ()
+            series = self._families[name][3]
+            with self._lock:
+                series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value in a histogram.
+        """
+        if self.enabled:
+            self._record(self._families[name], value, tuple(sorted(labels.items())) if labels else ())
+
+    def _record(self, family, value, key):
+        _, _, buckets, series = family
+        with self._lock:
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(buckets) + 1) + [0.0] # count per bucket, then the sum
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def stage(self, name, **labels):
+        """
+        Time a block of code into a histogram of durations, used as `with metrics.stage(name, stage='step'):`.
+        """
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, self._families[name], tuple(sorted(labels.items())))
+
+    def add_collector(self, prefix, help, collect):
+        """
+        Register a function whose values are exported as gauges when the metrics are rendered.
+
+        Parameters:
+        prefix (str): The prefix of the names of the gauges.
+        help (str): The description of the values.
+        collect (callable): A function returning a dict of numbers, each exported as the gauge `<prefix>_<key>`.
+        """
+        self._collectors.append((prefix, help, collect))
+
+    def instrument_redis(self, client, name='redis_round_trips_total'):
+        """
+        Count the round trips of a Redis client to the server, in a counter and in a count kept per thread.
+
+        Every command, or every pipeline of commands, is sent to the server in one call of its connection, which
+        is wrapped in a subclass of the connection class used by the pool of the client.
+
+        Parameters:
+        client (redis.Redis): The Redis client to instrument.
+        name (str): The name of the counter of round trips.
+        """
+        if not self.enabled:
+            return
+        self.counter(name, "Commands or pipelines sent to Redis.")
+        metrics = self
+        series = self._families[name][3]
+        pool = client.connection_pool
+        connection_class = pool.connection_class
+
+        class CountingConnection(connection_class):
+            def send_packed_command(self, command, check_health=True):
+                if metrics.enabled:
+                    with metrics._lock:
+                        series[()] = series.get((), 0) + 1
+                    metrics._local.round_trips = getattr(metrics._local, 'round_trips', 0) + 1
+                return super().send_packed_command(command, check_health)
+
+        CountingConnection.__name__ = 'Counting' + connection_class.__name__
+        pool.connection_class = CountingConnection
+
+    def round_trips(self, reset=False):
+        """
+        Get the number of Redis round trips of the current thread, counted by the clients given to
+        `instrument_redis`.
+
+        Parameters:
+        reset (bool): Whether to reset the count of the thread after reading it.
+        """
+        count = getattr(self._local, 'round_trips', 0)
+        if reset:
+            self._local.round_trips = 0
+        return count
+
+    def render(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+        str: The metrics, with one line per counter, bucket, sum, count and gauge.
+        """
+        lines = []
+        with self._lock:
+            families = [(name, kind, help, buckets, dict((key, list(value) if kind == 'histogram' else value)
+                                                         for key, value in series.items()))
+                        for name, (kind, help, buckets, series) in self._families.items()]
+        for name, kind, help, buckets, series in families:
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for key, value in sorted(series.items()):
+                if kind == 'counter':
+                    lines.append('%s%s %s' % (name, _labels(key), _number(value)))
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (math.inf,), value):
+                    cumulative += count
+                    lines.append('%s_bucket%s %d' % (name, _labels(key + (('le', _number(bound)),)), cumulative))
+                lines.append('%s_sum%s %s' % (name, _labels(key), _number(value[-1])))
+                lines.append('%s_count%s %d' % (name, _labels(key), cumulative))
+
+        for prefix, help, collect in self._collectors:
+            for key, value in sorted(collect().items()):
+                if isinstance(value, (int, float)):
+                    lines.append('# HELP %s_%s %s' % (prefix, key, help))
+                    lines.append('# TYPE %s_%s gauge' % (prefix, key))
+                    lines.append('%s_%s %s' % (prefix, key, _number(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(key):
+    """
+    Format label values as '{name="value",...}', escaping the values.
+    """
+    if not key:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (label, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                             for label, value in key)
+
+
+def _number(value):
+    """
+    Format a number as Prometheus expects it.
+    """
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
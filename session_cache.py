@@ -0,0 +1,223 @@
+import atexit
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from MinesweeperEnv import Minesweeper
+
+
+class _Entry:
+
+    def __init__(self, env, version):
+        self.env = env
+        self.version = version # version of the latest local write
+        self.stored_version = version # version last known to be in Redis
+        self.pending = None # serialized game waiting to be written to Redis
+        self.last_used = time.monotonic()
+
+
+class SessionCache:
+
+    def __init__(self, client, max_size=1024, max_idle=300, flush_interval=0.05, ttl=60 * 60 * 2):
+        """
+        Initialize an in-process cache of live games, written behind to Redis.
+
+        Each web worker keeps the `Minesweeper` objects of its most recently used sessions, so a click served by the
+        same worker as the previous one skips the download and decoding of the game. Writes are kept in memory and
+        written to Redis by a background thread, coalescing the successive moves of a session into one SET.
+
+        Every write carries a version stamp, stored in Redis next to the game. Before using a cached game, its stamp
+        is compared with the one in Redis (a single small GET): if another worker wrote the game in the meantime,
+        the cached copy is stale and the game is loaded again from Redis.
+
+        Parameters:
+        client (redis.Redis): The Redis client holding the games.
+        max_size (int): The maximum number of games kept in the cache. The least recently used game is evicted first.
+        max_idle (float): The time, in seconds, after which a game that was not used is evicted.
+        flush_interval (float): The time, in seconds, between two writes of the pending games to Redis.
+        ttl (int): The expiration time of the games in Redis, in seconds, counted from their last write.
+        """
+        self.client = client
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() # one write at a time, so that an older version never lands last
+        self._worker_id = uuid.uuid4().hex[:8].encode()
+        self._counter = 0
+        self._flusher = None
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'flushes': 0}
+
+    def _nextVersion(self):
+        """
+        Create a version stamp unique to this worker and this write.
+        """
+        self._counter += 1
+        return self._worker_id + b':%d' % self._counter
+
+    def get(self, key):
+        """
+        Get the game stored under the given key.
+
+        Parameters:
+        key (str): The key of the game, without the 'env_' prefix.
+
+        Returns:
+        Minesweeper or None: The game, or None if there is no game (or one in an older format) under this key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            stored_version = self.client.get('ver_' + key)
+            # The cached copy is current if no other worker wrote the game since this one loaded or wrote it. The
+            # version in Redis is compared by worker rather than by value, as a background write of this worker can
+            # land between the GET above and this check.
+            if stored_version is not None and (stored_version == entry.stored_version or
+                                               stored_version.split(b':')[0] == self._worker_id):
+                with self._lock:
+                    self.counters['hits'] += 1
+                    entry.last_used = time.monotonic()
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                return entry.env
+            with self._lock:
+                self.counters['stale'] += 1
+
+        with self._lock:
+            self.counters['misses'] += 1
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get('env_' + key)
+        pipe.get('ver_' + key)
+        serialized_env, stored_version = pipe.execute()
+        if serialized_env is None:
+            return None
+        try:
+            env = Minesweeper.from_bytes(serialized_env)
+        except ValueError:  # stored with an older format
+            return None
+
+        with self._lock:
+            entry = _Entry(env, stored_version)
+            self._entries[key] = entry
+        self._evict()
+        return env
+
+    def put(self, key, env, flush=False):
+        """
+        Store a game under the given key.
+
+        The game is serialized right away, so it can keep changing afterwards, and written to Redis by the
+        background thread, unless `flush` is set.
+
+        Parameters:
+        key (str): The key of the game, without the 'env_' prefix.
+        env (Minesweeper): The game to store.
+        flush (bool): Whether the game should be written to Redis before returning, for instance when the game
+                      starts or ends.
+        """
+        serialized_env = env.to_bytes()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.env is not env:
+                entry = _Entry(env, None)
+                self._entries[key] = entry
+            entry.version = self._nextVersion()
+            entry.pending = serialized_env
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+        if flush:
+            self.flush([key])
+        self._evict()
+
+    def flush(self, keys=None):
+        """
+        Write the pending games to Redis, in a single pipelined round trip.
+
+        Parameters:
+        keys (list, optional): The keys of the games to write. By default, every pending game is written.
+        """
+        with self._write_lock:
+            with self._lock:
+                batch = []
+                for key in (self._entries if keys is None else keys):
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.pending is not None:
+                        batch.append((key, entry, entry.pending, entry.version))
+                        entry.pending = None
+            self._write(batch)
+
+    def _write(self, batch):
+        """
+        Write a batch of (key, entry, serialized game, version) to Redis.
+        """
+        if not batch:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key, _, serialized_env, version in batch:
+            pipe.set('env_' + key, serialized_env, self.ttl)
+            pipe.set('ver_' + key, version, self.ttl)
+        try:
+            pipe.execute()
+        except Exception:
+            # Keep the games pending, unless a newer write is already waiting
+            with self._lock:
+                for _, entry, serialized_env, _ in batch:
+                    if entry.pending is None:
+                        entry.pending = serialized_env
+            raise
+        with self._lock:
+            self.counters['flushes'] += 1
+            for _, entry, _, version in batch:
+                entry.stored_version = version
+
+    def _evict(self):
+        """
+        Evict the least recently used games above the maximum size and the games idle for too long, writing them to
+        Redis first if they are pending.
+        """
+        with self._write_lock:
+            now = time.monotonic()
+            with self._lock:
+                batch = []
+                while self._entries:
+                    key, entry = next(iter(self._entries.items()))
+                    if len(self._entries) <= self.max_size and now - entry.last_used <= self.max_idle:
+                        break
+                    del self._entries[key]
+                    self.counters['evictions'] += 1
+                    if entry.pending is not None:
+                        batch.append((key, entry, entry.pending, entry.version))
+                        entry.pending = None
+            self._write(batch)
+
+    def _run(self):
+        """
+        Background thread writing the pending games and evicting the idle ones at a regular interval.
+        """
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self._evict()
+            except Exception:  # Redis unavailable - the games stay pending until the next attempt
+                pass
+
+    def stats(self):
+        """
+        Get the counters of the cache.
+
+        Returns:
+        dict: The number of hits, misses, stale copies detected, evictions and flushes to Redis, along with the
+              current number of cached games.
+        """
+        with self._lock:
+            return dict(self.counters, size=len(self._entries))
@@ -3,15 +3,62 @@ var boardSize;
 var numMines;
 var isGameOver = false;
 var flaggedCells = [];
+var needsResync = false;
+var socket = null;
+var pendingMessages = [];
+
+// Function to open the WebSocket game channel, used instead of the '/start' and '/move' requests while it is open
+function openSocket() {
+    if (!('WebSocket' in window)) {
+        return;
+    }
+    var ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/ws');
+    ws.onopen = function() {
+        socket = ws;
+    };
+    ws.onmessage = function(event) {
+        // Responses come back in the order of the messages
+        var message = pendingMessages.shift();
+        var data = JSON.parse(event.data);
+        if (data.error) {
+            // The message was rejected and changed nothing: show why, as for the JSON routes, and keep the resync it asked for
+            showError(data.error);
+            if (message.resync) {
+                needsResync = true;
+            }
+            return;
+        }
+        showError('');
+        if (message.type === 'start') {
+            buildBoard();
+        } else {
+            showMove(data, message.row, message.col);
+        }
+    };
+    ws.onclose = function() {
+        // Fall back to the JSON routes. Moves waiting for a response may have been applied, so resync on the next one.
+        socket = null;
+        if (pendingMessages.some(message => message.type === 'move')) {
+            needsResync = true;
+        }
+        pendingMessages = [];
+    };
+}
+// Only the applications serving the channel mark the page with it, the other ones would refuse every connection
+if ('websocket' in document.body.dataset) {
+    openSocket();
+}
 
 // Function to start a new game
 function startGame() {
     // Reset game state
     isGameOver = false;
+    needsResync = false;
 
     // Get board size and mine count from user input
     boardSize = parseInt(document.getElementById('boardSize').value);
     numMines = document.getElementById('numMines').value;
+    var noGuess = document.getElementById('noGuess').checked;
     document.getElementById('currentSettings').innerText = `size ${boardSize} minesweeper board with ${numMines} mines`;
 
     // Initialize flagged cell array
@@ -21,6 +68,18 @@ function startGame() {
     document.getElementById('flagsUsed').textContent = 'Flags used: ' + countFlags(flaggedCells);
     gameResult.innerHTML = '&nbsp'
 
+    // Start the game on the server over the WebSocket if it is open
+    if (socket) {
+        pendingMessages.push({type: 'start'});
+        socket.send(JSON.stringify({
+            type: 'start',
+            boardSize: boardSize,
+            numMines: numMines,
+            noGuess: noGuess
+        }));
+        return;
+    }
+
     // Post request to '/start' endpoint to start the game on the server
     fetch('/start', {
         method: 'POST',
@@ -29,108 +88,166 @@ function startGame() {
         },
         body: JSON.stringify({
             boardSize: boardSize,
-            numMines: numMines
+            numMines: numMines,
+            noGuess: noGuess
         })
     })
-    .then(response => response.json())
-    .then(data => {
-        // Generate game board in HTML dynamically
-        var gameBoard = document.getElementById('gameBoard');
-        gameBoard.innerHTML = ''; // Clear any existing board
-        for (var i = 0; i < boardSize; i++) {
-            var row = document.createElement('tr');
-            for (var j = 0; j < boardSize; j++) {
-                var cell = document.createElement('td');
-                cell.setAttribute('onclick', 'makeMove(' + i + ', ' + j + ')');
-                cell.setAttribute('oncontextmenu', 'flagCell(event, ' + i + ', ' + j + ')');
-                var img = document.createElement('img');
-                img.setAttribute('id', 'cell'+i+'-'+j);
-                img.setAttribute('src', '/static/images/unrevealed.png');
-                cell.appendChild(img);
-                row.appendChild(cell);
-            }
-            gameBoard.appendChild(row);
+    .then(response => {
+        if (!response.ok) {
+            return response.text().then(showError);
         }
+        showError('');
+        buildBoard();
     });
 }
 
+// Function to show the error message sent back by the server for a rejected request, or clear it
+function showError(message) {
+    document.getElementById('error').innerText = message;
+}
+
+// Function to generate the game board in HTML dynamically
+function buildBoard() {
+    var gameBoard = document.getElementById('gameBoard');
+    gameBoard.innerHTML = ''; // Clear any existing board
+    for (var i = 0; i < boardSize; i++) {
+        var row = document.createElement('tr');
+        for (var j = 0; j < boardSize; j++) {
+            var cell = document.createElement('td');
+            cell.setAttribute('onclick', 'makeMove(' + i + ', ' + j + ')');
+            cell.setAttribute('oncontextmenu', 'flagCell(event, ' + i + ', ' + j + ')');
+            var img = document.createElement('img');
+            img.setAttribute('id', 'cell'+i+'-'+j);
+            img.setAttribute('src', '/static/images/unrevealed.png');
+            cell.appendChild(img);
+            row.appendChild(cell);
+        }
+        gameBoard.appendChild(row);
+    }
+}
+
+// Function to display the value of a cell on the board
+function setCellImage(row, col, value) {
+    var img = document.getElementById('cell'+row+'-'+col);
+    var imgName = 'unrevealed';
+    if (value === -1) {
+        imgName = 'bomb';
+    } else if (value >= 0 && value <= 8) {
+        imgName = value.toString();
+    }
+
+    // If the cell is flagged, keep displaying the flag image
+    if (!flaggedCells[row][col]) {
+        img.setAttribute('src', '/static/images/' + imgName + '.png');
+    }
+    return img;
+}
+
 // Function to make a move on the board
 function makeMove(row, col) {
     // If the game is over or the cell is flagged, ignore the click
     if (isGameOver || flaggedCells[row][col]) {
         return;
-    }    
+    }
+
+    // Send the move over the WebSocket if it is open
+    if (socket) {
+        pendingMessages.push({type: 'move', row: row, col: col, resync: needsResync});
+        socket.send(JSON.stringify({
+            type: 'move',
+            action: row * boardSize + col,
+            resync: needsResync
+        }));
+        needsResync = false;
+        return;
+    }
+
     fetch('/move', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
-            action: row * boardSize + col
+            action: row * boardSize + col,
+            resync: needsResync
         })
     })
-    .then(response => response.json())
-    .then(data => {
+    .then(response => {
+        if (!response.ok) {
+            // The move was rejected and changed nothing, show why
+            return response.text().then(showError);
+        }
+        return response.json().then(data => {
+            showError('');
+            showMove(data, row, col);
+            needsResync = false;
+        });
+    })
+    .catch(error => {
+        // A move may have been applied without its response, so ask for the whole board on the next move
+        needsResync = true;
+    });
+}
+
+// Function to display the result of a move on the board
+function showMove(data, row, col) {
+    if (data.info.result === 'win' || data.info.result === 'lose') {
         // If game has ended, data.actual_board will be the complete board.
-        var board = (data.info.result === 'win' || data.info.result === 'lose') ? data.actual_board : data.board;
         for (var i = 0; i < boardSize; i++) {
             for (var j = 0; j < boardSize; j++) {
-                var img = document.getElementById('cell'+i+'-'+j);
-                var imgValue = board[i][j];
-                var imgName = 'unrevealed';
-                if (imgValue === -1) {
-                    imgName = 'bomb';
-                } else if (imgValue >= 0 && imgValue <= 8) {
-                    imgName = imgValue.toString();
-                }
-        
-                // If the cell is flagged, keep displaying the flag image
-                if (!flaggedCells[i][j]) {
-                    img.setAttribute('src', '/static/images/' + imgName + '.png');
-                }
-        
-                if (data.info.result === 'win' || data.info.result === 'lose') {
-                    img.classList.add('game-over');  // Grey out tiles if the game has ended.
-                }
+                setCellImage(i, j, data.actual_board[i][j]).classList.add('game-over');  // Grey out tiles if the game has ended.
             }
         }
-
-        if (data.info.result === 'lose') {
-            // Show a 'boom' image at the location of the last click
-            var img = document.getElementById('cell'+row+'-'+col);
-            img.setAttribute('src', '/static/images/boom.png');
+    } else if (data.board) {
+        // The whole board was sent back to resync the display
+        for (var i = 0; i < boardSize; i++) {
+            for (var j = 0; j < boardSize; j++) {
+                setCellImage(i, j, data.board[i][j]);
+            }
         }
-
-        // Update flags counter
-        document.getElementById('flagsUsed').textContent = 'Flags used: ' + countFlags(flaggedCells);
-        
-        var gameResult = document.getElementById('gameResult');
-        gameResult.innerHTML = '';
-
-        // Update game status message based on the result from server
-        switch (data.info.result) {
-            case 'win':
-                gameResult.style.color = 'green';
-                gameResult.innerText = 'Victory!';
-                break;
-            case 'lose':
-                gameResult.style.color = 'red';
-                gameResult.innerText = 'Lost!';
-                break;
-            case 'invalid action':
-                gameResult.style.color = 'orange';
-                gameResult.innerText = 'Invalid action!';
-                break;
-            default:
-                gameResult.innerHTML = '&nbsp';  // no message for "continue"
-                break;
+    } else {
+        // Only update the cells revealed by this move
+        for (var k = 0; k < data.revealed.length; k++) {
+            var index = data.revealed[k];
+            setCellImage(Math.floor(index / boardSize), index % boardSize, data.values[k]);
         }
+    }
 
-        // Update game over state if win or loss is detected
-        if (data.info.result === 'win' || data.info.result === 'lose') {
-            isGameOver = true;
-        }
-    });
+    if (data.info.result === 'lose') {
+        // Show a 'boom' image at the location of the last click
+        var img = document.getElementById('cell'+row+'-'+col);
+        img.setAttribute('src', '/static/images/boom.png');
+    }
+
+    // Update flags counter
+    document.getElementById('flagsUsed').textContent = 'Flags used: ' + countFlags(flaggedCells);
+
+    var gameResult = document.getElementById('gameResult');
+    gameResult.innerHTML = '';
+
+    // Update game status message based on the result from server
+    switch (data.info.result) {
+        case 'win':
+            gameResult.style.color = 'green';
+            gameResult.innerText = 'Victory!';
+            break;
+        case 'lose':
+            gameResult.style.color = 'red';
+            gameResult.innerText = 'Lost!';
+            break;
+        case 'invalid action':
+            gameResult.style.color = 'orange';
+            gameResult.innerText = 'Invalid action!';
+            break;
+        default:
+            gameResult.innerHTML = '&nbsp';  // no message for "continue"
+            break;
+    }
+
+    // Update game over state if win or loss is detected
+    if (data.info.result === 'win' || data.info.result === 'lose') {
+        isGameOver = true;
+    }
 }
 
 // Function to flag a cell
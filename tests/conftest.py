@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pytest
+
+# The modules live at the root of the repository, next to the applications
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def redis_client():
+    """
+    A client of the Redis server of REDIS_URL, database 15 of a local server by default, along with a list of the
+    keys to delete after the test. The test is skipped when there is no server.
+    """
+    import redis
+    client = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/15'))
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip('Redis is not available')
+    keys = []
+    yield client, keys
+    if keys:
+        client.delete(*keys)
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    """
+    The URL of a new SQLite database with the tables of db_create_sqlite.sql.
+    """
+    path = tmp_path / 'games.db'
+    connection = sqlite3.connect(path)
+    with open(os.path.join(ROOT, 'db_create_sqlite.sql')) as schema:
+        connection.executescript(schema.read())
+    connection.close()
+    return 'sqlite:///%s' % path
+
+
+def naive_board(mines, n):
+    """
+    Build the n x n board of a set of mines by counting the mines around each tile one neighbor at a time, -1 standing
+    for a mine, as a reference for the vectorized counts of the environments.
+    """
+    mines = set(int(mine) for mine in mines)
+    board = np.zeros((n, n), dtype=int)
+    for row in range(n):
+        for col in range(n):
+            if row * n + col in mines:
+                board[row, col] = -1
+            else:
+                board[row, col] = sum((i * n + j) in mines for i in range(row - 1, row + 2) for j in range(col - 1, col + 2)
+                                      if 0 <= i < n and 0 <= j < n)
+    return board
@@ -0,0 +1,121 @@
+"""
+Integration tests of the Lua move script of `atomic_moves` against a local Redis server, skipped when there is none.
+The server is given by the REDIS_URL environment variable, redis://localhost:6379/15 by default.
+"""
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from atomic_moves import MoveScript
+from MinesweeperEnv import Minesweeper
+
+
+@pytest.fixture
+def client(redis_client):
+    return redis_client
+
+
+def new_key(keys):
+    # A key of its own for each game, deleted after the test
+    key = 'env_test_' + uuid.uuid4().hex
+    keys.append(key)
+    return key
+
+
+def started_game(n, m, action, seed):
+    # A game with its mines placed for its first action, as stored by the web worker before the script runs
+    env = Minesweeper(n, m, seed=seed)
+    env._setupGameBoard(action)
+    env.game_not_initialized = False
+    return env
+
+
+@pytest.mark.parametrize('n, m', [(5, 3), (9, 10), (16, 40), (25, 99)])
+def test_move_matches_step(client, n, m):
+    client, keys = client
+    script = MoveScript(client)
+    rng = np.random.default_rng(n * 100 + m)
+    for seed in range(5):
+        key = new_key(keys)
+        env = started_game(n, m, int(rng.integers(n * n)), seed)
+        client.set(key, env.to_bytes())
+        terminated = False
+        while not terminated:
+            action = int(rng.integers(n * n))
+            result, revealed, values, state = script.move(key, action, 60)
+            _, _, terminated, _, info = env.step(action)
+            assert result == info['result']
+            assert sorted(revealed) == sorted(env.newly_revealed.tolist())
+            assert dict(zip(revealed, values)) == {tile: int(env.game_state.flat[tile]) for tile in revealed}
+            assert (state is not None) == terminated
+        stored = Minesweeper.from_bytes(client.get(key))
+        np.testing.assert_array_equal(stored.revealed_mask, env.revealed_mask)
+        np.testing.assert_array_equal(stored.board, env.board)
+        assert 0 < client.ttl(key) <= 60
+
+
+def test_first_move_places_mines(client):
+    client, keys = client
+    script = MoveScript(client)
+    key = new_key(keys)
+    client.set(key, Minesweeper(9, 10).to_bytes())
+    result, revealed, values, state = script.move(key, 40, 60, return_state=True)
+    assert result in ('continue', 'win')
+    stored = Minesweeper.from_bytes(state)
+    assert len(stored.mines) == 10
+    assert not np.isin(stored.mines, [30, 31, 32, 39, 40, 41, 48, 49, 50]).any() # the 3x3 grid of the first move is safe
+    assert script.move(new_key(keys), 0, 60) is None # no game at this key
+
+
+def test_noscript_reload(client):
+    client, keys = client
+    script = MoveScript(client)
+    key = new_key(keys)
+    env = started_game(9, 10, 40, seed=0)
+    client.set(key, env.to_bytes())
+
+    # Redis forgets the scripts on a restart or a SCRIPT FLUSH, the next move loads it again
+    client.script_flush()
+    assert client.script_exists(script.script.sha) == [False]
+    result, revealed, _, _ = script.move(key, 40, 60)
+    _, _, _, _, info = env.step(40)
+    assert result == info['result']
+    assert sorted(revealed) == sorted(env.newly_revealed.tolist())
+    assert client.script_exists(script.script.sha) == [True]
+
+
+@pytest.mark.parametrize('first_move', [False, True])
+def test_concurrent_moves(client, first_move):
+    client, keys = client
+    script = MoveScript(client)
+    n, m, threads = 16, 10, 8
+    key = new_key(keys)
+    client.set(key, (Minesweeper(n, m) if first_move else started_game(n, m, 0, seed=1)).to_bytes())
+
+    # Every thread clicks its own tiles, all at once
+    barrier = threading.Barrier(threads)
+    replies = [[] for _ in range(threads)]
+
+    def play(index):
+        barrier.wait()
+        for action in range(index, n * n, threads):
+            replies[index].append(script.move(key, action, 60))
+
+    workers = [threading.Thread(target=play, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # The moves were applied one after the other: each tile was revealed by exactly one of them, with the value of
+    # the single board the game was set up with, and the stored game holds all of them
+    stored = Minesweeper.from_bytes(client.get(key))
+    revealed = [tile for thread_replies in replies for _, tiles, _, _ in thread_replies for tile in tiles]
+    assert len(revealed) == len(set(revealed))
+    assert sorted(revealed) == np.flatnonzero(stored.revealed_mask).tolist()
+    for thread_replies in replies:
+        for _, tiles, values, _ in thread_replies:
+            assert values == stored.board.flat[tiles].tolist()
+    assert sum(result == 'lose' for thread_replies in replies for result, _, _, _ in thread_replies) == m
@@ -0,0 +1,56 @@
+"""
+Boards handed out by `BoardCache` to the environments, and the configurations it does not cache.
+"""
+import numpy as np
+import pytest
+
+from board_cache import BoardCache
+from conftest import naive_board
+from MinesweeperEnv import Minesweeper
+from VectorMinesweeperEnv import VectorMinesweeper
+
+
+def check_board(board, mines, n, m, action):
+    # m mines, none in the 3x3 grid of the first action, and the numbers of a naive count
+    mines = np.asarray(mines)
+    assert len(np.unique(mines)) == m
+    row, col = divmod(action, n)
+    rows, cols = np.divmod(mines, n)
+    assert not ((np.abs(rows - row) <= 1) & (np.abs(cols - col) <= 1)).any()
+    np.testing.assert_array_equal(board, naive_board(mines, n))
+
+
+@pytest.mark.parametrize('n, m', [(4, 7), (9, 10), (16, 40), (8, 55)])
+def test_boards_are_set_up_for_the_first_action(tmp_path, n, m):
+    cache = BoardCache(str(tmp_path), size=64)
+    assert cache.boards(n, m) is not None
+    env = Minesweeper(n, m, seed=0, board_cache=cache)
+    for action in range(n * n):
+        env.reset()
+        env._setupGameBoard(action)
+        check_board(env.board, env.mines, n, m, action)
+
+    vector_env = VectorMinesweeper(n * n, n, m, seed=0, board_cache=cache)
+    vector_env.reset()
+    vector_env._setupGameBoards(np.arange(n * n), np.arange(n * n))
+    for action, board in enumerate(vector_env.board.astype(int)):
+        check_board(board, np.flatnonzero(board == -1), n, m, action)
+
+
+def test_too_dense_configurations_are_not_cached(tmp_path):
+    # 8 mines and their 9 extra candidates do not fit on a 4 x 4 board
+    cache = BoardCache(str(tmp_path), size=64)
+    assert cache.boards(4, 8) is None
+    assert not list(tmp_path.iterdir())
+
+    # The games draw their boards instead, from a corner, the only first action leaving room for 8 mines
+    env = Minesweeper(4, 8, seed=0, board_cache=cache)
+    for _ in range(10):
+        env.reset()
+        env._setupGameBoard(0)
+        check_board(env.board, env.mines, 4, 8, 0)
+    vector_env = VectorMinesweeper(10, 4, 8, seed=0, board_cache=cache)
+    vector_env.reset()
+    vector_env._setupGameBoards(np.arange(10), np.zeros(10, dtype=int))
+    for board in vector_env.board.astype(int):
+        check_board(board, np.flatnonzero(board == -1), 4, 8, 0)
@@ -0,0 +1,32 @@
+"""
+Boards generated for the no-guess games by `board_pool`.
+"""
+import numpy as np
+
+from board_pool import generate_no_guess
+from MinesweeperEnv import Minesweeper
+from MinesweeperSolver import play
+
+
+class UnusableCache:
+    # A board cache serving every configuration, that must not be read
+    def boards(self, n, m):
+        raise AssertionError('the board cache was read')
+
+
+def test_generated_boards_are_drawn_without_the_board_cache(monkeypatch):
+    # The applications set the board cache on the class, for every game they create
+    monkeypatch.setattr(Minesweeper, 'board_cache', UnusableCache())
+    rng = np.random.default_rng(0)
+    for action in (0, 40, 80):
+        mines, attempts = generate_no_guess(9, 10, action, rng)
+        assert mines is not None and 1 <= attempts <= 1000
+
+        # The board is solved without guessing from its first action
+        env = Minesweeper(9, 10)
+        env.board_cache = None
+        env.reset()
+        env._placeMines(mines)
+        env.game_not_initialized = False
+        won, _ = play(env, action)
+        assert won
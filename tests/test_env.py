@@ -0,0 +1,29 @@
+"""
+Boards set up by `Minesweeper._setupGameBoard`: the mines drawn for the first action and the numbers counted around
+them.
+"""
+import numpy as np
+import pytest
+
+from conftest import naive_board
+from MinesweeperEnv import Minesweeper
+
+
+@pytest.mark.parametrize('n, m', [(4, 1), (4, 7), (9, 10), (16, 40), (16, 247), (25, 129), (30, 400)])
+def test_setup_matches_naive_counts(n, m):
+    env = Minesweeper(n, m, seed=n + m)
+    rng = np.random.default_rng(m)
+    for _ in range(20):
+        env.reset()
+        action = int(rng.integers(n * n))
+        env._setupGameBoard(action)
+        mines = np.asarray(env.mines)
+        assert len(np.unique(mines)) == m
+
+        # No mine in the 3x3 grid around the first action
+        row, col = divmod(action, n)
+        rows, cols = np.divmod(mines, n)
+        assert not ((np.abs(rows - row) <= 1) & (np.abs(cols - col) <= 1)).any()
+
+        np.testing.assert_array_equal(env.board, naive_board(mines, n))
+        assert env.safe_remaining == n * n - m
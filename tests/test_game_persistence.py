@@ -0,0 +1,268 @@
+"""
+Tests of the pipeline of `game_persistence` writing the finished games to the database, against SQLite databases
+with the tables of db_create_sqlite.sql.
+"""
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from game_persistence import GamePersistence
+from MinesweeperEnv import Minesweeper
+
+
+def synthetic_game(index, user_id=None, won=False):
+    # A finished game as queued by record_move, with a few moves one second apart
+    start = 1700000000.0 + index
+    moves = [((index + move) % 256, start + move) for move in range(index % 7 + 1)]
+    return {'user_id': user_id, 'mines': list(range(40)), 'board_size': 16, 'tiles_revealed': 100,
+            'game_status': 'W' if won else 'L', 'game_start_time': start, 'game_end_time': moves[-1][1], 'moves': moves}
+
+
+def count_rows(url, table):
+    connection = sqlite3.connect(url[len('sqlite:///'):])
+    try:
+        return connection.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_flush_writes_batches(sqlite_url):
+    records = GamePersistence(None, sqlite_url, batch_size=500, flush_interval=60)
+    games = [synthetic_game(index) for index in range(1200)]
+    for game in games:
+        records._queue.put(game)
+    records.flush()
+
+    stats = records.stats()
+    assert stats['batches'] == 3 # 500 + 500 + 200
+    assert stats['games'] == 1200 and stats['queued'] == 0
+    assert stats['moves'] == sum(len(game['moves']) for game in games)
+    assert count_rows(sqlite_url, 'games') == 1200
+    assert count_rows(sqlite_url, 'game_history') == stats['moves']
+
+    # The moves of each game reference it, in order
+    connection = sqlite3.connect(sqlite_url[len('sqlite:///'):])
+    for game_id in (1, 600, 1200):
+        tiles = [tile for (tile,) in connection.execute('SELECT tile_position FROM game_history WHERE game_id = ? ORDER BY move_number', (game_id,))]
+        assert tiles == [tile for tile, _ in games[game_id - 1]['moves']]
+    assert connection.execute('SELECT number_of_moves FROM games WHERE id = 7').fetchone()[0] == len(games[6]['moves'])
+
+
+def test_writer_flushes_full_batches_and_on_interval(sqlite_url):
+    # A full batch wakes the writer up right away
+    records = GamePersistence(None, sqlite_url, batch_size=50, flush_interval=60)
+    for index in range(50):
+        assert records._enqueue(synthetic_game(index))
+    assert wait_for(lambda: records.stats()['games'] == 50)
+
+    # A partial batch is written after the flush interval
+    records = GamePersistence(None, sqlite_url, batch_size=50, flush_interval=0.2)
+    for index in range(3):
+        records._enqueue(synthetic_game(index))
+    assert records.stats()['games'] == 0
+    assert wait_for(lambda: records.stats()['games'] == 3)
+    assert count_rows(sqlite_url, 'games') == 53
+
+
+def test_bounded_queue_backpressure(sqlite_url):
+    records = GamePersistence(None, sqlite_url, max_queue=3, batch_size=100, flush_interval=60, put_timeout=0.2)
+    with records._write_lock: # the writer is busy
+        for index in range(3):
+            assert records._enqueue(synthetic_game(index))
+
+        # The queue is full: the request waits for room, up to put_timeout, and the game is dropped
+        start = time.monotonic()
+        assert not records._enqueue(synthetic_game(3))
+        assert time.monotonic() - start >= 0.2
+        stats = records.stats()
+        assert stats['dropped'] == 1 and stats['queued'] == 3
+
+    # A request waiting on a full queue gets room as soon as the writer takes the queue
+    releaser = threading.Timer(0.05, records.flush)
+    releaser.start()
+    assert records._enqueue(synthetic_game(4))
+    releaser.join()
+    records.flush()
+    assert records.stats()['dropped'] == 1
+    assert count_rows(sqlite_url, 'games') == 4
+
+
+def test_failed_batch_is_retried(tmp_path, sqlite_url):
+    # Without the tables, the batch fails and is kept
+    empty_url = 'sqlite:///%s' % (tmp_path / 'empty.db')
+    records = GamePersistence(None, empty_url, batch_size=10, flush_interval=60)
+    for index in range(15):
+        records._queue.put(synthetic_game(index))
+    with pytest.raises(sqlite3.OperationalError):
+        records.flush()
+    assert len(records._pending) == 10 and records.stats()['games'] == 0
+
+    # Once the database is back, the kept batch is written first, then the rest of the queue
+    records.database_url = sqlite_url
+    records.flush()
+    assert records.stats()['games'] == 15
+    assert count_rows(sqlite_url, 'games') == 15
+
+
+def test_queue_is_written_on_shutdown(sqlite_url):
+    # The games still queued when the process exits are written by the atexit hook
+    script = '\n'.join([
+        'import sys',
+        'sys.path.insert(0, %r)' % ROOT,
+        'sys.path.insert(0, %r)' % (ROOT + '/tests'),
+        'from game_persistence import GamePersistence',
+        'from test_game_persistence import synthetic_game',
+        'records = GamePersistence(None, %r, batch_size=1000, flush_interval=3600)' % sqlite_url,
+        'for index in range(25):',
+        '    records._enqueue(synthetic_game(index))',
+        'assert records.stats()["games"] == 0',
+    ])
+    subprocess.run([sys.executable, '-c', script], check=True, timeout=60)
+    assert count_rows(sqlite_url, 'games') == 25
+
+
+def test_record_move_writes_each_game_once(redis_client, sqlite_url):
+    client, keys = redis_client
+    key = 'test_' + uuid.uuid4().hex
+    keys.append('moves_' + key)
+    records = GamePersistence(client, sqlite_url, flush_interval=60)
+
+    # Play a game until it is lost, then click the mine again
+    env = Minesweeper(9, 10, seed=0)
+    env.reset(seed=0)
+    records.start_game(key)
+    played = []
+    for action in range(81):
+        _, _, terminated, _, info = env.step(action)
+        records.record_move(key, action, env, info['result'])
+        if info['result'] != 'invalid action':
+            played.append(action)
+        if terminated:
+            break
+    for _ in range(3):
+        _, _, _, _, info = env.step(played[-1])
+        records.record_move(key, played[-1], env, info['result'])
+    records.flush()
+
+    connection = sqlite3.connect(sqlite_url[len('sqlite:///'):])
+    assert connection.execute('SELECT COUNT(*), game_status, number_of_moves FROM games').fetchone() == (1, 'L', len(played))
+    assert [tile for (tile,) in connection.execute('SELECT tile_position FROM game_history ORDER BY move_number')] == played
+    mines = connection.execute('SELECT mines FROM games').fetchone()[0]
+    assert sorted(map(int, mines.strip('{}').split(','))) == np.sort(env.mines).tolist()
+    assert not client.exists('moves_' + key)
+
+
+def played_games(count, users, seed=0):
+    # Games of a few players and anonymous ones on three configurations, won in whole seconds so their times are exact
+    rng = np.random.default_rng(seed)
+    games = []
+    for index in range(count):
+        n, m = [(9, 10), (16, 40), (24, 99)][index % 3]
+        start = 1700000000.0 + index
+        moves = [(int(tile), start) for tile in rng.integers(n * n, size=rng.integers(1, 30))]
+        user_id = int(rng.integers(1, users + 1)) if rng.random() < 0.8 else None
+        duration = float(rng.integers(5, 20))
+        games.append({'user_id': user_id, 'mines': list(range(m)), 'board_size': n, 'tiles_revealed': 10,
+                      'game_status': 'W' if rng.random() < 0.4 else 'L', 'game_start_time': start,
+                      'game_end_time': start + duration, 'moves': moves})
+    return games
+
+
+def add_players(url, users):
+    connection = sqlite3.connect(url[len('sqlite:///'):])
+    connection.executemany('INSERT INTO user_profiles (id, username) VALUES (?, ?)', [(user_id, 'player%d' % user_id) for user_id in range(1, users + 1)])
+    connection.commit()
+    connection.close()
+
+
+def test_rollups_match_games(sqlite_url):
+    add_players(sqlite_url, 12)
+    games = played_games(900, 12)
+    # Small batches, so that the statistics of a player are updated by many of them
+    records = GamePersistence(None, sqlite_url, batch_size=37, flush_interval=60)
+    for game in games:
+        records._queue.put(game)
+    records.flush()
+
+    # Games played, won and moves of each player and configuration, from the rows of `games`
+    connection = sqlite3.connect(sqlite_url[len('sqlite:///'):])
+    rows = connection.execute("SELECT user_id, board_size, LENGTH(mines) - LENGTH(REPLACE(mines, ',', '')) + 1, COUNT(*), "
+                              "SUM(game_status = 'W'), SUM(number_of_moves) FROM games GROUP BY 1, 2, 3").fetchall()
+    best_times = {}
+    for game in games:
+        if game['game_status'] == 'W':
+            key = (game['user_id'], game['board_size'], len(game['mines']))
+            time_ms = int((game['game_end_time'] - game['game_start_time']) * 1000)
+            best_times[key] = min(best_times.get(key, time_ms), time_ms)
+
+    expected_players = {}
+    expected_configs = {}
+    for user_id, board_size, mines, played, won, moves in rows:
+        totals = expected_configs.get((board_size, mines), (0, 0, 0))
+        expected_configs[(board_size, mines)] = (totals[0] + played, totals[1] + won, totals[2] + moves)
+        if user_id is not None:
+            expected_players.setdefault(user_id, {})[(board_size, mines)] = (played, won, moves, best_times.get((user_id, board_size, mines)))
+
+    def rollups(stats):
+        return {(entry['board_size'], entry['mines']): (entry['games_played'], entry['games_won'],
+                                                        round(entry['average_moves'] * entry['games_played']), entry['best_time_ms'])
+                for entry in stats}
+
+    for user_id in range(1, 13):
+        assert rollups(records.game_stats(user_id)) == expected_players[user_id]
+    # The statistics of all the games include the anonymous ones
+    assert rollups(records.game_stats()) == {
+        configuration: totals + (min(time_ms for (_, board_size, mines), time_ms in best_times.items() if (board_size, mines) == configuration),)
+        for configuration, totals in expected_configs.items()}
+    assert sum(played for played, _, _ in expected_configs.values()) == 900
+
+
+def test_leaderboard_pages_with_tied_times(sqlite_url):
+    add_players(sqlite_url, 60)
+    start = 1700000000.0
+    games = []
+    for user_id in range(1, 61):
+        # Three distinct times only, so most players tie with others, and a few players without a win
+        status = 'L' if user_id % 10 == 0 else 'W'
+        for duration in (10 + user_id % 3, 20):
+            games.append({'user_id': user_id, 'mines': list(range(40)), 'board_size': 16, 'tiles_revealed': 10, 'game_status': status,
+                          'game_start_time': start, 'game_end_time': start + duration, 'moves': [(0, start)]})
+        # A faster win on another configuration, which must not show up
+        games.append({'user_id': user_id, 'mines': list(range(10)), 'board_size': 9, 'tiles_revealed': 10, 'game_status': 'W',
+                      'game_start_time': start, 'game_end_time': start + 1, 'moves': [(0, start)]})
+    records = GamePersistence(None, sqlite_url, flush_interval=60)
+    for game in games:
+        records._queue.put(game)
+    records.flush()
+
+    expected = sorted(((10 + user_id % 3) * 1000, user_id) for user_id in range(1, 61) if user_id % 10)
+    for limit in (1, 7, 18, 54, 100):
+        seen = []
+        after = None
+        while True:
+            page = records.leaderboard(16, 40, limit=limit, after=after)
+            assert len(page['entries']) <= limit
+            seen += [(entry['best_time_ms'], entry['user_id']) for entry in page['entries']]
+            after = page['next']
+            if after is None:
+                break
+        # Every player shows up exactly once, in order, across the pages
+        assert seen == expected
+    assert records.leaderboard(16, 40, limit=1)['entries'][0] == {'user_id': 3, 'username': 'player3', 'best_time_ms': 10000,
+                                                                  'games_played': 2, 'games_won': 2}
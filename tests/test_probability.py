@@ -0,0 +1,111 @@
+"""
+Exactness of `MineProbabilityEngine` against a brute-force enumeration of the mine placements on small boards, and
+its estimate when the time budget runs out.
+"""
+import itertools
+import threading
+
+import numpy as np
+import pytest
+
+from MinesweeperEnv import Minesweeper
+from MinesweeperProbability import MineProbabilityEngine
+from MinesweeperSolver import solve
+
+
+def brute_force(game_state, m):
+    """
+    Enumerate the placements of the m mines on the covered tiles that agree with the revealed numbers, all equally
+    likely, and return the probability that each tile holds a mine.
+    """
+    n = game_state.shape[0]
+    flat_state = game_state.reshape(-1)
+    covered = np.flatnonzero(flat_state == 9)
+    revealed = np.flatnonzero(flat_state != 9)
+    rows, cols = np.divmod(covered, n)
+    revealed_rows, revealed_cols = np.divmod(revealed, n)
+    adjacency = ((np.abs(rows[:, None] - revealed_rows) <= 1) & (np.abs(cols[:, None] - revealed_cols) <= 1)).astype(int)
+
+    placements = np.array(list(itertools.combinations(range(len(covered)), m)))
+    mines = np.zeros((len(placements), len(covered)), dtype=int)
+    np.put_along_axis(mines, placements, 1, axis=1)
+    consistent = mines[np.all(mines @ adjacency == flat_state[revealed], axis=1)]
+    probabilities = np.zeros(n * n)
+    probabilities[covered] = consistent.mean(axis=0)
+    return probabilities.reshape(n, n)
+
+
+def stuck_positions(n, m, seed):
+    """
+    Play a game revealing the tiles the solver finds safe, and a safe tile when it finds none, and yield the game
+    states in which the solver is stuck.
+    """
+    rng = np.random.default_rng(seed)
+    env = Minesweeper(n, m, seed=seed)
+    env.reset(seed=seed)
+    _, _, terminated, _, _ = env.step(n * n // 2)
+    while not terminated:
+        safe, _ = solve(env.game_state, m)
+        if not safe:
+            yield env.game_state.copy()
+            safe = [int(rng.choice(np.flatnonzero((env.board.reshape(-1) != -1) & ~env.revealed_mask.reshape(-1))))]
+        _, _, terminated, _, _ = env.step(safe[0])
+
+
+@pytest.mark.parametrize('n, m', [(4, 3), (5, 5), (5, 8), (6, 5)])
+def test_probabilities_match_brute_force(n, m):
+    engine = MineProbabilityEngine(time_budget=None)
+    positions = 0
+    for seed in range(50):
+        for game_state in stuck_positions(n, m, seed):
+            np.testing.assert_allclose(engine.probabilities(game_state, m), brute_force(game_state, m), atol=1e-12)
+            assert engine.exact
+            positions += 1
+    assert positions >= 10
+
+
+def test_estimate_when_out_of_time():
+    n, m = 25, 129
+    game_state = next(stuck_positions(n, m, 0))
+    engine = MineProbabilityEngine(time_budget=0)
+    estimate = engine.probabilities(game_state, m)
+    assert not engine.exact
+    covered = game_state == 9
+    assert (estimate[~covered] == 0).all()
+    assert ((estimate >= 0) & (estimate <= 1)).all()
+    # The tiles the deterministic rules decide keep their probabilities
+    safe, mines = solve(game_state, m)
+    assert (estimate.flat[mines] == 1).all() and (estimate.flat[safe] == 0).all()
+
+    # A later call with time left counts them, as does a call given a later deadline
+    exact = MineProbabilityEngine(time_budget=None).probabilities(game_state, m)
+    engine.time_budget = None
+    np.testing.assert_allclose(engine.probabilities(game_state, m), exact)
+    assert engine.exact
+    engine = MineProbabilityEngine(time_budget=0)
+    np.testing.assert_allclose(engine.probabilities(game_state, m, deadline=np.inf), exact)
+    assert engine.exact
+
+
+def test_deadlines_of_threads_are_independent():
+    # Without memoization, the calls running out of time must not cut short the calls without a limit
+    n, m = 16, 40
+    game_state = next(stuck_positions(n, m, 1))
+    engine = MineProbabilityEngine(time_budget=None, cache_size=0)
+    expected = engine.probabilities(game_state, m)
+    results = {}
+
+    def run(deadline):
+        outcomes = []
+        for _ in range(50):
+            probabilities = engine.probabilities(game_state, m, deadline)
+            outcomes.append((engine.exact, np.allclose(probabilities, expected)))
+        results[deadline] = outcomes
+
+    threads = [threading.Thread(target=run, args=(deadline,)) for deadline in (np.inf, 0)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[np.inf] == [(True, True)] * 50
+    assert all(not exact for exact, _ in results[0])
@@ -0,0 +1,83 @@
+"""
+Soundness of `MinesweeperSolver` against a brute-force enumeration of the mine placements on small boards, and
+equivalence of its incremental updates with a solve of the whole game state.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from MinesweeperEnv import Minesweeper
+from MinesweeperSolver import MinesweeperSolver, solve
+
+
+def brute_force(game_state, m):
+    """
+    Enumerate the placements of the m mines on the covered tiles that agree with the revealed numbers.
+
+    Returns:
+    tuple: The covered tiles safe in every placement and the ones holding a mine in every placement, as sets.
+    """
+    n = game_state.shape[0]
+    flat_state = game_state.reshape(-1)
+    covered = np.flatnonzero(flat_state == 9)
+    revealed = np.flatnonzero(flat_state != 9)
+    # Adjacency of the covered tiles with the revealed ones
+    rows, cols = np.divmod(covered, n)
+    revealed_rows, revealed_cols = np.divmod(revealed, n)
+    adjacency = ((np.abs(rows[:, None] - revealed_rows) <= 1) & (np.abs(cols[:, None] - revealed_cols) <= 1)).astype(int)
+
+    placements = np.array(list(itertools.combinations(range(len(covered)), m)))
+    mines = np.zeros((len(placements), len(covered)), dtype=int)
+    np.put_along_axis(mines, placements, 1, axis=1)
+    consistent = mines[np.all(mines @ adjacency == flat_state[revealed], axis=1)]
+    assert len(consistent) > 0
+    return set(covered[~consistent.any(axis=0)].tolist()), set(covered[consistent.all(axis=0)].tolist())
+
+
+def covered_safe_tile(env, rng):
+    """
+    Pick a covered tile without a mine, as a player guessing right would.
+    """
+    tiles = np.flatnonzero((env.board.reshape(-1) != -1) & ~env.revealed_mask.reshape(-1))
+    return int(rng.choice(tiles))
+
+
+@pytest.mark.parametrize('n, m', [(4, 3), (5, 5), (5, 8), (6, 4)])
+def test_deductions_are_sound(n, m):
+    rng = np.random.default_rng(n * 100 + m)
+    deductions = 0
+    for seed in range(25):
+        env = Minesweeper(n, m, seed=seed)
+        env.reset(seed=seed)
+        solver = MinesweeperSolver(n, m)
+        _, _, terminated, _, _ = env.step(int(rng.integers(n * n)))
+        while not terminated:
+            solver.observe(env)
+            safe, mines = set(solver.safe_tiles()), set(solver.mine_tiles())
+            certain_safe, certain_mines = brute_force(env.game_state, m)
+            assert safe <= certain_safe
+            assert mines <= certain_mines
+            deductions += len(safe) + len(mines)
+            # Reveal a deduced tile when there is one, otherwise guess right
+            action = min(safe) if safe else covered_safe_tile(env, rng)
+            _, _, terminated, _, _ = env.step(action)
+    assert deductions > 0
+
+
+@pytest.mark.parametrize('n, m', [(9, 10), (16, 40), (25, 129)])
+def test_incremental_updates_match_full_solve(n, m):
+    rng = np.random.default_rng(n)
+    for seed in range(5):
+        env = Minesweeper(n, m, seed=seed)
+        env.reset(seed=seed)
+        solver = MinesweeperSolver(n, m)
+        _, _, terminated, _, _ = env.step(n * n // 2)
+        while not terminated:
+            solver.observe(env)
+            safe, mines = solver.safe_tiles(), solver.mine_tiles()
+            assert (safe, mines) == solve(env.game_state, m)
+            assert not (env.board.reshape(-1)[safe] == -1).any()
+            assert (env.board.reshape(-1)[mines] == -1).all()
+            action = safe[0] if safe else covered_safe_tile(env, rng)
+            _, _, terminated, _, _ = env.step(action)
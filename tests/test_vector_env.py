@@ -0,0 +1,95 @@
+"""
+Equivalence of `VectorMinesweeper.step` with `Minesweeper.step`: a batch of boards and one scalar environment per
+board are played with the same actions on the same boards, and must agree on every step. The boards set up by
+`VectorMinesweeper._setupGameBoards` are checked on their own.
+"""
+import numpy as np
+import pytest
+
+from conftest import naive_board
+from MinesweeperEnv import OBSERVATION_MODES, Minesweeper
+from VectorMinesweeperEnv import VectorMinesweeper
+
+
+def set_up_new_games(vector_env, envs, actions):
+    """
+    Set up the boards of the games of the batch that have not started yet, and place the same mines on their scalar
+    counterparts, so that both are played on the same boards.
+    """
+    new_games = np.flatnonzero(vector_env.game_not_initialized)
+    if len(new_games) == 0:
+        return
+    vector_env._setupGameBoards(new_games, actions[new_games])
+    vector_env.game_not_initialized[new_games] = False
+    for index in new_games.tolist():
+        envs[index]._placeMines(np.flatnonzero(vector_env.board[index] == -1))
+        envs[index].game_not_initialized = False
+
+
+@pytest.mark.parametrize('observation_mode', OBSERVATION_MODES)
+@pytest.mark.parametrize('n, m', [(4, 1), (9, 10), (16, 40), (8, 50)])
+def test_step_matches_scalar_env(n, m, observation_mode):
+    num_envs = 16
+    rng = np.random.default_rng(n * 1000 + m)
+    vector_env = VectorMinesweeper(num_envs, n, m, seed=n + m, observation_mode=observation_mode)
+    envs = [Minesweeper(n, m, observation_mode=observation_mode) for _ in range(num_envs)]
+    observations = vector_env.reset(seed=n + m)
+    for index, env in enumerate(envs):
+        np.testing.assert_array_equal(observations[index], env.reset())
+
+    finished_games = 0
+    for _ in range(150):
+        # Mostly covered tiles, and some revealed ones to exercise the invalid actions
+        covered = vector_env.game_state.reshape(num_envs, -1) == 9
+        actions = np.where(rng.random(num_envs) < 0.1, rng.integers(n * n, size=num_envs),
+                           np.argmax(rng.random(covered.shape) * covered, axis=1))
+        set_up_new_games(vector_env, envs, actions)
+
+        observations, rewards, terminations, truncations, infos = vector_env.step(actions)
+        assert not truncations.any()
+        for index, (env, action) in enumerate(zip(envs, actions.tolist())):
+            observation, reward, terminated, truncated, info = env.step(action)
+            assert rewards[index] == reward
+            assert terminations[index] == terminated
+            assert infos["result"][index] == info["result"]
+            if terminated:
+                # The batch resets the board on its own, keeping its final observation in the infos
+                assert infos["_final_obs"][index]
+                np.testing.assert_array_equal(infos["final_obs"][index], observation)
+                observation = env.reset()
+                finished_games += 1
+            np.testing.assert_array_equal(observations[index], observation)
+            np.testing.assert_array_equal(vector_env.action_masks()[index], env.action_masks())
+        if "_final_obs" in infos:
+            np.testing.assert_array_equal(infos["_final_obs"], terminations)
+    assert finished_games > 0
+
+
+@pytest.mark.parametrize('n, m', [(4, 1), (4, 7), (9, 10), (16, 40), (8, 54), (25, 129)])
+def test_setup_places_valid_boards(n, m):
+    num_envs = 32
+    vector_env = VectorMinesweeper(num_envs, n, m, seed=n + m)
+    rng = np.random.default_rng(m)
+    for _ in range(5):
+        vector_env.reset()
+        actions = rng.integers(n * n, size=num_envs)
+        vector_env._setupGameBoards(np.arange(num_envs), actions)
+        boards = vector_env.board.astype(int)
+        for board, action in zip(boards, actions.tolist()):
+            mines = np.flatnonzero(board == -1)
+            assert len(mines) == m
+
+            # No mine in the 3x3 grid around the first action
+            row, col = divmod(action, n)
+            rows, cols = np.divmod(mines, n)
+            assert not ((np.abs(rows - row) <= 1) & (np.abs(cols - col) <= 1)).any()
+
+            np.testing.assert_array_equal(board, naive_board(mines, n))
+
+        # Setting up some of the boards leaves the other ones as they are
+        envs = np.arange(0, num_envs, 3)
+        vector_env._setupGameBoards(envs, actions[envs])
+        others = np.setdiff1d(np.arange(num_envs), envs)
+        np.testing.assert_array_equal(vector_env.board[others], boards[others])
+        # Each board gets its own mines
+        assert len({board.tobytes() for board in boards}) > 1
@@ -0,0 +1,270 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from MinesweeperEnv import Minesweeper
+from MinesweeperSolver import MinesweeperSolver, _bits
+
+
+# Results of a step, stored as their index in this tuple
+RESULTS = ("continue", "invalid action", "lose", "win")
+_RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+
+def record_dtype(n):
+    """
+    The structured dtype of the records of the games on an n x n board.
+
+    Fields:
+    obs: The game state before the action, n x n uint8, with 0 to 8 for the revealed tiles and 9 for the covered ones.
+    action: The action, a linear index of a tile.
+    reward: The reward of the step.
+    terminated: Whether the game ended with the step.
+    result: The index of the result of the step in `RESULTS`.
+    episode: The index of the game, in the order the games were played.
+    step: The index of the step in its game.
+    """
+    return np.dtype([('obs', np.uint8, (n, n)), ('action', np.int32), ('reward', np.int16), ('terminated', np.bool_),
+                     ('result', np.int8), ('episode', np.int64), ('step', np.int32)])
+
+
+def random_policy(env, rng, solver=None):
+    """
+    Click a random covered tile.
+    """
+    return int(rng.choice(np.flatnonzero(~env.revealed_mask)))
+
+
+def solver_policy(env, rng, solver):
+    """
+    Click a tile guaranteed to be safe by the solver, or guess a random tile among the undetermined ones.
+    """
+    action = solver.next_safe()
+    if action is None:
+        unknown = _bits(solver.unknown)
+        return unknown[rng.integers(len(unknown))] if unknown else random_policy(env, rng)
+    return action
+
+
+POLICIES = {'random': random_policy, 'solver': solver_policy}
+
+
+def play_episodes(n, m, policy='solver', episodes=None, seed=None):
+    """
+    Play games and yield their steps one at a time, so that they can be streamed to disk.
+
+    Parameters:
+    n (int): The dimensions of the board.
+    m (int): The number of mines on the board.
+    policy (str or callable): 'random', 'solver', or a function `policy(env, rng, solver)` returning the action to
+                              take in the game, given a random number generator and a `MinesweeperSolver` kept up
+                              to date with the game (None for the random policy).
+    episodes (int, optional): The number of games to play. By default, games are played until the generator is
+                              closed.
+    seed (int, optional): The seed of the boards and of the policy.
+
+    Yields:
+    tuple: (obs, action, reward, terminated, result) for each step, obs being the game state before the action as
+           an n x n array with 9 for the covered tiles. The array is reused by the next step.
+    """
+    policy = POLICIES.get(policy, policy)
+    rng = np.random.default_rng(seed)
+    env = Minesweeper(n, m)
+    obs = np.empty((n, n), dtype=np.uint8)
+    episode = 0
+    while episodes is None or episode < episodes:
+        env.reset()
+        env.np_random = rng
+        solver = MinesweeperSolver(n, m) if policy is not random_policy else None
+        terminated = False
+        while not terminated:
+            np.copyto(obs, env.game_state, casting='unsafe')
+            action = policy(env, rng, solver)
+            _, reward, terminated, _, info = env.step(action)
+            if solver is not None and not terminated:
+                solver.observe(env)
+            yield obs, action, reward, terminated, info["result"]
+        episode += 1
+
+
+class ShardWriter:
+
+    def __init__(self, directory, n, shard_size=65536, shuffle=True, seed=None, block_size=1024):
+        """
+        Initialize a writer of game steps into memory-mapped `.npy` shards of fixed size.
+
+        The records are gathered in blocks of `block_size` records, and each block is copied into the memory mapping
+        of the file of the current shard, so only the block and the pages of the current shard are held in memory. A
+        full shard is shuffled in place, so that its contiguous slices mix
+        the steps of many games, then flushed and renamed to its final name, `shard_00000.npy` and so on. Once the
+        writer is closed, `index.json` lists the shards with their number of records, the last one being partial,
+        and its presence marks a complete export.
+
+        Parameters:
+        directory (str): The directory receiving the shards.
+        n (int): The dimensions of the board.
+        shard_size (int): The number of records per shard.
+        shuffle (bool): Whether to shuffle the records of each shard.
+        seed (int, optional): The seed of the shuffles.
+        block_size (int): The number of records gathered before being copied into the shard.
+        """
+        self.directory = directory
+        self.n = n
+        self.shard_size = shard_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.dtype = record_dtype(n)
+        self.block_size = min(block_size, shard_size)
+
+        self.shards = [] # (file name, number of records)
+        self.records = 0
+        self.episodes = 0
+        self._shard = None
+        self._path = None
+        self._position = 0
+        self._step = 0
+        self._block_obs = np.empty((self.block_size, n, n), dtype=np.uint8)
+        self._block = [] # (action, reward, terminated, result, episode, step) of the records of the block
+        os.makedirs(directory, exist_ok=True)
+
+    def _openShard(self):
+        """
+        Create the file of the next shard under a temporary name, and map it.
+        """
+        fd, self._path = tempfile.mkstemp(dir=self.directory, suffix='.npy')
+        os.close(fd)
+        self._shard = np.lib.format.open_memmap(self._path, mode='w+', dtype=self.dtype, shape=(self.shard_size,))
+        self._position = 0
+
+    def _flushBlock(self):
+        """
+        Copy the gathered records into the current shard.
+        """
+        count = len(self._block)
+        if self._shard is None:
+            self._openShard()
+        records = self._shard[self._position:self._position + count]
+        records['obs'] = self._block_obs[:count]
+        scalars = np.array(self._block, dtype=[(name, self.dtype[name]) for name in self.dtype.names[1:]])
+        for name in scalars.dtype.names:
+            records[name] = scalars[name]
+        self._position += count
+        self._block = []
+
+    def _closeShard(self):
+        """
+        Shuffle the records of the current shard, flush it and give it its final name.
+        """
+        count = self._position
+        if self.shuffle:
+            self._shard[:count] = self._shard[:count][self.rng.permutation(count)]
+        self._shard.flush()
+        self._shard = None
+        name = 'shard_%05d.npy' % len(self.shards)
+        os.replace(self._path, os.path.join(self.directory, name))
+        self.shards.append((name, count))
+
+    def write(self, obs, action, reward, terminated, result):
+        """
+        Append a step to the current shard.
+
+        Parameters:
+        obs (numpy.ndarray): The n x n game state before the action.
+        action (int): The action.
+        reward (int): The reward of the step.
+        terminated (bool): Whether the game ended with the step.
+        result (str): The result of the step.
+        """
+        self._block_obs[len(self._block)] = obs
+        self._block.append((action, reward, terminated, _RESULT_CODES[result], self.episodes, self._step))
+        self.records += 1
+        self._step += 1
+        if terminated:
+            self.episodes += 1
+            self._step = 0
+        if len(self._block) == self.block_size or self._position + len(self._block) == self.shard_size:
+            self._flushBlock()
+            if self._position == self.shard_size:
+                self._closeShard()
+
+    def close(self):
+        """
+        Write the last shard and the index of the shards.
+        """
+        if self._block:
+            self._flushBlock()
+        if self._shard is not None:
+            self._closeShard()
+        index = {'n': self.n, 'shard_size': self.shard_size, 'records': self.records, 'episodes': self.episodes,
+                 'shards': [{'file': name, 'records': count} for name, count in self.shards]}
+        with open(os.path.join(self.directory, 'index.json'), 'w') as index_file:
+            json.dump(index, index_file, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def export(directory, n, m, episodes, policy='solver', seed=None, shard_size=65536, shuffle=True):
+    """
+    Play games with a policy and stream their steps into shards, see `play_episodes` and `ShardWriter`.
+
+    Returns:
+    dict: The index of the shards, as written to `index.json`.
+    """
+    with ShardWriter(directory, n, shard_size=shard_size, shuffle=shuffle, seed=seed) as writer:
+        for step in play_episodes(n, m, policy, episodes, seed):
+            writer.write(*step)
+    with open(os.path.join(directory, 'index.json')) as index_file:
+        return json.load(index_file)
+
+
+class ShardLoader:
+
+    def __init__(self, directory):
+        """
+        Initialize a reader of the shards written by `ShardWriter`, mapped in memory rather than read.
+
+        Parameters:
+        directory (str): The directory of the shards, with their `index.json`.
+        """
+        with open(os.path.join(directory, 'index.json')) as index_file:
+            self.index = json.load(index_file)
+        self.n = self.index['n']
+        self.shards = [np.load(os.path.join(directory, shard['file']), mmap_mode='r')[:shard['records']].view(np.ndarray) # plain arrays over the mappings, cheaper to slice
+                       for shard in self.index['shards']]
+
+    def __len__(self):
+        return self.index['records']
+
+    def batches(self, batch_size, shuffle=True, seed=None, drop_last=False):
+        """
+        Yield minibatches of records.
+
+        A minibatch is a contiguous slice of a shard, a view of its memory mapping: nothing is copied, and the pages
+        are read from the file as the minibatch is used. The minibatches are shuffled by visiting the slices of all
+        the shards in a random order, and as the records of each shard were shuffled when it was written, each
+        minibatch mixes the steps of many games.
+
+        Parameters:
+        batch_size (int): The number of records per minibatch.
+        shuffle (bool): Whether to visit the minibatches in a random order, instead of the order of the shards.
+        seed (int, optional): The seed of the order.
+        drop_last (bool): Whether to skip the last slice of each shard when it holds fewer than `batch_size` records.
+
+        Yields:
+        numpy.ndarray: The records of a minibatch, with the fields of `record_dtype`, as a read-only view.
+        """
+        slices = [(shard, start) for shard, records in enumerate(self.shards)
+                  for start in range(0, len(records), batch_size)
+                  if not drop_last or start + batch_size <= len(records)]
+        if shuffle:
+            order = np.random.default_rng(seed).permutation(len(slices))
+            slices = [slices[index] for index in order]
+        for shard, start in slices:
+            yield self.shards[shard][start:start + batch_size]